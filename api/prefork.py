@@ -0,0 +1,211 @@
+"""
+Pre-fork serving for the recommendation API
+
+    python api/prefork.py --port 8000 --workers 4
+
+The parent process loads the index artifact and the embedding model
+once, freezes its heap (gc.freeze) and forks --workers processes that
+accept on one shared listening socket. Model weights, document
+vectors, catalogue columns and BM25 matrices stay in copy-on-write
+pages shared with the parent; the FAISS index and stored vectors are
+memory-mapped files shared through the page cache. Only per-request
+state (caches, tracing metrics, executor threads) is private to each
+worker, so memory grows far slower than with one full server per core.
+
+Workers that die are respawned; SIGTERM / SIGINT stop them all.
+/metrics reports the worker that served the scrape.
+
+ONNX Runtime sessions are not fork-safe (their thread pools do not
+survive fork), so with an onnx index each worker loads its own
+(small, int8) encoder and only the index is shared.
+"""
+
+import sys
+import os
+
+# Ensure project root is on PYTHONPATH
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import gc
+import time
+import signal
+import socket
+import logging
+import argparse
+
+from aiohttp import web
+
+from api.server import add_app_arguments, configure, app_from_args
+from retrieval.retrieve_and_rank import warm_up, index_manifest
+
+DEFAULT_WORKERS = max(1, os.cpu_count() or 1)
+BACKLOG = 2048
+# A worker dying sooner than this after spawn is respawned with a delay
+MIN_UPTIME_S = 5.0
+RESPAWN_DELAY_S = 1.0
+STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+logger = logging.getLogger("shl.prefork")
+
+
+def bind_socket(host, port, backlog=BACKLOG):
+    """
+    Listening socket created before fork; every worker accepts on it
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def preload():
+    """
+    Load shared read-only state in the parent, then move every object
+    to the permanent generation so the workers' collections never
+    write to (and un-share) the parent's pages
+    """
+    manifest = index_manifest()
+    if manifest.get("encoder_backend", "torch") == "torch":
+        # Single-threaded warm-up: no OpenMP pool exists at fork time
+        # (its threads would not survive into the workers); each worker
+        # raises the count in limit_threads()
+        limit_threads(1)
+        warm_up()
+    else:
+        logger.info("onnx encoder: each worker loads its own session")
+
+    gc.collect()
+    gc.freeze()
+    return manifest
+
+
+def limit_threads(num_threads):
+    """
+    Set this process's torch thread count: 1 in the parent while
+    preloading, the worker's share of the cores after fork
+    """
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(num_threads)
+
+
+def serve_worker(sock, args):
+    """
+    Worker body (runs in the forked child, never returns)
+    """
+    gc.enable()
+    limit_threads(args.threads)
+    configure(args)
+
+    web.run_app(app_from_args(args), sock=sock, print=None)
+
+
+class Supervisor:
+    """
+    Forks workers and keeps --workers of them running
+    """
+
+    def __init__(self, sock, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}
+        self.stopping = False
+
+    def spawn(self, slot):
+        # Held back across fork so the parent's handler never runs in a
+        # child; run_app installs the worker's own handlers
+        signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+            code = 0
+            try:
+                serve_worker(self.sock, self.args)
+            except (KeyboardInterrupt, SystemExit):
+                pass
+            except BaseException:
+                logger.exception("worker %d crashed", slot)
+                code = 1
+            finally:
+                os._exit(code)
+
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+        self.workers[pid] = (slot, time.monotonic())
+        logger.info("🍴 worker %d started (pid %d)", slot, pid)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for slot in range(self.args.workers):
+            self.spawn(slot)
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            slot, started = self.workers.pop(pid, (None, 0.0))
+            if slot is None or self.stopping:
+                continue
+
+            logger.warning(
+                "worker %d (pid %d) exited with status %d, respawning",
+                slot, pid, os.waitstatus_to_exitcode(status),
+            )
+            if time.monotonic() - started < MIN_UPTIME_S:
+                time.sleep(RESPAWN_DELAY_S)
+            self.spawn(slot)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork SHL recommendation API")
+    add_app_arguments(parser)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="forked worker processes (default: one per core)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="torch threads per worker (default: cores / workers)")
+    args = parser.parse_args()
+    args.threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Collections in the parent while loading would leave freed holes
+    # in pages the workers then share; gc.freeze() follows the load
+    gc.disable()
+    sock = bind_socket(args.host, args.port)
+
+    print("📥 Loading index and model in the parent...")
+    manifest = preload()
+    print(
+        f"✅ Loaded {manifest.get('num_vectors')} vectors "
+        f"({manifest.get('encoder_backend', 'torch')} encoder); "
+        f"forking {args.workers} workers on {args.host}:{args.port}"
+    )
+
+    Supervisor(sock, args).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
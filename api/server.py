@@ -0,0 +1,346 @@
+"""
+Async HTTP recommendation API
+
+    python api/server.py --port 8000
+    python api/prefork.py --port 8000 --workers 4   (one model copy, forked workers)
+
+Endpoints:
+    GET  /recommend?query=...&k=10[&rewrite=1]
+    POST /recommend          {"query": "...", "k": 10, "rewrite": false}
+    POST /recommend/batch    {"queries": ["...", ...], "k": 10}
+    GET  /health
+    GET  /metrics            Prometheus text (stage latencies, candidates, caches)
+
+rewrite=1 runs LLM query rewriting speculatively: baseline results are
+returned unless the rewrite arrives within its deadline.
+"""
+
+import sys
+import os
+
+# Ensure project root is on PYTHONPATH
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import asyncio
+import logging
+import argparse
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from aiohttp import web
+
+from retrieval.retrieve_and_rank import recommend, recommend_batch, warm_up, is_ready
+from llm.query_rewriter import get_rewriter, speculative_recommend_async
+from retrieval import tracing
+
+DEFAULT_K = 10
+MAX_K = 50
+MAX_BATCH_QUERIES = 256
+
+# Encoding is CPU-bound: run it on a small executor and shed load
+# (503) once this many requests are queued or running
+DEFAULT_EXECUTOR_WORKERS = 4
+DEFAULT_MAX_PENDING = 64
+
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+LIMITER_KEY = web.AppKey("limiter", object)
+
+
+def format_response(query, results):
+    """
+    Same JSON schema as the Streamlit API mode
+    """
+    return {
+        "query": query,
+        "recommendations": [
+            {
+                "rank": i + 1,
+                "name": r["name"],
+                "score": round(float(r["score"]), 4),
+                "url": r["url"]
+            }
+            for i, r in enumerate(results)
+        ]
+    }
+
+
+class PendingLimiter:
+    """
+    Counts requests queued or running on the executor;
+    new work is rejected instead of queued once the limit is hit
+    """
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                return False
+            self.pending += 1
+            return True
+
+    def release(self):
+        # Also called from executor threads (job done-callbacks)
+        with self._lock:
+            self.pending -= 1
+
+
+class _SlotExecutor(Executor):
+    """
+    Executor view holding one limiter slot. The slot is released once
+    the request is done with it (close()) and every job it submitted
+    has finished, so a cancelled request keeps counting while its
+    retrieval still runs on the pool
+    """
+
+    def __init__(self, executor, limiter):
+        self._executor = executor
+        self._limiter = limiter
+        self._lock = threading.Lock()
+        self._refs = 1
+
+    def submit(self, fn, *args, **kwargs):
+        future = self._executor.submit(fn, *args, **kwargs)
+        with self._lock:
+            self._refs += 1
+        future.add_done_callback(self._unref)
+        return future
+
+    def close(self):
+        self._unref()
+
+    def _unref(self, _future=None):
+        with self._lock:
+            self._refs -= 1
+            idle = self._refs == 0
+        if idle:
+            self._limiter.release()
+
+
+def _error(status, message, **headers):
+    return web.json_response({"error": message}, status=status, headers=headers)
+
+
+def _parse_k(raw):
+    if raw is None:
+        return DEFAULT_K
+    try:
+        k = int(raw)
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(reason="k must be an integer")
+    if not 1 <= k <= MAX_K:
+        raise web.HTTPBadRequest(reason=f"k must be between 1 and {MAX_K}")
+    return k
+
+
+def _parse_flag(raw):
+    if isinstance(raw, bool):
+        return raw
+    return str(raw or "").strip().lower() in ("1", "true", "yes")
+
+
+async def _read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(reason="body must be valid JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="body must be a JSON object")
+    return body
+
+
+async def _run(request, fn, *args):
+    """
+    Run CPU-bound retrieval on the bounded executor, with backpressure
+    """
+    limiter = request.app[LIMITER_KEY]
+    if not limiter.try_acquire():
+        raise web.HTTPServiceUnavailable(
+            reason="server busy", headers={"Retry-After": "1"}
+        )
+
+    executor = _SlotExecutor(request.app[EXECUTOR_KEY], limiter)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, fn, *args)
+    finally:
+        executor.close()
+
+
+async def _run_speculative(request, query, k):
+    """
+    Baseline retrieval on the executor while the LLM rewrite is in flight
+    """
+    limiter = request.app[LIMITER_KEY]
+    if not limiter.try_acquire():
+        raise web.HTTPServiceUnavailable(
+            reason="server busy", headers={"Retry-After": "1"}
+        )
+
+    executor = _SlotExecutor(request.app[EXECUTOR_KEY], limiter)
+    try:
+        return await speculative_recommend_async(query, recommend, k, executor=executor)
+    finally:
+        executor.close()
+
+
+async def handle_recommend(request):
+    if request.method == "POST":
+        body = await _read_json(request)
+        query, raw_k = body.get("query"), body.get("k")
+        rewrite = _parse_flag(body.get("rewrite"))
+    else:
+        query, raw_k = request.query.get("query"), request.query.get("k")
+        rewrite = _parse_flag(request.query.get("rewrite"))
+
+    if not isinstance(query, str) or not query.strip():
+        return _error(400, "query is required")
+
+    k = _parse_k(raw_k)
+    if rewrite:
+        results = await _run_speculative(request, query, k)
+    else:
+        results = await _run(request, recommend, query, k)
+    return web.json_response(format_response(query, results))
+
+
+async def handle_recommend_batch(request):
+    body = await _read_json(request)
+    queries = body.get("queries")
+
+    if (
+        not isinstance(queries, list)
+        or not queries
+        or not all(isinstance(q, str) and q.strip() for q in queries)
+    ):
+        return _error(400, "queries must be a non-empty list of strings")
+    if len(queries) > MAX_BATCH_QUERIES:
+        return _error(413, f"at most {MAX_BATCH_QUERIES} queries per batch")
+
+    k = _parse_k(body.get("k"))
+    all_results = await _run(request, recommend_batch, queries, k)
+    return web.json_response({
+        "results": [
+            format_response(q, results) for q, results in zip(queries, all_results)
+        ]
+    })
+
+
+async def handle_health(request):
+    ready = is_ready()
+    limiter = request.app[LIMITER_KEY]
+    rewriter = get_rewriter()
+    return web.json_response(
+        {
+            "status": "ok" if ready else "loading",
+            "ready": ready,
+            "pending": limiter.pending,
+            "max_pending": limiter.max_pending,
+            "rewriter": rewriter.stats() if rewriter else None,
+        },
+        # Keep the load balancer away until the model is warm
+        status=200 if ready else 503,
+    )
+
+
+async def handle_metrics(request):
+    return web.Response(
+        text=tracing.prometheus_text(),
+        content_type="text/plain",
+        headers={"X-Prometheus-Format": "0.0.4"},
+    )
+
+
+@web.middleware
+async def json_errors(request, handler):
+    try:
+        return await handler(request)
+    except web.HTTPException as exc:
+        if exc.status < 400:
+            raise
+        return _error(exc.status, exc.reason, **{
+            k: v for k, v in exc.headers.items() if k == "Retry-After"
+        })
+
+
+def create_app(executor_workers=DEFAULT_EXECUTOR_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+               metrics=True):
+    if metrics:
+        tracing.enable()
+
+    app = web.Application(middlewares=[json_errors])
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(
+        max_workers=executor_workers, thread_name_prefix="recommend"
+    )
+    app[LIMITER_KEY] = PendingLimiter(max_pending)
+
+    app.router.add_get("/recommend", handle_recommend)
+    app.router.add_post("/recommend", handle_recommend)
+    app.router.add_post("/recommend/batch", handle_recommend_batch)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+
+    async def on_startup(app):
+        # Warm in the background: /health reports 503 until ready
+        app[EXECUTOR_KEY].submit(warm_up)
+        app[EXECUTOR_KEY].submit(get_rewriter)
+
+    async def on_cleanup(app):
+        app[EXECUTOR_KEY].shutdown(wait=False, cancel_futures=True)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def add_app_arguments(parser):
+    """
+    Options shared by this server and the pre-fork launcher (api/prefork.py)
+    """
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--executor-workers", type=int, default=DEFAULT_EXECUTOR_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING)
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="disable stage tracing (/metrics then only reports caches)")
+    parser.add_argument("--metrics-log-interval", type=float, default=0,
+                        help="also log a JSON metrics line every N seconds (0 = off)")
+    parser.add_argument("--profile-slow", action="store_true",
+                        help="sample stacks and keep folded profiles of slow requests")
+    parser.add_argument("--slow-ms", type=float, default=tracing.SLOW_REQUEST_MS,
+                        help="requests slower than this log a stage breakdown")
+
+
+def configure(args):
+    """
+    Logging / tracing setup; starts threads, so in pre-fork mode it
+    runs in each worker after the fork
+    """
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    tracing.set_slow_request_ms(args.slow_ms)
+    if args.profile_slow:
+        tracing.enable_profiler()
+    if args.metrics_log_interval > 0:
+        tracing.start_log_reporter(args.metrics_log_interval)
+
+
+def app_from_args(args):
+    return create_app(args.executor_workers, args.max_pending, metrics=not args.no_metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SHL recommendation HTTP API")
+    add_app_arguments(parser)
+    args = parser.parse_args()
+
+    configure(args)
+    web.run_app(app_from_args(args), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
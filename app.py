@@ -1,5 +1,5 @@
 import streamlit as st
-from retrieval.retrieve_and_rank import recommend
+from retrieval.retrieve_and_rank import recommend, warm_up, is_ready
 
 st.set_page_config(
     page_title="SHL Assessment Recommendation Engine",
@@ -12,6 +12,9 @@ st.write(
     "job descriptions or hiring requirements."
 )
 
+# Load index + embedding model once per process, off the request path
+warm_up(background=True)
+
 # ---------------- API MODE ----------------
 query_param = st.query_params.get("query")
 
@@ -34,6 +37,9 @@ if query_param:
 # ---------------- UI MODE ----------------
 st.subheader("Job Description / Hiring Query")
 
+if not is_ready():
+    st.caption("⏳ Loading embedding model in the background...")
+
 user_query = st.text_area(
     "Enter a JD or hiring query",
     height=180
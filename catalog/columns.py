@@ -0,0 +1,168 @@
+import re
+
+import numpy as np
+
+COLUMNS_FILE = "columns.npz"
+
+# SHL test type codes; bit i of the type mask = TEST_TYPE_CODES[i]
+TEST_TYPE_CODES = "ABCDEKPS"
+TEST_TYPE_NAMES = {
+    "A": "Ability & Aptitude",
+    "B": "Biodata & Situational Judgement",
+    "C": "Competencies",
+    "D": "Development & 360",
+    "E": "Assessment Exercises",
+    "K": "Knowledge & Skills",
+    "P": "Personality & Behavior",
+    "S": "Simulations",
+}
+# Word stems that identify a type in free text (pages and queries)
+TEST_TYPE_KEYWORDS = {
+    "A": ("ability", "aptitude", "cognitive", "reasoning"),
+    "B": ("biodata", "situational"),
+    "C": ("competenc",),
+    "D": ("360",),
+    "E": ("exercise",),
+    "K": ("knowledge", "skill", "technical"),
+    "P": ("personality", "behavio"),
+    "S": ("simulation",),
+}
+
+# Unparseable / missing values; unknowns never fail a filter
+UNKNOWN = -1
+
+# High-level categories used for diversity, in SHL's preferred order;
+# the "category" column stores the index into this tuple
+CATEGORIES = ("skills", "cognitive", "personality", "other")
+
+_MINUTES = re.compile(r"(\d+(?:\.\d+)?)\s*(hours?|hrs?|minutes?|mins?)?", re.I)
+
+
+def type_bit(code):
+    return 1 << TEST_TYPE_CODES.index(code)
+
+
+def parse_duration(text):
+    """
+    Assessment length in minutes from the scraped duration text
+    ("Approximate Completion Time in minutes = 30", "1 hour"),
+    UNKNOWN for "Untimed" / "Variable" / empty
+    """
+    match = _MINUTES.search(text or "")
+    if not match:
+        return UNKNOWN
+
+    value = float(match.group(1))
+    if (match.group(2) or "").lower().startswith(("hour", "hr")):
+        value *= 60
+    return int(min(round(value), np.iinfo(np.int16).max))
+
+
+def parse_test_types(text):
+    """
+    Type bitmask from letter codes ("K", "A B P") or type names
+    """
+    text = text or ""
+    mask = 0
+
+    for token in re.findall(r"\b[A-Z]\b", text):
+        if token in TEST_TYPE_CODES:
+            mask |= type_bit(token)
+
+    lowered = text.lower()
+    for code, stems in TEST_TYPE_KEYWORDS.items():
+        if any(stem in lowered for stem in stems):
+            mask |= type_bit(code)
+
+    return mask
+
+
+def categorize_assessment(test_type: str):
+    """
+    Map raw test type text into high-level categories
+    """
+    if not test_type:
+        return "other"
+
+    t = test_type.lower()
+
+    if "cognitive" in t or "ability" in t or "aptitude" in t:
+        return "cognitive"
+    if "personality" in t or "behavior" in t:
+        return "personality"
+    if "skill" in t or "knowledge" in t or "technical" in t:
+        return "skills"
+
+    return "other"
+
+
+def parse_flag(text):
+    """
+    Yes / No support flags -> 1 / 0, UNKNOWN otherwise
+    """
+    words = (text or "").strip().lower().split()
+    first = words[0].strip(".,:;") if words else ""
+    if first in ("yes", "y", "true", "1", "✓", "●"):
+        return 1
+    if first in ("no", "n", "false", "0", "✗"):
+        return 0
+    return UNKNOWN
+
+
+def build_columns(records):
+    """
+    Compact typed columns, one entry per metadata row
+    """
+    return {
+        "duration": np.array(
+            [parse_duration(r.get("duration")) for r in records], dtype="int16"
+        ),
+        "test_types": np.array(
+            [parse_test_types(r.get("test_type")) for r in records], dtype="uint8"
+        ),
+        "remote_support": np.array(
+            [parse_flag(r.get("remote_support")) for r in records], dtype="int8"
+        ),
+        "adaptive_support": np.array(
+            [parse_flag(r.get("adaptive_support")) for r in records], dtype="int8"
+        ),
+        "category": np.array(
+            [CATEGORIES.index(categorize_assessment(r.get("test_type"))) for r in records],
+            dtype="uint8",
+        ),
+    }
+
+
+def save_columns(columns, path):
+    # File object: np.savez would append ".npz" to a temp path
+    with open(path, "wb") as f:
+        np.savez(f, **columns)
+
+
+def load_columns(path):
+    with np.load(path) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+
+def filter_rows(columns, constraints):
+    """
+    Boolean row mask of assessments satisfying every constraint
+    (max_duration / min_duration / test_types / remote / adaptive).
+    Rows whose value is unknown are kept.
+    """
+    duration = columns["duration"]
+    mask = np.ones(len(duration), dtype=bool)
+
+    if constraints.get("max_duration") is not None:
+        mask &= (duration == UNKNOWN) | (duration <= constraints["max_duration"])
+    if constraints.get("min_duration") is not None:
+        mask &= (duration == UNKNOWN) | (duration >= constraints["min_duration"])
+    if constraints.get("test_types"):
+        types = columns["test_types"]
+        mask &= (types == 0) | ((types & constraints["test_types"]) != 0)
+    if constraints.get("remote"):
+        mask &= columns["remote_support"] != 0
+    if constraints.get("adaptive"):
+        mask &= columns["adaptive_support"] != 0
+
+    return mask
@@ -0,0 +1,54 @@
+import re
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+
+# Fixed namespace so the same URL always maps to the same assessment ID
+SHL_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://www.shl.com/")
+
+_HOST = re.compile(r"https?://[^/]+")
+_LOCALE = re.compile(r"^/en/")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_url(url):
+    """
+    Canonical form of an assessment URL:
+    https, lower-case host, no query/fragment, no trailing slash
+    """
+    url = (url or "").strip()
+    if url.startswith("/"):
+        url = "https://www.shl.com" + url
+
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/")
+
+    return urlunsplit(("https", parts.netloc.lower(), path, "", ""))
+
+
+def normalize_slug(url):
+    """
+    Loose assessment key used to match labeled URLs against the
+    catalogue: last path segment without "-new", digits or hyphens
+    ("/en/products/.../java-8-new/" -> "java")
+    """
+    if not url:
+        return ""
+
+    path = _LOCALE.sub("/", _HOST.sub("", url.lower()))
+    slug = path.strip("/").split("/")[-1]
+    slug = _DIGITS.sub("", slug.replace("-new", ""))
+    return slug.replace("-", "")
+
+
+def assessment_id_for_url(url):
+    """
+    Deterministic assessment ID (UUIDv5 of the normalized URL)
+    """
+    return str(uuid.uuid5(SHL_NAMESPACE, normalize_url(url)))
+
+
+def faiss_id_for(assessment_id):
+    """
+    Map an assessment UUID to a non-negative int64 FAISS ID
+    """
+    return uuid.UUID(assessment_id).int >> 65
@@ -0,0 +1,274 @@
+"""
+Offline skill / role extractor.
+
+Catalogue assessment names plus the alias taxonomy in
+data/skill_aliases.json ("js" -> "JavaScript", "core java" -> "Core
+Java") are compiled into an Aho-Corasick automaton over word tokens at
+index-build time. A job description is tokenized and scanned once,
+left to right, and every known alias maps to its canonical term; the
+terms expand the query for both the encoder and BM25, without the LLM
+rewrite's network round trip.
+"""
+
+import os
+import re
+import json
+import hashlib
+from collections import deque
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ALIASES_PATH = os.path.join(PROJECT_ROOT, "data", "skill_aliases.json")
+SKILLS_FILE = "skills.json"
+
+# Catalogue names longer than this rarely appear verbatim in a JD
+MAX_NAME_WORDS = 4
+# Cap on the terms prepended to a query (keeps the encoder window for the JD)
+MAX_EXPANSION_TERMS = 12
+
+KINDS = ("skill", "role", "assessment")
+
+# "(New)", "(Entry Level)", "(R1)"; " - Essentials"; trailing versions
+_PARENS = re.compile(r"\([^)]*\)")
+_SUFFIX = re.compile(r"\s+[-–]\s+.*$")
+_VERSION = re.compile(r"(\s+v?\d+(\.\d+)*)+$", re.I)
+# Words keep "+" / "#" ("c++", "c#"); other punctuation is a token of
+# its own, so "node.js" and "pl/sql" match as token sequences and whole
+# tokens never match inside longer words ("java" vs "javascript")
+_TOKEN = re.compile(r"[a-z0-9+#]+|[^\sa-z0-9+#]")
+
+
+def tokenize(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+def clean_catalog_name(name):
+    """
+    Searchable form of an assessment name
+    ("Core Java (Entry Level) (New)" -> "Core Java",
+    "Microsoft Excel 365 - Essentials (New)" -> "Microsoft Excel")
+    """
+    name = _PARENS.sub(" ", name or "")
+    name = _SUFFIX.sub("", " ".join(name.split()))
+    return _VERSION.sub("", name).strip()
+
+
+def load_taxonomy(path=ALIASES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def taxonomy_hash(path=ALIASES_PATH):
+    """
+    Content hash recorded in the manifest so taxonomy edits trigger a rebuild
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher over token sequences.
+
+    delta holds, per state, the goto transitions merged with those
+    inherited through failure links, except transitions out of the
+    root (looked up as the fallback), so scanning is one dict lookup
+    per token and the table stays small.
+    outputs: state -> pattern ids ending there (failure chain included).
+    """
+
+    def __init__(self, delta, outputs, lengths):
+        self.delta = delta
+        self.outputs = outputs
+        self.lengths = lengths
+
+    @property
+    def num_states(self):
+        return len(self.delta)
+
+    @classmethod
+    def build(cls, patterns):
+        goto = [{}]
+        outputs = [[]]
+        for pid, pattern in enumerate(patterns):
+            state = 0
+            for token in pattern:
+                nxt = goto[state].get(token)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][token] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(pid)
+
+        fail = [0] * len(goto)
+        delta = [dict(g) for g in goto]
+        queue = deque(goto[0].values())
+
+        # Breadth-first: a state's failure target is shallower, so its
+        # transitions and outputs are complete by the time they are merged
+        while queue:
+            state = queue.popleft()
+            if fail[state]:
+                for token, target in delta[fail[state]].items():
+                    delta[state].setdefault(token, target)
+                outputs[state].extend(outputs[fail[state]])
+
+            for token, nxt in goto[state].items():
+                target = delta[fail[state]].get(token) if fail[state] else None
+                if target is None:
+                    target = goto[0].get(token, 0)
+                fail[nxt] = target
+                queue.append(nxt)
+
+        return cls(
+            delta,
+            {s: tuple(out) for s, out in enumerate(outputs) if out},
+            [len(p) for p in patterns],
+        )
+
+    def iter_matches(self, tokens):
+        """
+        (start, end, pattern id) for every occurrence, in one pass
+        """
+        delta, outputs, lengths = self.delta, self.outputs, self.lengths
+        root = delta[0]
+        state = 0
+
+        for end, token in enumerate(tokens, 1):
+            nxt = delta[state].get(token)
+            state = nxt if nxt is not None else root.get(token, 0)
+            if state in outputs:
+                for pid in outputs[state]:
+                    yield end - lengths[pid], end, pid
+
+    def to_dict(self):
+        return {
+            "delta": self.delta,
+            "outputs": {str(s): list(out) for s, out in self.outputs.items()},
+            "lengths": self.lengths,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["delta"],
+            {int(s): tuple(out) for s, out in data["outputs"].items()},
+            data["lengths"],
+        )
+
+
+class SkillExtractor:
+    """
+    Canonical skill / role / assessment terms found in free text
+    """
+
+    def __init__(self, automaton, terms, kinds, pattern_terms):
+        self.automaton = automaton
+        self.terms = terms
+        self.kinds = kinds
+        self.pattern_terms = pattern_terms
+
+    @classmethod
+    def build(cls, names, taxonomy=None):
+        """
+        names: catalogue assessment names; taxonomy: parsed alias file
+        ({"skills": {canonical: [aliases]}, "roles": {...}, "ignore": [...]})
+        """
+        taxonomy = taxonomy or {}
+        ignore = {tuple(tokenize(p)) for p in taxonomy.get("ignore", [])}
+        terms, kinds, term_ids = [], [], {}
+        patterns = {}
+
+        def add(canonical, kind, aliases):
+            for alias in (canonical, *aliases):
+                pattern = tuple(tokenize(alias))
+                # First writer wins: taxonomy entries take precedence
+                if not pattern or pattern in ignore or pattern in patterns:
+                    continue
+                if canonical not in term_ids:
+                    term_ids[canonical] = len(terms)
+                    terms.append(canonical)
+                    kinds.append(KINDS.index(kind))
+                patterns[pattern] = term_ids[canonical]
+
+        for canonical, aliases in taxonomy.get("skills", {}).items():
+            add(canonical, "skill", aliases)
+        for canonical, aliases in taxonomy.get("roles", {}).items():
+            add(canonical, "role", aliases)
+        for name in names:
+            cleaned = clean_catalog_name(name)
+            if cleaned and len(cleaned.split()) <= MAX_NAME_WORDS:
+                add(cleaned, "assessment", ())
+
+        pattern_list = list(patterns)
+        return cls(
+            AhoCorasick.build(pattern_list),
+            terms,
+            kinds,
+            [patterns[p] for p in pattern_list],
+        )
+
+    @property
+    def num_patterns(self):
+        return len(self.pattern_terms)
+
+    def extract(self, text, kinds=None):
+        """
+        Canonical terms in order of first mention. Overlapping matches
+        resolve leftmost-longest ("core java" beats "java").
+        """
+        matches = list(self.automaton.iter_matches(tokenize(text)))
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+
+        found = {}
+        covered = 0
+        for start, end, pid in matches:
+            if start < covered:
+                continue
+            covered = end
+            term = self.pattern_terms[pid]
+            if kinds is None or KINDS[self.kinds[term]] in kinds:
+                found.setdefault(term, None)
+
+        return [self.terms[t] for t in found]
+
+    def expand(self, text, max_terms=MAX_EXPANSION_TERMS):
+        """
+        Query with the extracted terms prepended, so they survive
+        encoder truncation and add alias-resolved tokens for BM25
+        (no label: words like "skills" would match catalogue names)
+        """
+        terms = self.extract(text)[:max_terms]
+        if not terms:
+            return text
+        return f"{', '.join(terms)}.\n{text}"
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "terms": self.terms,
+                    "kinds": self.kinds,
+                    "pattern_terms": self.pattern_terms,
+                    "automaton": self.automaton.to_dict(),
+                },
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            AhoCorasick.from_dict(data["automaton"]),
+            data["terms"],
+            data["kinds"],
+            data["pattern_terms"],
+        )
@@ -0,0 +1,129 @@
+"""
+Columnar catalogue snapshot.
+
+The catalogue is stored as an uncompressed Arrow IPC file
+(data/shl_catalog.arrow) with a fixed schema and stable assessment IDs.
+Readers memory-map it, so opening the snapshot is zero-copy and only
+the columns actually touched are paged in. The pretty-printed JSON
+(data/shl_catalog_raw.json) is kept as an export for humans and diffs.
+"""
+
+import os
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from catalog.ids import assessment_id_for_url
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CATALOG_ARROW_PATH = os.path.join(PROJECT_ROOT, "data", "shl_catalog.arrow")
+CATALOG_JSON_PATH = os.path.join(PROJECT_ROOT, "data", "shl_catalog_raw.json")
+
+# Bump when the schema changes
+SNAPSHOT_FORMAT_VERSION = 1
+
+FIELDS = (
+    "assessment_id",
+    "name",
+    "url",
+    "description",
+    "test_type",
+    "duration",
+    "remote_support",
+    "adaptive_support",
+)
+
+SCHEMA = pa.schema(
+    [pa.field(name, pa.string(), nullable=False) for name in FIELDS],
+    metadata={"format_version": str(SNAPSHOT_FORMAT_VERSION)},
+)
+
+
+def table_from_frame(df):
+    """
+    Normalized, de-duplicated snapshot table from a frame whose
+    columns are (a subset of) FIELDS; column-wise, no per-row loop
+    except the UUIDv5 of each distinct URL
+    """
+    columns = {
+        name: (
+            df[name].fillna("").astype(str).str.strip()
+            if name in df.columns else pd.Series("", index=df.index)
+        )
+        for name in FIELDS if name != "assessment_id"
+    }
+    frame = pd.DataFrame(columns)
+    frame = frame[(frame["name"] != "") & (frame["url"] != "")]
+
+    relative = frame["url"].str.startswith("/")
+    frame.loc[relative, "url"] = "https://www.shl.com" + frame.loc[relative, "url"]
+
+    urls = frame["url"].unique()
+    ids = dict(zip(urls, map(assessment_id_for_url, urls)))
+    frame.insert(0, "assessment_id", frame["url"].map(ids))
+
+    # One row per ID: position of the first occurrence, fields of the last
+    order = frame["assessment_id"].drop_duplicates(keep="first")
+    latest = frame.drop_duplicates("assessment_id", keep="last")
+    frame = latest.set_index("assessment_id", drop=False).loc[order]
+
+    return pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+
+
+def table_from_records(records):
+    """
+    Snapshot table from catalogue dicts (scraper output, JSON export)
+    """
+    return table_from_frame(pd.DataFrame.from_records(list(records)))
+
+
+def write_snapshot(table, path=CATALOG_ARROW_PATH, source=None):
+    """
+    Write the table as an Arrow IPC file (temp file + rename).
+    source: optional provenance (input file, column mapping) kept in
+    the schema metadata.
+    """
+    metadata = dict(SCHEMA.metadata)
+    if source:
+        metadata[b"source"] = json.dumps(source, ensure_ascii=False).encode("utf-8")
+    table = table.cast(SCHEMA).replace_schema_metadata(metadata)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        # No compression: compressed buffers cannot be memory-mapped
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def open_snapshot(path=CATALOG_ARROW_PATH, columns=None):
+    """
+    Memory-mapped, read-only table; `columns` selects a subset
+    without reading the others
+    """
+    source = pa.memory_map(path, "r")
+    table = ipc.open_file(source).read_all()
+
+    version = (table.schema.metadata or {}).get(b"format_version", b"").decode()
+    if version != str(SNAPSHOT_FORMAT_VERSION):
+        raise ValueError(
+            f"❌ {path} has snapshot format {version or '?'}, "
+            f"expected {SNAPSHOT_FORMAT_VERSION}; re-run load_catalog_snapshot.py"
+        )
+
+    return table.select(list(columns)) if columns else table
+
+
+def read_records(path=CATALOG_ARROW_PATH, columns=None):
+    """
+    Catalogue as a list of dicts (same shape as the JSON export)
+    """
+    return open_snapshot(path, columns).to_pylist()
+
+
+def export_json(table, path=CATALOG_JSON_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(table.to_pylist(), f, indent=2, ensure_ascii=False)
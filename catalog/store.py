@@ -0,0 +1,322 @@
+"""
+Compact in-memory catalogue.
+
+Instead of one dict per record, text fields are packed Arrow-style
+(one UTF-8 buffer plus an offsets array per column; taken zero-copy
+from an Arrow snapshot when there is one). Assessment ID, canonical
+URL and normalized slug each get an open-addressing hash index over
+64-bit key fingerprints in NumPy tables, so lookups are O(1) without a
+dict of Python strings. Records come back as AssessmentView objects
+that read fields from the columns on demand.
+"""
+
+import hashlib
+
+import numpy as np
+import pyarrow as pa
+
+from catalog.ids import normalize_url, normalize_slug, faiss_id_for
+
+# Row-number slots; -1 = empty
+_EMPTY = -1
+
+
+class StringColumn:
+    """
+    Immutable string column: UTF-8 bytes + (n + 1) offsets
+    """
+
+    __slots__ = ("data", "offsets", "_bounds")
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        # Scalar reads through a memoryview avoid numpy scalar boxing
+        self._bounds = memoryview(offsets)
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [(v or "").encode("utf-8") for v in values]
+        lengths = np.fromiter(map(len, encoded), dtype="int64", count=len(encoded))
+        total = int(lengths.sum())
+        offsets = np.zeros(len(encoded) + 1, dtype="int32" if total < 2**31 else "int64")
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(b"".join(encoded), offsets)
+
+    @classmethod
+    def from_arrow(cls, array):
+        """
+        Wrap an Arrow string array's buffers without copying
+        (nulls become "")
+        """
+        if isinstance(array, pa.ChunkedArray):
+            array = array.combine_chunks()
+        if array.null_count:
+            array = array.fill_null("")
+
+        offset_type = "int64" if pa.types.is_large_string(array.type) else "int32"
+        _, offsets, data = array.buffers()
+        offsets = np.frombuffer(offsets, dtype=offset_type)[
+            array.offset:array.offset + len(array) + 1
+        ]
+        return cls(memoryview(data) if data is not None else b"", offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        bounds = self._bounds
+        if row < 0:
+            row += len(bounds) - 1
+        return str(self.data[bounds[row]:bounds[row + 1]], "utf-8")
+
+    def __iter__(self):
+        data = self.data
+        bounds = self.offsets.tolist()
+        for start, end in zip(bounds, bounds[1:]):
+            yield str(data[start:end], "utf-8")
+
+    @property
+    def nbytes(self):
+        return len(self.data) + self.offsets.nbytes
+
+
+def fingerprint(key):
+    """
+    Stable 64-bit key hash (same in every process, unlike hash())
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class HashIndex:
+    """
+    Key -> first row holding it. Open addressing with linear probing;
+    the table holds row numbers and each row's 64-bit key fingerprint
+    stands in for the key (a false match needs a blake2b collision),
+    so no key strings are kept.
+    """
+
+    __slots__ = ("fingerprints", "slots", "mask", "_fingerprints", "_slots")
+
+    def __init__(self, fingerprints, slots):
+        self.fingerprints = fingerprints
+        self.slots = slots
+        self.mask = len(slots) - 1
+        self._fingerprints = memoryview(fingerprints)
+        self._slots = memoryview(slots)
+
+    @classmethod
+    def build(cls, keys):
+        """
+        Returns (index, first_rows) where first_rows[i] is the row of
+        the first occurrence of keys[i]
+        """
+        fingerprints = [fingerprint(key) for key in keys]
+        # Power-of-two table at most half full
+        size = 1 << max(3, (2 * len(fingerprints) - 1).bit_length())
+        mask = size - 1
+        slots = [_EMPTY] * size
+        first_rows = np.empty(len(fingerprints), dtype="int64")
+
+        for row, fp in enumerate(fingerprints):
+            i = fp & mask
+            while slots[i] != _EMPTY and fingerprints[slots[i]] != fp:
+                i = (i + 1) & mask
+            if slots[i] == _EMPTY:
+                slots[i] = row
+            first_rows[row] = slots[i]
+
+        dtype = "int32" if len(fingerprints) < 2**31 else "int64"
+        index = cls(
+            np.array(fingerprints, dtype="uint64"), np.array(slots, dtype=dtype)
+        )
+        return index, first_rows
+
+    def get(self, key):
+        """
+        Row for `key`, or -1
+        """
+        fingerprints, slots, mask = self._fingerprints, self._slots, self.mask
+        fp = fingerprint(key)
+        i = fp & mask
+        while True:
+            row = slots[i]
+            if row == _EMPTY or fingerprints[row] == fp:
+                return row
+            i = (i + 1) & mask
+
+    @property
+    def nbytes(self):
+        return self.fingerprints.nbytes + self.slots.nbytes
+
+
+class AssessmentView:
+    """
+    Read-only, dict-like view of one catalogue row (no copy)
+    """
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, field):
+        return self.store.value(field, self.row)
+
+    def __getattr__(self, field):
+        try:
+            return self.store.value(field, self.row)
+        except KeyError:
+            raise AttributeError(field) from None
+
+    def get(self, field, default=None):
+        try:
+            return self.store.value(field, self.row)
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.store.fields
+
+    def to_dict(self):
+        return {field: self[field] for field in self.store.fields}
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, AssessmentView)
+            and other.store is self.store and other.row == self.row
+        )
+
+    def __hash__(self):
+        return hash((id(self.store), self.row))
+
+    def __repr__(self):
+        return f"AssessmentView(row={self.row}, name={self['name']!r})"
+
+
+class CatalogStore:
+    """
+    Catalogue rows (metadata / snapshot order) with columnar storage
+    and ID / URL / slug hash indexes
+    """
+
+    def __init__(self, columns, faiss_ids=None):
+        self.columns = columns
+        self.fields = tuple(columns) + ("faiss_id",)
+        if faiss_ids is None:
+            faiss_ids = [faiss_id_for(a) for a in columns["assessment_id"]]
+        self.faiss_ids = np.asarray(faiss_ids, dtype="int64")
+
+        urls = list(columns["url"])
+        self._by_id, _ = HashIndex.build([a.lower() for a in columns["assessment_id"]])
+        self._by_url, _ = HashIndex.build([normalize_url(u) for u in urls])
+        self._by_slug, first_rows = HashIndex.build([normalize_slug(u) for u in urls])
+
+        # Dense slug ids in order of first appearance; rows whose URLs
+        # normalize to the same slug share one
+        is_first = first_rows == np.arange(len(first_rows))
+        self.slug_ids = (np.cumsum(is_first) - 1)[first_rows].astype("int32")
+        self.num_slugs = int(is_first.sum())
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        From metadata / catalogue dicts (every record has the same keys)
+        """
+        records = list(records)
+        fields = [f for f in (records[0] if records else ()) if f != "faiss_id"]
+        for required in ("assessment_id", "url"):
+            if required not in fields:
+                fields.append(required)
+
+        columns = {
+            field: StringColumn.from_strings(
+                str(r.get(field) or "") for r in records
+            )
+            for field in fields
+        }
+        faiss_ids = (
+            [r["faiss_id"] for r in records]
+            if records and "faiss_id" in records[0] else None
+        )
+        return cls(columns, faiss_ids)
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        From an Arrow table (e.g. catalog.snapshot.open_snapshot());
+        string columns are wrapped in place
+        """
+        columns = {
+            name: StringColumn.from_arrow(table.column(name))
+            for name in table.column_names
+            if pa.types.is_string(table.schema.field(name).type)
+            or pa.types.is_large_string(table.schema.field(name).type)
+        }
+        faiss_ids = (
+            table.column("faiss_id").to_numpy()
+            if "faiss_id" in table.column_names else None
+        )
+        return cls(columns, faiss_ids)
+
+    def __len__(self):
+        return len(self.faiss_ids)
+
+    def __getitem__(self, row):
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return AssessmentView(self, int(row) % len(self))
+
+    def __iter__(self):
+        return (AssessmentView(self, row) for row in range(len(self)))
+
+    def column(self, field):
+        return self.columns[field]
+
+    def value(self, field, row):
+        if field == "faiss_id":
+            return int(self.faiss_ids[row])
+        return self.columns[field][row]
+
+    # -------------------------------
+    # Lookups (row number, -1 if absent)
+    # -------------------------------
+    def row_for_id(self, assessment_id):
+        return self._by_id.get((assessment_id or "").strip().lower())
+
+    def row_for_url(self, url):
+        return self._by_url.get(normalize_url(url))
+
+    def row_for_slug(self, slug_or_url):
+        """
+        First row whose normalized slug matches; accepts a URL or a slug
+        (normalize_slug leaves already-normalized slugs unchanged)
+        """
+        return self._by_slug.get(normalize_slug(slug_or_url))
+
+    def _view(self, row):
+        return AssessmentView(self, row) if row != _EMPTY else None
+
+    def by_id(self, assessment_id):
+        return self._view(self.row_for_id(assessment_id))
+
+    def by_url(self, url):
+        return self._view(self.row_for_url(url))
+
+    def by_slug(self, slug_or_url):
+        return self._view(self.row_for_slug(slug_or_url))
+
+    def nbytes(self):
+        """
+        Bytes held by columns and index tables (buffers shared with an
+        Arrow snapshot included)
+        """
+        indexes = (self._by_id, self._by_url, self._by_slug)
+        return (
+            sum(c.nbytes for c in self.columns.values())
+            + self.faiss_ids.nbytes
+            + self.slug_ids.nbytes
+            + sum(ix.nbytes for ix in indexes)
+        )
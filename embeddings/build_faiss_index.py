@@ -1,15 +1,67 @@
-import json
+import sys
 import os
+
+# --------------------------------------------------
+# Ensure project root is on PYTHONPATH
+# --------------------------------------------------
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import json
+import time
+import hashlib
+import argparse
 import faiss
 import numpy as np
 
-from embedding_utils import EmbeddingModel
+from embeddings.embedding_utils import (
+    EmbeddingModel,
+    DEFAULT_MODEL_NAME,
+    ENCODER_BACKENDS,
+)
+from embeddings.index_factory import (
+    INDEX_BACKENDS,
+    DEFAULT_INDEX_CONFIG,
+    resolve_index_config,
+    describe_index_config,
+    make_index,
+    apply_search_params,
+    supports_removal,
+    config_satisfies,
+    SEARCH_PARAMS,
+)
+from embeddings.lexical_index import LexicalIndex, LEXICAL_FILE
+from catalog.ids import assessment_id_for_url, faiss_id_for
+from catalog.columns import COLUMNS_FILE, build_columns, save_columns, load_columns
+from catalog.skills import (
+    SkillExtractor, SKILLS_FILE, ALIASES_PATH, load_taxonomy, taxonomy_hash
+)
+from catalog.snapshot import CATALOG_ARROW_PATH, read_records
 
 
-DATA_PATH = "data/shl_catalog_raw.json"
-INDEX_DIR = "embeddings/faiss_index"
+DATA_PATH = CATALOG_ARROW_PATH
+INDEX_DIR = os.path.join(PROJECT_ROOT, "embeddings", "faiss_index")
 INDEX_PATH = os.path.join(INDEX_DIR, "index.faiss")
 META_PATH = os.path.join(INDEX_DIR, "metadata.json")
+MANIFEST_PATH = os.path.join(INDEX_DIR, "manifest.json")
+
+# Bump whenever build_document_text changes so stale indexes get rebuilt
+DOC_TEMPLATE_VERSION = 1
+MANIFEST_FORMAT_VERSION = 6
+# Document vectors in metadata row order (for reranking; the ANN index
+# may be compressed or unable to reconstruct them)
+VECTORS_FILE = "embeddings.npy"
+
+# Fields that feed build_document_text; a change in any of them re-embeds the record
+DOCUMENT_FIELDS = (
+    "name",
+    "description",
+    "test_type",
+    "duration",
+    "remote_support",
+    "adaptive_support",
+)
 
 
 def build_document_text(assessment):
@@ -27,48 +79,525 @@ def build_document_text(assessment):
     return "\n".join(parts)
 
 
-def main():
-    print("📥 Loading SHL catalogue...")
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        assessments = json.load(f)
+def catalog_hash(assessments):
+    """
+    Stable content hash of the catalogue snapshot
+    """
+    payload = json.dumps(assessments, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-    print(f"✅ Assessments loaded: {len(assessments)}")
 
-    documents = []
-    metadata = []
+def content_hash(assessment):
+    """
+    Hash of the fields used in build_document_text
+    """
+    payload = json.dumps(
+        [assessment.get(field) or "" for field in DOCUMENT_FIELDS],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def prepare_records(assessments):
+    """
+    Metadata rows (catalogue order, de-duplicated by assessment ID)
+    plus the document text for each assessment ID
+    """
+    records = {}
+    documents = {}
 
     for a in assessments:
-        documents.append(build_document_text(a))
-        metadata.append({
-            "assessment_id": a.get("assessment_id"),
+        assessment_id = a.get("assessment_id") or assessment_id_for_url(a.get("url"))
+        records[assessment_id] = {
+            "assessment_id": assessment_id,
+            "faiss_id": faiss_id_for(assessment_id),
+            "content_hash": content_hash(a),
             "name": a.get("name"),
             "url": a.get("url"),
             "test_type": a.get("test_type"),
             "duration": a.get("duration"),
             "remote_support": a.get("remote_support"),
             "adaptive_support": a.get("adaptive_support")
-        })
+        }
+        documents[assessment_id] = build_document_text(a)
+
+    return list(records.values()), documents
+
+
+def load_catalog(path=DATA_PATH, columns=None):
+    """
+    Catalogue records from the columnar snapshot (memory-mapped; only
+    `columns` are read) or from a JSON export
+    """
+    if not path.endswith(".json"):
+        return read_records(path, columns)
+
+    with open(path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    if columns:
+        records = [{c: r.get(c) for c in columns} for r in records]
+    return records
+
 
-    print("🧠 Generating embeddings (SentenceTransformers)...")
-    embedder = EmbeddingModel()
-    embeddings = embedder.embed_texts(documents)
+def load_manifest(manifest_path=MANIFEST_PATH):
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def index_version(manifest):
+    """
+    Short hash identifying one build of the artifact (changes on every
+    rebuild or incremental update, since the manifest does)
+    """
+    payload = json.dumps(manifest or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def manifest_compatible(manifest, model_name=DEFAULT_MODEL_NAME):
+    """
+    True if an existing index can be updated in place
+    (same artifact format, model and document template)
+    """
+    if not manifest:
+        return False
+
+    return (
+        manifest.get("format_version") == MANIFEST_FORMAT_VERSION
+        and manifest.get("model_name") == model_name
+        and manifest.get("doc_template_version") == DOC_TEMPLATE_VERSION
+    )
+
+
+def manifest_matches(manifest, assessments, model_name=DEFAULT_MODEL_NAME):
+    """
+    True if a persisted manifest describes an index built from
+    this catalogue, model and document template
+    """
+    return (
+        manifest_compatible(manifest, model_name)
+        and manifest.get("catalog_hash") == catalog_hash(assessments)
+    )
+
+
+def _write_atomic(path, write_fn):
+    """
+    Write to a temp file and rename, so concurrent readers never
+    see a half-written artifact
+    """
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    write_fn(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _dump_json(obj, indent=2):
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, indent=indent, ensure_ascii=False)
+    return write
+
+
+def _save_npy(array):
+    def write(path):
+        # File object: np.save would append ".npy" to a temp path
+        with open(path, "wb") as f:
+            np.save(f, np.ascontiguousarray(array, dtype="float32"))
+    return write
+
+
+def _save_artifact(index, records, documents, vectors, assessments, embedder,
+                   index_dir, index_config, changes):
+    # BM25 side is cheap to rebuild, so it is always rebuilt in full
+    lexical = LexicalIndex.build([documents[r["assessment_id"]] for r in records])
+    # Typed filter columns (duration / test type / support flags)
+    columns = build_columns(records)
+    # Skill / alias automaton for offline query expansion
+    skills = SkillExtractor.build(
+        [r["name"] for r in records], load_taxonomy(ALIASES_PATH)
+    )
+
+    manifest = {
+        "format_version": MANIFEST_FORMAT_VERSION,
+        "model_name": embedder.model_name,
+        "encoder_backend": embedder.backend,
+        "encoder_precision": embedder.precision,
+        "dim": int(index.d),
+        "num_vectors": int(index.ntotal),
+        "index_type": f"IndexIDMap({describe_index_config(index_config)})",
+        "index_config": index_config,
+        "lexical": {
+            "file": LEXICAL_FILE,
+            "vocab_size": len(lexical.vocabulary),
+            "k1": lexical.k1,
+            "b": lexical.b,
+        },
+        "columns": {"file": COLUMNS_FILE, "names": sorted(columns)},
+        "skills": {
+            "file": SKILLS_FILE,
+            "num_terms": len(skills.terms),
+            "num_patterns": skills.num_patterns,
+            "num_states": skills.automaton.num_states,
+            "taxonomy_hash": taxonomy_hash(ALIASES_PATH),
+        },
+        "vectors_file": VECTORS_FILE,
+        "catalog_hash": catalog_hash(assessments),
+        "doc_template_version": DOC_TEMPLATE_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "last_update": changes,
+    }
+
+    os.makedirs(index_dir, exist_ok=True)
+
+    _write_atomic(
+        os.path.join(index_dir, "index.faiss"),
+        lambda p: faiss.write_index(index, p)
+    )
+    _write_atomic(os.path.join(index_dir, "metadata.json"), _dump_json(records))
+    _write_atomic(os.path.join(index_dir, LEXICAL_FILE), lexical.save)
+    _write_atomic(
+        os.path.join(index_dir, COLUMNS_FILE),
+        lambda p: save_columns(columns, p)
+    )
+    _write_atomic(os.path.join(index_dir, SKILLS_FILE), skills.save)
+    _write_atomic(os.path.join(index_dir, VECTORS_FILE), _save_npy(vectors))
+    # Manifest goes last: it is the commit marker for the artifact
+    _write_atomic(os.path.join(index_dir, "manifest.json"), _dump_json(manifest))
+
+    return manifest
+
+
+def _embed_records(embedder, records, documents):
+    embeddings = embedder.embed_texts(
+        [documents[r["assessment_id"]] for r in records],
+        show_progress_bar=True
+    )
+    ids = np.array([r["faiss_id"] for r in records], dtype="int64")
+    return embeddings, ids
+
+
+def build_index(assessments, model_name=DEFAULT_MODEL_NAME, index_dir=INDEX_DIR,
+                index_config=None, encoder_backend=None):
+    """
+    Embed the whole catalogue and persist index + metadata + manifest
+    """
+    records, documents = prepare_records(assessments)
+
+    embedder = EmbeddingModel(model_name, backend=encoder_backend or "torch")
+    embeddings, ids = _embed_records(embedder, records, documents)
 
     dim = embeddings.shape[1]
-    print(f"📐 Embedding dimension: {dim}")
+    index_config = resolve_index_config(index_config, dim, len(records))
+
+    # cosine similarity (with normalized vectors), keyed by stable assessment IDs
+    index = faiss.IndexIDMap(make_index(dim, index_config, train_vectors=embeddings))
+    index.add_with_ids(embeddings, ids)
+
+    changes = {"mode": "full", "added": len(records), "changed": 0, "removed": 0}
+    return _save_artifact(
+        index, records, documents, embeddings, assessments, embedder,
+        index_dir, index_config, changes
+    )
+
+
+def update_index(assessments, model_name=DEFAULT_MODEL_NAME, index_dir=INDEX_DIR,
+                 delta=None, index_config=None, encoder_backend=None):
+    """
+    Incrementally bring the persisted index in line with the catalogue:
+    only added / changed records are embedded, deleted ones are removed.
+    A crawl `delta` (added / changed / removed) limits the content-hash
+    comparison to the records it names; additions and removals are
+    always found by ID over the whole catalogue, so a delta that misses
+    a deletion (or a skipped earlier delta) cannot leave stale vectors.
+    An artifact whose vector count disagrees with its metadata is
+    rebuilt in full.
+    Falls back to a full build when the artifact is missing or incompatible,
+    or when `index_config` / `encoder_backend` ask for a different ANN
+    backend, build parameters or query encoder.
+    """
+    index_path = os.path.join(index_dir, "index.faiss")
+    manifest = load_manifest(os.path.join(index_dir, "manifest.json"))
+
+    def full_build(config):
+        return build_index(
+            assessments, model_name=model_name, index_dir=index_dir,
+            index_config=config, encoder_backend=encoder_backend
+        )
+
+    if not os.path.exists(index_path) or not manifest_compatible(manifest, model_name):
+        return full_build(index_config)
+
+    current_encoder = manifest.get("encoder_backend", "torch")
+    if encoder_backend and encoder_backend != current_encoder:
+        return full_build(index_config)
+    encoder_backend = current_encoder
+
+    current_config = manifest.get("index_config") or DEFAULT_INDEX_CONFIG
+    if index_config and not config_satisfies(index_config, current_config):
+        return full_build(index_config)
+
+    # Search knobs can change without rebuilding
+    config = dict(current_config)
+    config.update({
+        k: v for k, v in (index_config or {}).items()
+        if k in SEARCH_PARAMS and v is not None
+    })
+
+    index = faiss.read_index(index_path)
+    with open(os.path.join(index_dir, "metadata.json"), "r", encoding="utf-8") as f:
+        previous_rows = json.load(f)
+    if index.ntotal != len(previous_rows):
+        return full_build(config)
+    previous = {m["assessment_id"]: m for m in previous_rows}
+    previous_vectors = np.load(os.path.join(index_dir, VECTORS_FILE))
+    previous_row = {m["assessment_id"]: i for i, m in enumerate(previous_rows)}
+
+    records, documents = prepare_records(assessments)
+    current_ids = {r["assessment_id"] for r in records}
+
+    candidates = records
+    if delta is not None:
+        touched = {
+            r["assessment_id"]
+            for key in ("added", "changed", "removed")
+            for r in delta.get(key, [])
+        }
+        candidates = [r for r in records if r["assessment_id"] in touched]
+
+    # Membership is cheap, so removals and additions are found over
+    # everything rather than only what the delta names
+    removed = [m for aid, m in previous.items() if aid not in current_ids]
+    changed = [
+        r for r in candidates
+        if r["assessment_id"] in previous
+        and previous[r["assessment_id"]].get("content_hash") != r["content_hash"]
+    ]
+    added = [r for r in records if r["assessment_id"] not in previous]
+
+    if (removed or changed) and not supports_removal(config):
+        return full_build(config)
+
+    stale_ids = np.array(
+        [m["faiss_id"] for m in removed + changed], dtype="int64"
+    )
+    if len(stale_ids):
+        index.remove_ids(stale_ids)
+
+    # Keep the encoder the index was built with (precision included)
+    embedder = EmbeddingModel(
+        model_name,
+        precision=manifest.get("encoder_precision"),
+        backend=encoder_backend,
+    )
+
+    to_embed = changed + added
+    fresh = {}
+    if to_embed:
+        embeddings, ids = _embed_records(embedder, to_embed, documents)
+        index.add_with_ids(embeddings, ids)
+        fresh = {r["assessment_id"]: vec for r, vec in zip(to_embed, embeddings)}
+
+    if index.ntotal != len(records):
+        return full_build(config)
+
+    vectors = np.empty((len(records), index.d), dtype="float32")
+    for row, r in enumerate(records):
+        aid = r["assessment_id"]
+        vectors[row] = fresh[aid] if aid in fresh else previous_vectors[previous_row[aid]]
+
+    changes = {
+        "mode": "incremental",
+        "added": len(added),
+        "changed": len(changed),
+        "removed": len(removed),
+    }
+    apply_search_params(index, config)
+    return _save_artifact(
+        index, records, documents, vectors, assessments, embedder,
+        index_dir, config, changes
+    )
+
+
+def index_up_to_date(manifest, assessments, index_dir=INDEX_DIR,
+                     model_name=DEFAULT_MODEL_NAME, index_config=None,
+                     encoder_backend=None):
+    if not os.path.exists(os.path.join(index_dir, "index.faiss")):
+        return False
+    if not manifest_matches(manifest, assessments, model_name):
+        return False
+    # An edited alias taxonomy only needs the automaton recompiled
+    if manifest.get("skills", {}).get("taxonomy_hash") != taxonomy_hash(ALIASES_PATH):
+        return False
+    if encoder_backend and manifest.get("encoder_backend", "torch") != encoder_backend:
+        return False
+    if not index_config:
+        return True
+
+    current_config = manifest.get("index_config") or DEFAULT_INDEX_CONFIG
+    return config_satisfies(index_config, current_config) and all(
+        current_config.get(k) == v
+        for k, v in index_config.items()
+        if k in SEARCH_PARAMS and v is not None
+    )
+
+
+def ensure_index(data_path=DATA_PATH, index_dir=INDEX_DIR, model_name=DEFAULT_MODEL_NAME,
+                 index_config=None, encoder_backend=None):
+    """
+    Rebuild the persisted index only if its manifest is stale.
+    index_config / encoder_backend = None accept whatever is already on disk.
+    Returns the manifest describing the index on disk.
+    """
+    assessments = load_catalog(data_path)
+    manifest = load_manifest(os.path.join(index_dir, "manifest.json"))
+
+    if index_up_to_date(manifest, assessments, index_dir, model_name,
+                        index_config, encoder_backend):
+        return manifest
+
+    return update_index(
+        assessments, model_name=model_name, index_dir=index_dir,
+        index_config=index_config, encoder_backend=encoder_backend
+    )
+
+
+def read_index(index_dir=INDEX_DIR):
+    """
+    Open the persisted index memory-mapped and read-only so that
+    several worker processes share one page-cached copy
+    """
+    index_path = os.path.join(index_dir, "index.faiss")
+    index = faiss.read_index(
+        index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    )
+
+    manifest = load_manifest(os.path.join(index_dir, "manifest.json")) or {}
+    apply_search_params(index, manifest.get("index_config") or DEFAULT_INDEX_CONFIG)
 
-    print("⚡ Building FAISS index...")
-    index = faiss.IndexFlatIP(dim)  # cosine similarity (with normalized vectors)
-    index.add(embeddings)
+    with open(os.path.join(index_dir, "metadata.json"), "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    return index, metadata
+
+
+def read_lexical_index(index_dir=INDEX_DIR):
+    """
+    Load the BM25 side of the artifact (columns follow metadata rows)
+    """
+    return LexicalIndex.load(os.path.join(index_dir, LEXICAL_FILE))
+
+
+def read_columns(index_dir=INDEX_DIR):
+    """
+    Typed metadata columns (one entry per metadata row) for filtered search
+    """
+    return load_columns(os.path.join(index_dir, COLUMNS_FILE))
+
+
+def read_skill_extractor(index_dir=INDEX_DIR):
+    """
+    Compiled skill / alias automaton used for offline query expansion
+    """
+    return SkillExtractor.load(os.path.join(index_dir, SKILLS_FILE))
+
+
+def read_vectors(index_dir=INDEX_DIR):
+    """
+    Stored document vectors (metadata row order), memory-mapped
+    """
+    return np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+
+
+def parse_index_config(backend, params):
+    """
+    Build an index config from --backend / --param KEY=VALUE flags
+    """
+    if not backend and not params:
+        return None
+
+    config = {"backend": backend or DEFAULT_INDEX_CONFIG["backend"]}
+    for item in params:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"❌ --param expects KEY=VALUE, got '{item}'")
+        config[key.strip()] = int(value)
+
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build / update the FAISS index")
+    parser.add_argument(
+        "--full", action="store_true",
+        help="re-embed the whole catalogue instead of updating incrementally"
+    )
+    parser.add_argument(
+        "--backend", choices=INDEX_BACKENDS,
+        help="ANN backend (default: keep the existing one, flat for new indexes)"
+    )
+    parser.add_argument(
+        "--param", action="append", default=[], metavar="KEY=VALUE",
+        help="backend parameter, e.g. M=32 ef_search=128 nlist=64 nprobe=8 pq_m=16"
+    )
+    parser.add_argument(
+        "--encoder", choices=ENCODER_BACKENDS,
+        help="encoder backend (torch, or onnx = int8 ONNX Runtime); recorded in the manifest"
+    )
+    parser.add_argument(
+        "--delta",
+        help="crawl delta (scraper/scrape_shl.py --incremental) limiting what is re-checked"
+    )
+    args = parser.parse_args()
+
+    index_config = parse_index_config(args.backend, args.param)
+
+    print("📥 Loading SHL catalogue...")
+    assessments = load_catalog()
+
+    print(f"✅ Assessments loaded: {len(assessments)}")
 
-    os.makedirs(INDEX_DIR, exist_ok=True)
+    manifest = load_manifest()
+    if not args.full and index_up_to_date(
+        manifest, assessments, index_config=index_config, encoder_backend=args.encoder
+    ):
+        print("✅ Index is up to date with catalogue (manifest match), skipping build")
+        return
 
-    faiss.write_index(index, INDEX_PATH)
-    with open(META_PATH, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    print("🧠 Generating embeddings and building FAISS index...")
+    if args.full:
+        manifest = build_index(
+            assessments, index_config=index_config, encoder_backend=args.encoder
+        )
+    else:
+        delta = None
+        if args.delta:
+            with open(args.delta, "r", encoding="utf-8") as f:
+                delta = json.load(f)
+        manifest = update_index(
+            assessments, delta=delta, index_config=index_config,
+            encoder_backend=args.encoder
+        )
 
+    changes = manifest["last_update"]
+    print(
+        f"🔁 {changes['mode']} build: +{changes['added']} added, "
+        f"~{changes['changed']} changed, -{changes['removed']} removed"
+    )
+    print(f"📐 Embedding dimension: {manifest['dim']}")
+    print(f"🗂️  Index: {manifest['index_type']}")
+    print(f"🧮 Encoder: {manifest['encoder_backend']} ({manifest['encoder_precision']})")
     print("✅ FAISS index built successfully")
     print(f"📁 Index saved at: {INDEX_PATH}")
     print(f"📁 Metadata saved at: {META_PATH}")
+    print(f"🔤 Lexical index: {manifest['lexical']['vocab_size']} terms (BM25)")
+    print(
+        f"🏷️  Skill extractor: {manifest['skills']['num_patterns']} aliases -> "
+        f"{manifest['skills']['num_terms']} terms"
+    )
+    print(f"📁 Manifest saved at: {MANIFEST_PATH}")
 
 
 if __name__ == "__main__":
@@ -18,10 +18,19 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 import json
+import argparse
 import faiss
 import numpy as np
 
 from embeddings.gemini_embedding_utils import GeminiEmbeddingModel
+from embeddings.index_factory import (
+    INDEX_BACKENDS,
+    resolve_index_config,
+    describe_index_config,
+    make_index,
+    apply_search_params,
+)
+from embeddings.build_faiss_index import parse_index_config
 
 
 DATA_PATH = "data/shl_catalog_raw.json"
@@ -39,6 +48,19 @@ def build_document_text(a):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the Gemini FAISS index")
+    parser.add_argument(
+        "--backend", choices=INDEX_BACKENDS,
+        help="ANN backend (default: flat)"
+    )
+    parser.add_argument(
+        "--param", action="append", default=[], metavar="KEY=VALUE",
+        help="backend parameter, e.g. M=32 ef_search=128 nlist=64 nprobe=8 pq_m=16"
+    )
+    args = parser.parse_args()
+
+    index_config = parse_index_config(args.backend, args.param)
+
     print("📥 Loading SHL catalogue...")
     with open(DATA_PATH, "r", encoding="utf-8") as f:
         assessments = json.load(f)
@@ -55,8 +77,11 @@ def main():
     print(f"📐 Embedding dimension: {dim}")
 
     print("⚡ Building FAISS index...")
-    index = faiss.IndexFlatIP(dim)
+    index_config = resolve_index_config(index_config, dim, len(embeddings))
+    index = make_index(dim, index_config, train_vectors=embeddings)
     index.add(embeddings)
+    apply_search_params(index, index_config)
+    print(f"🗂️  Index: {describe_index_config(index_config)}")
 
     os.makedirs(INDEX_DIR, exist_ok=True)
     faiss.write_index(index, INDEX_PATH)
@@ -0,0 +1,306 @@
+import os
+import time
+import sqlite3
+import hashlib
+import weakref
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
+DEFAULT_DISK_PATH = os.path.join(CACHE_DIR, "query_embeddings.sqlite")
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+# Disk store bound; the oldest rows beyond it are deleted (~1.5 KB per
+# 384-d vector, so ~150 MB)
+DEFAULT_MAX_DISK_ROWS = 100_000
+# Expired / excess rows are pruned on open and after this many writes
+PRUNE_EVERY_ROWS = 1_000
+
+
+def normalize_text(text):
+    """
+    Normalize query text so trivially different inputs
+    (unicode forms, whitespace) share one cache entry
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+
+# Open disk stores; a forked child (api/prefork.py) must not use the
+# parent's SQLite connection, so each store reconnects after fork
+_open_stores = weakref.WeakSet()
+
+
+def _reconnect_after_fork():
+    for store in list(_open_stores):
+        store._reconnect_in_child()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_after_fork)
+
+
+def cache_key(model_id, text):
+    payload = f"{model_id}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    SQLite-backed vector store. WAL mode lets several worker
+    processes read and write the same file concurrently.
+    Bounded by max_rows and (when given) ttl_seconds: expired rows
+    and the oldest rows past max_rows are deleted on open and every
+    PRUNE_EVERY_ROWS writes.
+    """
+
+    def __init__(self, path=DEFAULT_DISK_PATH, max_rows=DEFAULT_MAX_DISK_ROWS,
+                 ttl_seconds=None):
+        self.path = path
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._inherited = []
+        self._writes_since_prune = 0
+        _open_stores.add(self)
+
+        self.enforce_limits()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_created_at ON embeddings (created_at)"
+        )
+        conn.commit()
+        return conn
+
+    def _reconnect_in_child(self):
+        # The parent's connection is kept alive but never touched
+        # (closing it here could release the parent's locks)
+        self._inherited.append(self._conn)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def get_many(self, keys, min_created_at=0.0):
+        """
+        Return {key: (vector, created_at)} for keys found on disk
+        """
+        if not keys:
+            return {}
+
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, created_at, dim, vector FROM embeddings "
+                    f"WHERE key IN ({placeholders}) AND created_at >= ?",
+                    (*chunk, min_created_at),
+                ).fetchall()
+                for key, created_at, dim, blob in rows:
+                    vector = np.frombuffer(blob, dtype="float32", count=dim)
+                    found[key] = (vector, created_at)
+
+        return found
+
+    def put_many(self, items):
+        """
+        items: iterable of (key, vector, created_at)
+        """
+        rows = [
+            (key, created_at, int(vector.shape[0]),
+             np.ascontiguousarray(vector, dtype="float32").tobytes())
+            for key, vector, created_at in items
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, created_at, dim, vector) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._writes_since_prune += len(rows)
+            due = self._writes_since_prune >= PRUNE_EVERY_ROWS
+
+        if due:
+            self.enforce_limits()
+
+    def prune(self, min_created_at):
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM embeddings WHERE created_at < ?", (min_created_at,)
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+    def trim(self, max_rows):
+        """
+        Delete the oldest rows beyond max_rows
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY created_at DESC"
+                " LIMIT -1 OFFSET ?)",
+                (max_rows,),
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+    def enforce_limits(self):
+        """
+        Apply the TTL and row bound; returns the number of rows deleted
+        """
+        with self._lock:
+            self._writes_since_prune = 0
+
+        deleted = 0
+        if self.ttl_seconds:
+            deleted += self.prune(time.time() - self.ttl_seconds)
+        if self.max_rows:
+            deleted += self.trim(self.max_rows)
+        return deleted
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings:
+    in-memory LRU (size + TTL bounded) in front of a persistent disk store
+    """
+
+    def __init__(
+        self,
+        model_id,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        ttl_seconds=DEFAULT_TTL_SECONDS,
+        disk_path=DEFAULT_DISK_PATH,
+        max_disk_rows=DEFAULT_MAX_DISK_ROWS,
+    ):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = (
+            DiskEmbeddingStore(disk_path, max_rows=max_disk_rows, ttl_seconds=ttl_seconds)
+            if disk_path else None
+        )
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _min_created_at(self):
+        if not self.ttl_seconds:
+            return 0.0
+        return time.time() - self.ttl_seconds
+
+    def _remember(self, key, vector, created_at):
+        # Caller holds self._lock
+        self._lru[key] = (vector, created_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, texts):
+        """
+        Look up texts; returns a list with a vector or None per text
+        """
+        keys = [cache_key(self.model_id, t) for t in texts]
+        results = [None] * len(texts)
+        min_created_at = self._min_created_at()
+        pending = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._lru.get(key)
+                if entry is not None and entry[1] < min_created_at:
+                    del self._lru[key]
+                    self.expirations += 1
+                    entry = None
+
+                if entry is not None:
+                    self._lru.move_to_end(key)
+                    results[i] = entry[0]
+                    self.hits += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+
+        if pending and self.disk is not None:
+            found = self.disk.get_many(list(pending), min_created_at)
+            with self._lock:
+                for key, (vector, created_at) in found.items():
+                    self._remember(key, vector, created_at)
+                    for i in pending.pop(key):
+                        results[i] = vector
+                        self.disk_hits += 1
+
+        with self._lock:
+            self.misses += sum(len(idx) for idx in pending.values())
+
+        return results
+
+    def put_many(self, texts, vectors):
+        now = time.time()
+        items = []
+
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(self.model_id, text)
+                vector = np.array(vector, dtype="float32")
+                self._remember(key, vector, now)
+                items.append((key, vector, now))
+
+        if self.disk is not None:
+            self.disk.put_many(items)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._lru),
+                "max_entries": self.max_entries,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
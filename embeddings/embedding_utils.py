@@ -1,6 +1,30 @@
+import os
+import threading
+
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from embeddings.embedding_cache import (
+    EmbeddingCache, DEFAULT_DISK_PATH, DEFAULT_MAX_DISK_ROWS
+)
+from embeddings.onnx_encoder import OnnxEncoder, ensure_onnx_model
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# "torch" = SentenceTransformer, "onnx" = exported graph on ONNX Runtime (CPU)
+ENCODER_BACKENDS = ("torch", "onnx")
+DEFAULT_PRECISION = {"torch": "float32", "onnx": "int8"}
+ONNX_INTRA_OP_THREADS = int(os.getenv("SHL_ONNX_THREADS", "0")) or None
+
+# Query cache for registry models; set SHL_EMBED_CACHE_PATH="" to keep it memory-only
+QUERY_CACHE_PATH = os.getenv("SHL_EMBED_CACHE_PATH", DEFAULT_DISK_PATH)
+QUERY_CACHE_SIZE = 10_000
+QUERY_CACHE_TTL = 7 * 24 * 3600
+QUERY_CACHE_DISK_ROWS = int(os.getenv("SHL_EMBED_CACHE_ROWS", DEFAULT_MAX_DISK_ROWS))
+# Long inputs are split into windows overlapping by this many tokens
+CHUNK_OVERLAP_TOKENS = 32
+WARMUP_TEXTS = ["warm up", "software engineer with java and sql skills"]
+
 
 class EmbeddingModel:
     """
@@ -9,26 +33,203 @@ class EmbeddingModel:
     swap to Gemini later without touching FAISS code
     """
 
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, device=None, precision=None,
+                 backend="torch", intra_op_threads=ONNX_INTRA_OP_THREADS):
+        if backend not in ENCODER_BACKENDS:
+            raise ValueError(f"Unknown encoder backend '{backend}'")
 
-    def embed_texts(self, texts):
-        """
-        Convert list of strings to embeddings
-        """
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend
+        self.precision = precision or DEFAULT_PRECISION[backend]
+        self.cache = None
+
+        if backend == "onnx":
+            quantized = self.precision == "int8"
+            self.model = OnnxEncoder(
+                ensure_onnx_model(model_name, quantize=quantized),
+                quantized=quantized,
+                intra_op_threads=intra_op_threads,
+            )
+        else:
+            self.model = SentenceTransformer(model_name, device=device)
+            if self.precision == "float16":
+                self.model.half()
+
+    @property
+    def model_id(self):
+        return f"{self.model_name}|{self.backend}|{self.precision}"
+
+    def _encode(self, texts, show_progress_bar=False, batch_size=32):
         embeddings = self.model.encode(
             texts,
-            show_progress_bar=True,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
             normalize_embeddings=True
         )
         return np.array(embeddings, dtype="float32")
 
+    def embed_texts(self, texts, show_progress_bar=False, batch_size=32, use_cache=True):
+        """
+        Convert list of strings to embeddings
+        (only cache misses are encoded when a cache is attached)
+        """
+        if self.cache is None or not use_cache:
+            return self._encode(texts, show_progress_bar, batch_size)
+
+        cached = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(
+            t for t, vec in zip(texts, cached) if vec is None
+        ))
+
+        if missing:
+            fresh = self._encode(missing, show_progress_bar, batch_size)
+            self.cache.put_many(missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            cached = [
+                by_text[t] if vec is None else vec
+                for t, vec in zip(texts, cached)
+            ]
+
+        return np.array(cached, dtype="float32")
+
     def embed_query(self, query):
         """
         Embed a single query
         """
-        embedding = self.model.encode(
-            query,
-            normalize_embeddings=True
+        return self.embed_texts([query])
+
+    def chunk_text(self, text, overlap=CHUNK_OVERLAP_TOKENS):
+        """
+        Split text into overlapping token windows that fit the model's
+        sequence limit; returns (chunks, token counts). Short texts
+        come back as a single chunk.
+        """
+        tokenizer = self.model.tokenizer
+        window = self.model.max_seq_length - 2  # room for [CLS] / [SEP]
+
+        offsets = tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True,
+            verbose=False,
+        )["offset_mapping"]
+        if len(offsets) <= window:
+            return [text], [len(offsets)]
+
+        step = window - min(overlap, window // 2)
+        chunks, lengths = [], []
+        for start in range(0, len(offsets), step):
+            end = min(start + window, len(offsets))
+            chunks.append(text[offsets[start][0]:offsets[end - 1][1]])
+            lengths.append(end - start)
+            if end == len(offsets):
+                break
+
+        return chunks, lengths
+
+    def embed_chunked(self, texts, batch_size=32, overlap=CHUNK_OVERLAP_TOKENS):
+        """
+        Encode every window of every text, batching windows of similar
+        token length together to minimise padding.
+        Returns (vectors, owners) where owners[i] is the text index of row i.
+        """
+        chunks, lengths, owners = [], [], []
+        for i, text in enumerate(texts):
+            text_chunks, text_lengths = self.chunk_text(text, overlap)
+            chunks.extend(text_chunks)
+            lengths.extend(text_lengths)
+            owners.extend([i] * len(text_chunks))
+
+        order = np.argsort(lengths, kind="stable")
+        vectors = None
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            bucket_vecs = self.embed_texts(
+                [chunks[i] for i in bucket], batch_size=batch_size
+            )
+            if vectors is None:
+                vectors = np.empty((len(chunks), bucket_vecs.shape[1]), dtype="float32")
+            vectors[bucket] = bucket_vecs
+
+        return vectors, np.array(owners, dtype="int64")
+
+    def warm_up(self):
+        """
+        Run a dummy batch so lazy kernels / allocations happen
+        before the first real query
+        """
+        self.embed_texts(WARMUP_TEXTS, use_cache=False)
+
+
+# -------------------------------
+# Process-wide model registry
+# -------------------------------
+_registry = {}
+_registry_lock = threading.Lock()
+_load_locks = {}
+
+
+def _registry_key(model_name, device, precision, backend):
+    return (model_name, device, precision or DEFAULT_PRECISION[backend], backend)
+
+
+def get_embedding_model(model_name=DEFAULT_MODEL_NAME, device=None, precision=None,
+                        backend="torch"):
+    """
+    Return the shared EmbeddingModel for (model, device, precision, backend).
+    Weights are loaded once per process; concurrent callers wait on
+    the same load instead of each loading their own copy.
+    """
+    key = _registry_key(model_name, device, precision, backend)
+
+    model = _registry.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    with load_lock:
+        # Another thread may have finished loading while we waited
+        model = _registry.get(key)
+        if model is None:
+            model = EmbeddingModel(
+                model_name, device=device, precision=precision, backend=backend
+            )
+            model.cache = EmbeddingCache(
+                model.model_id,
+                max_entries=QUERY_CACHE_SIZE,
+                ttl_seconds=QUERY_CACHE_TTL,
+                disk_path=QUERY_CACHE_PATH or None,
+                max_disk_rows=QUERY_CACHE_DISK_ROWS,
+            )
+            model.warm_up()
+            _registry[key] = model
+
+    return model
+
+
+def is_model_ready(model_name=DEFAULT_MODEL_NAME, device=None, precision=None,
+                   backend="torch"):
+    """
+    True once the model is loaded and warmed up
+    """
+    return _registry_key(model_name, device, precision, backend) in _registry
+
+
+def warm_up_model(model_name=DEFAULT_MODEL_NAME, device=None, precision=None,
+                  backend="torch", background=False):
+    """
+    Load + warm the shared model ahead of the first query.
+    With background=True the load runs in a daemon thread.
+    """
+    if background:
+        thread = threading.Thread(
+            target=get_embedding_model,
+            args=(model_name, device, precision, backend),
+            name="embedding-warmup",
+            daemon=True,
         )
-        return np.array([embedding], dtype="float32")
+        thread.start()
+        return thread
+
+    return get_embedding_model(model_name, device, precision, backend)
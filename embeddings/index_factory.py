@@ -0,0 +1,164 @@
+import math
+
+import faiss
+
+# Backends selectable at build time. All use inner product on
+# normalized vectors (= cosine similarity).
+INDEX_BACKENDS = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8")
+
+DEFAULT_INDEX_CONFIG = {"backend": "flat"}
+
+BACKEND_DEFAULTS = {
+    "flat": {},
+    "hnsw": {"M": 32, "ef_construction": 200, "ef_search": 64},
+    # nlist=None -> derived from the catalogue size at build time
+    "ivf_flat": {"nlist": None, "nprobe": 8},
+    "ivf_pq": {"nlist": None, "nprobe": 8, "pq_m": 16, "pq_nbits": 8},
+    "sq8": {},
+}
+
+# Parameters that only affect search, so they may differ from build time
+SEARCH_PARAMS = ("ef_search", "nprobe")
+
+# FAISS wants ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def resolve_index_config(config, dim, num_vectors):
+    """
+    Fill in backend defaults and size-dependent parameters,
+    returning the exact config recorded in the index manifest
+    """
+    config = dict(config or DEFAULT_INDEX_CONFIG)
+    backend = config.get("backend", "flat")
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(
+            f"Unknown index backend '{backend}' (choose from {', '.join(INDEX_BACKENDS)})"
+        )
+
+    resolved = {"backend": backend, **BACKEND_DEFAULTS[backend]}
+    resolved.update({k: v for k, v in config.items() if v is not None})
+
+    if backend in ("ivf_flat", "ivf_pq"):
+        if not resolved.get("nlist"):
+            nlist = int(4 * math.sqrt(max(num_vectors, 1)))
+            resolved["nlist"] = max(1, min(nlist, num_vectors // MIN_POINTS_PER_CENTROID))
+        resolved["nprobe"] = min(resolved["nprobe"], resolved["nlist"])
+
+    if backend == "ivf_pq":
+        # Sub-quantizer count must divide the dimension
+        pq_m = resolved["pq_m"]
+        while dim % pq_m:
+            pq_m -= 1
+        resolved["pq_m"] = pq_m
+        # Each sub-quantizer trains 2^nbits centroids
+        max_nbits = int(math.log2(max(num_vectors, 2)))
+        resolved["pq_nbits"] = max(1, min(resolved["pq_nbits"], max_nbits))
+
+    return resolved
+
+
+def describe_index_config(config):
+    params = ", ".join(f"{k}={v}" for k, v in config.items() if k != "backend")
+    return f"{config['backend']}({params})" if params else config["backend"]
+
+
+def make_index(dim, config, train_vectors=None):
+    """
+    Create (and train, if the backend needs it) an empty index
+    for a resolved config
+    """
+    backend = config["backend"]
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if backend == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif backend == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config["M"], metric)
+        index.hnsw.efConstruction = config["ef_construction"]
+    elif backend == "ivf_flat":
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, config["nlist"], metric)
+    elif backend == "ivf_pq":
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(
+            quantizer, dim, config["nlist"], config["pq_m"], config["pq_nbits"], metric
+        )
+    elif backend == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, metric)
+    else:
+        raise ValueError(f"Unknown index backend '{backend}'")
+
+    if not index.is_trained:
+        if train_vectors is None:
+            raise ValueError(f"Backend '{backend}' needs training vectors")
+        index.train(train_vectors)
+
+    apply_search_params(index, config)
+    return index
+
+
+def _base_index(index):
+    # Unwrap IndexIDMap / IndexIDMap2 to reach the backend index
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return faiss.downcast_index(index)
+
+
+def apply_search_params(index, config):
+    """
+    Apply search-time knobs (efSearch / nprobe) from a config
+    """
+    base = _base_index(index)
+
+    if config.get("ef_search") and hasattr(base, "hnsw"):
+        base.hnsw.efSearch = int(config["ef_search"])
+    if config.get("nprobe") and hasattr(base, "nprobe"):
+        base.nprobe = int(config["nprobe"])
+
+    return index
+
+
+def make_search_params(index, selector):
+    """
+    Per-call search parameters restricting results to `selector`
+    (e.g. faiss.IDSelectorBatch of allowed IDs), carrying over the
+    efSearch / nprobe the index is configured with
+    """
+    base = _base_index(index)
+
+    if hasattr(base, "hnsw"):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = base.hnsw.efSearch
+    elif hasattr(base, "nprobe"):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = base.nprobe
+    else:
+        params = faiss.SearchParameters()
+
+    params.sel = selector
+    return params
+
+
+def supports_removal(config):
+    """
+    HNSW graphs can't drop vectors; incremental updates that remove
+    or replace records need a full rebuild for that backend
+    """
+    return config["backend"] != "hnsw"
+
+
+def config_satisfies(requested, resolved):
+    """
+    True if an index built with `resolved` config honours every build
+    parameter explicitly set in `requested` (search knobs ignored)
+    """
+    requested = requested or DEFAULT_INDEX_CONFIG
+    if requested.get("backend", "flat") != resolved.get("backend"):
+        return False
+
+    return all(
+        resolved.get(k) == v
+        for k, v in requested.items()
+        if v is not None and k not in SEARCH_PARAMS
+    )
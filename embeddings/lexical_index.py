@@ -0,0 +1,176 @@
+"""
+BM25 lexical index stored next to the FAISS index.
+
+The term-document matrix is precomputed as CSR (one row per term,
+one column per metadata row) holding final BM25 weights, so scoring a
+batch of queries is a single sparse (queries x terms) @ (terms x docs)
+product that only touches the postings of the query terms.
+"""
+
+import re
+
+import numpy as np
+from scipy import sparse
+
+LEXICAL_FILE = "lexical.npz"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms in more than this share of documents (template labels such as
+# "assessment" or "duration") carry little BM25 signal but dominate the
+# postings, so they are dropped at build time
+MAX_DF_RATIO = 0.5
+
+# Keeps skill tokens such as "c++", "c#", ".net" and "node.js" intact
+TOKEN_PATTERN = re.compile(r"\.?[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or our
+that the their this to was we were will with you your who what which
+""".split())
+
+
+def tokenize(text):
+    return [
+        t for t in TOKEN_PATTERN.findall((text or "").lower())
+        if t not in STOPWORDS
+    ]
+
+
+class LexicalIndex:
+    """
+    BM25 over the catalogue documents; columns follow metadata row order
+    """
+
+    def __init__(self, vocabulary, matrix, k1=BM25_K1, b=BM25_B):
+        self.vocabulary = vocabulary
+        self.matrix = matrix.tocsr()
+        self.k1 = k1
+        self.b = b
+
+    @property
+    def num_docs(self):
+        return self.matrix.shape[1]
+
+    @classmethod
+    def build(cls, documents, k1=BM25_K1, b=BM25_B, max_df_ratio=MAX_DF_RATIO):
+        """
+        documents: texts in metadata row order
+        """
+        vocabulary = {}
+        rows, cols, counts = [], [], []
+        doc_lengths = np.zeros(len(documents), dtype="float32")
+
+        for doc, text in enumerate(documents):
+            tokens = tokenize(text)
+            doc_lengths[doc] = len(tokens)
+            terms, tf = np.unique(
+                [vocabulary.setdefault(t, len(vocabulary)) for t in tokens],
+                return_counts=True,
+            )
+            rows.append(terms)
+            cols.append(np.full(len(terms), doc))
+            counts.append(tf)
+
+        shape = (len(vocabulary), len(documents))
+        if not vocabulary:
+            return cls(vocabulary, sparse.csr_matrix(shape, dtype="float32"), k1, b)
+
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        tf = np.concatenate(counts).astype("float32")
+
+        df = np.bincount(rows, minlength=len(vocabulary))
+        n = len(documents)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype("float32")
+
+        # Re-number surviving terms so matrix rows stay dense
+        keep = df <= max(max_df_ratio * n, 1)
+        new_ids = np.cumsum(keep) - 1
+        vocabulary = {t: int(new_ids[i]) for t, i in vocabulary.items() if keep[i]}
+        kept = keep[rows]
+
+        avg_len = max(float(doc_lengths.mean()), 1.0)
+        norm = k1 * (1 - b + b * doc_lengths[cols] / avg_len)
+        weights = idf[rows] * tf * (k1 + 1) / (tf + norm)
+
+        matrix = sparse.csr_matrix(
+            (weights[kept], (new_ids[rows[kept]], cols[kept])),
+            shape=(len(vocabulary), n),
+            dtype="float32",
+        )
+        return cls(vocabulary, matrix, k1, b)
+
+    def _query_matrix(self, queries):
+        # Binary query-term matrix, built straight into CSR arrays
+        indices, indptr = [], [0]
+        for query in queries:
+            terms = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+            indices.extend(sorted(terms))
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix(
+            (
+                np.ones(len(indices), dtype="float32"),
+                np.array(indices, dtype="int32"),
+                np.array(indptr, dtype="int32"),
+            ),
+            shape=(len(queries), len(self.vocabulary)),
+        )
+
+    def score_batch(self, queries):
+        """
+        Sparse (n_queries, n_docs) BM25 scores
+        """
+        return (self._query_matrix(queries) @ self.matrix).tocsr()
+
+    def top_n(self, queries, n, allowed=None):
+        """
+        Per query: (rows, scores) of the n best-scoring documents,
+        best first; documents sharing no term with the query are skipped.
+        allowed: optional boolean row mask restricting the candidates.
+        """
+        scores = self.score_batch(queries)
+        results = []
+        for i in range(len(queries)):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            rows, values = scores.indices[start:end], scores.data[start:end]
+            if allowed is not None:
+                keep = allowed[rows]
+                rows, values = rows[keep], values[keep]
+            if len(values) > n:
+                keep = np.argpartition(-values, n - 1)[:n]
+                rows, values = rows[keep], values[keep]
+            order = np.argsort(-values, kind="stable")
+            results.append((rows[order].astype("int64"), values[order]))
+
+        return results
+
+    def save(self, path):
+        terms = np.empty(len(self.vocabulary), dtype=object)
+        for term, col in self.vocabulary.items():
+            terms[col] = term
+
+        # File object: np.savez would append ".npz" to a temp path
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                terms=terms.astype(str),
+                data=self.matrix.data,
+                indices=self.matrix.indices,
+                indptr=self.matrix.indptr,
+                shape=np.array(self.matrix.shape, dtype="int64"),
+                params=np.array([self.k1, self.b], dtype="float64"),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            vocabulary = {term: i for i, term in enumerate(arrays["terms"].tolist())}
+            matrix = sparse.csr_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]),
+                shape=tuple(arrays["shape"]),
+            )
+            k1, b = arrays["params"].tolist()
+
+        return cls(vocabulary, matrix, k1, b)
@@ -0,0 +1,196 @@
+"""
+ONNX Runtime encoder backend for CPU-only hosts.
+
+The SentenceTransformer is exported once (transformer + mean pooling +
+L2 normalisation in a single graph), dynamically quantized to int8,
+and then served through ONNX Runtime with a configurable number of
+intra-op threads. OnnxEncoder.encode mirrors SentenceTransformer.encode
+so EmbeddingModel can use either interchangeably.
+"""
+
+import os
+import json
+
+import numpy as np
+
+ONNX_ROOT = os.path.join(os.path.dirname(__file__), "onnx")
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+EXPORT_INFO_FILE = "export.json"
+ONNX_OPSET = 17
+
+
+def onnx_model_dir(model_name, root=ONNX_ROOT):
+    return os.path.join(root, model_name.replace("/", "__"))
+
+
+def _embedding_dimension(st_model):
+    # Renamed in newer sentence-transformers releases
+    getter = getattr(st_model, "get_embedding_dimension", None)
+    if getter is None:
+        getter = st_model.get_sentence_embedding_dimension
+    return getter()
+
+
+def export_onnx(model_name, output_dir=None, quantize=True):
+    """
+    Export a SentenceTransformer to ONNX (+ int8 dynamic quantization).
+    Needs torch / sentence-transformers / onnx; serving only needs onnxruntime.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = output_dir or onnx_model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    pooling = st_model[1]
+    pooling_mode = getattr(pooling, "pooling_mode", None)
+    if pooling_mode is None:
+        pooling_mode = pooling.get_pooling_mode_str()
+    if pooling_mode != "mean":
+        raise ValueError(f"❌ Only mean pooling can be exported, got '{pooling_mode}'")
+
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    class MeanPooledEncoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            hidden = self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids,
+            ).last_hidden_state
+            mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            return torch.nn.functional.normalize(pooled, p=2, dim=1)
+
+    sample = tokenizer(
+        ["export sample", "a slightly longer export sample sentence"],
+        padding=True, return_tensors="pt"
+    )
+    inputs = (
+        sample["input_ids"],
+        sample["attention_mask"],
+        sample.get("token_type_ids", torch.zeros_like(sample["input_ids"])),
+    )
+    dynamic_axes = {
+        name: {0: "batch", 1: "sequence"}
+        for name in ("input_ids", "attention_mask", "token_type_ids")
+    }
+    dynamic_axes["sentence_embedding"] = {0: "batch"}
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            MeanPooledEncoder(transformer),
+            inputs,
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["sentence_embedding"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            dynamo=False,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantize_dynamic(
+            fp32_path,
+            os.path.join(output_dir, INT8_FILE),
+            weight_type=QuantType.QInt8,
+        )
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, EXPORT_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": st_model.max_seq_length,
+            "dim": _embedding_dimension(st_model),
+            "quantized": quantize,
+            "opset": ONNX_OPSET,
+        }, f, indent=2)
+
+    return output_dir
+
+
+def ensure_onnx_model(model_name, quantize=True):
+    """
+    Export on first use; later calls reuse the files on disk
+    """
+    model_dir = onnx_model_dir(model_name)
+    model_file = INT8_FILE if quantize else FP32_FILE
+    if not os.path.exists(os.path.join(model_dir, model_file)):
+        export_onnx(model_name, model_dir, quantize=quantize)
+    return model_dir
+
+
+class OnnxEncoder:
+    """
+    Drop-in for SentenceTransformer.encode backed by ONNX Runtime
+    """
+
+    def __init__(self, model_dir, quantized=True, intra_op_threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, EXPORT_INFO_FILE), "r", encoding="utf-8") as f:
+            info = json.load(f)
+
+        self.max_seq_length = info["max_seq_length"]
+        self.dim = info["dim"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads:
+            options.intra_op_num_threads = int(intra_op_threads)
+
+        model_file = INT8_FILE if quantized else FP32_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False,
+               normalize_embeddings=True, **kwargs):
+        # Graph output is already L2-normalised (as normalize_embeddings=True)
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(
+                list(texts[start:start + batch_size]),
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            feed = {
+                name: batch[name].astype("int64")
+                for name in ("input_ids", "attention_mask")
+            }
+            if "token_type_ids" in self.input_names:
+                feed["token_type_ids"] = batch.get(
+                    "token_type_ids", np.zeros_like(batch["input_ids"])
+                ).astype("int64")
+            outputs.append(self.session.run(["sentence_embedding"], feed)[0])
+
+        if not outputs:
+            return np.zeros((0, self.dim), dtype="float32")
+
+        embeddings = np.concatenate(outputs).astype("float32")
+        return embeddings[0] if single else embeddings
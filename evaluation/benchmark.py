@@ -0,0 +1,382 @@
+"""
+End-to-end benchmark of the retrieval pipeline on the labeled queries:
+cold start, per-query latency percentiles, batch throughput, peak RSS
+and Recall / MAP / nDCG, written as JSON. --baseline compares the run
+with an earlier result and exits non-zero when latency or quality
+regresses beyond the thresholds.
+
+    python evaluation/benchmark.py --out bench.json
+    python evaluation/benchmark.py --out new.json --baseline bench.json
+    python evaluation/benchmark.py --compare bench.json new.json
+"""
+
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from evaluation.sweep_index_backends import load_labeled_queries
+from evaluation.utils import ranking_metrics
+
+METRIC_KS = (5, 10)
+BATCH_SIZES = (1, 8, 32, 128)
+# Threads calling recommend() at once for the micro-batching measurement
+CONCURRENCY = 16
+
+# Regression gates: relative for timings, absolute for quality metrics
+MAX_LATENCY_REGRESSION = 0.20
+MAX_QUALITY_DROP = 0.01
+
+# Fresh interpreter: import, index + model load, first query
+COLD_START_SCRIPT = """
+import sys, json, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+from retrieval import retrieve_and_rank
+t1 = time.perf_counter()
+retrieve_and_rank.warm_up()
+t2 = time.perf_counter()
+retrieve_and_rank.recommend("Java developer who can collaborate with business teams")
+t3 = time.perf_counter()
+print(json.dumps({{"import_s": t1 - t0, "load_s": t2 - t1, "first_query_s": t3 - t2}}))
+"""
+
+
+def peak_rss_mb(who=None):
+    """
+    Peak resident set size of this process (or its finished children)
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss * scale / 2**20, 1)
+
+
+def _percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "p50": round(float(np.percentile(samples, 50)), 3),
+        "p95": round(float(np.percentile(samples, 95)), 3),
+        "p99": round(float(np.percentile(samples, 99)), 3),
+        "mean": round(float(samples.mean()), 3),
+        "n": int(len(samples)),
+    }
+
+
+def measure_cold_start(runs):
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT.format(root=PROJECT_ROOT)],
+            capture_output=True, text=True, check=True, cwd=PROJECT_ROOT,
+        )
+        timings.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    result = {
+        key: round(float(np.median([t[key] for t in timings])), 3)
+        for key in timings[0]
+    }
+    result["total_s"] = round(sum(result.values()), 3)
+    result["runs"] = runs
+    if resource is not None:
+        result["peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return result
+
+
+def evaluate_quality(retrieve_and_rank, labeled, store):
+    """
+    Recall / MAP / nDCG at METRIC_KS from one batched run
+    (store: the loaded CatalogStore; slug ids come from its indexes)
+    """
+    def slug_id(row):
+        return int(store.slug_ids[row]) if row != -1 else -1
+
+    # Labeled slugs missing from the catalogue still count as relevant
+    missing = {}
+
+    def label_id(slug):
+        row = store.row_for_slug(slug)
+        if row != -1:
+            return slug_id(row)
+        return missing.setdefault(slug, store.num_slugs + len(missing))
+
+    label_ids = [[label_id(slug) for slug in relevant] for _, relevant in labeled]
+
+    relevance = np.zeros((len(labeled), store.num_slugs + len(missing)), dtype=bool)
+    for i, ids in enumerate(label_ids):
+        relevance[i, ids] = True
+
+    k = max(METRIC_KS)
+    results = retrieve_and_rank.recommend_batch(
+        [q for q, _ in labeled], k=k, cache=False
+    )
+    predicted = np.full((len(labeled), k), -1, dtype="int64")
+    for i, recs in enumerate(results):
+        predicted[i, :len(recs)] = [slug_id(store.row_for_url(r["url"])) for r in recs]
+
+    quality = {}
+    for cutoff in METRIC_KS:
+        for name, values in ranking_metrics(predicted, relevance, cutoff).items():
+            quality[f"{name}@{cutoff}"] = round(float(values.mean()), 4)
+    return quality
+
+
+def measure_latency(retrieve_and_rank, queries, repeats):
+    """
+    Serial single-query latency (the /recommend path, result cache
+    and micro-batch wait bypassed so repeats measure the pipeline)
+    """
+    samples = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            retrieve_and_rank.recommend(query, cache=False, batch=False)
+            samples.append((time.perf_counter() - start) * 1000)
+    return _percentiles(samples)
+
+
+def measure_throughput(retrieve_and_rank, queries, repeats):
+    """
+    Queries per second through recommend_batch at each batch size
+    """
+    throughput = {}
+    for batch_size in BATCH_SIZES:
+        if batch_size > len(queries) and batch_size != BATCH_SIZES[0]:
+            continue
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for i in range(0, len(queries), batch_size):
+                retrieve_and_rank.recommend_batch(queries[i:i + batch_size], cache=False)
+        elapsed = time.perf_counter() - start
+        throughput[str(batch_size)] = round(repeats * len(queries) / elapsed, 2)
+    return throughput
+
+
+def measure_concurrent(retrieve_and_rank, queries, repeats, concurrency=CONCURRENCY):
+    """
+    Queries per second with `concurrency` threads each calling
+    recommend(), with and without micro-batching
+    """
+    work = queries * repeats
+    throughput = {}
+    for mode, batch in (("unbatched", False), ("microbatch", True)):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            list(pool.map(
+                lambda q: retrieve_and_rank.recommend(q, cache=False, batch=batch), work
+            ))
+            elapsed = time.perf_counter() - start
+        throughput[mode] = round(len(work) / elapsed, 2)
+    return throughput
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=PROJECT_ROOT,
+        )
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(repeats=3, cold_runs=3):
+    labeled = load_labeled_queries()
+    queries = [q for q, _ in labeled]
+
+    cold_start = measure_cold_start(cold_runs) if cold_runs else None
+
+    from retrieval import retrieve_and_rank
+
+    start = time.perf_counter()
+    retrieve_and_rank.warm_up()
+    warm_up_s = time.perf_counter() - start
+    _, store = retrieve_and_rank._load_index()
+    manifest = retrieve_and_rank._manifest
+
+    quality = evaluate_quality(retrieve_and_rank, labeled, store)
+    latency = measure_latency(retrieve_and_rank, queries, repeats)
+    throughput = measure_throughput(retrieve_and_rank, queries, repeats)
+    concurrent = measure_concurrent(retrieve_and_rank, queries, repeats)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "model_name": manifest.get("model_name"),
+            "encoder_backend": manifest.get("encoder_backend"),
+            "index_type": manifest.get("index_type"),
+            "num_queries": len(queries),
+            "repeats": repeats,
+        },
+        "cold_start": cold_start,
+        "warm_up_s": round(warm_up_s, 3),
+        "latency_ms": latency,
+        "throughput_qps": throughput,
+        "concurrent_qps": concurrent,
+        "peak_rss_mb": peak_rss_mb(),
+        "quality": quality,
+    }
+
+
+def _lookup(result, path):
+    value = result
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def regression_gates(baseline, current):
+    """
+    (metric path, direction) pairs present in both results;
+    "lower" = smaller is better
+    """
+    gates = [
+        ("latency_ms.p50", "lower"),
+        ("latency_ms.p95", "lower"),
+        ("cold_start.total_s", "lower"),
+    ]
+    gates += [
+        (f"throughput_qps.{size}", "higher")
+        for size in (current.get("throughput_qps") or {})
+    ]
+    gates += [
+        (f"concurrent_qps.{mode}", "higher")
+        for mode in (current.get("concurrent_qps") or {})
+    ]
+    gates += [
+        (f"quality.{name}", "higher")
+        for name in (current.get("quality") or {})
+    ]
+    return [
+        (path, direction) for path, direction in gates
+        if _lookup(baseline, path) is not None and _lookup(current, path) is not None
+    ]
+
+
+def compare(baseline, current, max_latency_regression=MAX_LATENCY_REGRESSION,
+            max_quality_drop=MAX_QUALITY_DROP):
+    """
+    Check `current` against `baseline`; returns (rows, failed) where
+    each row is (metric, baseline, current, change, ok)
+    """
+    rows = []
+    for path, direction in regression_gates(baseline, current):
+        old, new = _lookup(baseline, path), _lookup(current, path)
+
+        if path.startswith("quality."):
+            change = new - old
+            ok = change >= -max_quality_drop
+        else:
+            change = (new - old) / old if old else 0.0
+            if direction == "lower":
+                ok = change <= max_latency_regression
+            else:
+                ok = change >= -max_latency_regression
+        rows.append((path, old, new, change, ok))
+
+    return rows, not all(ok for *_, ok in rows)
+
+
+def print_comparison(rows):
+    print(f"\n{'metric':<26} {'baseline':>10} {'current':>10} {'change':>9}")
+    for path, old, new, change, ok in rows:
+        shown = f"{change:+.4f}" if path.startswith("quality.") else f"{change:+.1%}"
+        print(f"{path:<26} {old:>10.4f} {new:>10.4f} {shown:>9} {'✅' if ok else '❌'}")
+
+
+def print_summary(result):
+    cold = result["cold_start"]
+    if cold:
+        print(
+            f"🧊 Cold start: {cold['total_s']:.2f}s "
+            f"(import {cold['import_s']:.2f}s, load {cold['load_s']:.2f}s, "
+            f"first query {cold['first_query_s']:.3f}s)"
+        )
+    lat = result["latency_ms"]
+    print(
+        f"⏱️  Latency: p50 {lat['p50']:.2f} ms, p95 {lat['p95']:.2f} ms, "
+        f"p99 {lat['p99']:.2f} ms over {lat['n']} queries"
+    )
+    print("🚀 Throughput: " + ", ".join(
+        f"batch {size}: {qps:.1f} q/s" for size, qps in result["throughput_qps"].items()
+    ))
+    if result.get("concurrent_qps"):
+        print(f"🧵 {CONCURRENCY} threads: " + ", ".join(
+            f"{mode}: {qps:.1f} q/s" for mode, qps in result["concurrent_qps"].items()
+        ))
+    print(f"💾 Peak RSS: {result['peak_rss_mb']} MB")
+    print("📊 " + ", ".join(f"{k} {v:.3f}" for k, v in result["quality"].items()))
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end retrieval benchmark")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="earlier results to gate this run against")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+        help="only compare two existing result files"
+    )
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="passes over the queries for latency / throughput")
+    parser.add_argument("--cold-runs", type=int, default=3,
+                        help="fresh-process cold starts to time (0 = skip)")
+    parser.add_argument("--max-latency-regression", type=float,
+                        default=MAX_LATENCY_REGRESSION,
+                        help="allowed relative slowdown (0.2 = 20%%)")
+    parser.add_argument("--max-quality-drop", type=float, default=MAX_QUALITY_DROP,
+                        help="allowed absolute drop in recall / MAP / nDCG")
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (_read_json(p) for p in args.compare)
+    else:
+        current = run_benchmark(repeats=args.repeats, cold_runs=args.cold_runs)
+        print_summary(current)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+            print(f"📁 Results saved to {args.out}")
+        if not args.baseline:
+            return
+        baseline = _read_json(args.baseline)
+
+    rows, failed = compare(
+        baseline, current, args.max_latency_regression, args.max_quality_drop
+    )
+    print_comparison(rows)
+    if failed:
+        print("❌ Regression beyond threshold")
+        sys.exit(1)
+    print("✅ No regression")
+
+
+if __name__ == "__main__":
+    main()
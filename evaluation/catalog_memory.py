@@ -0,0 +1,150 @@
+"""
+Memory and lookup cost of the in-memory catalogue, scaled to a
+synthetic catalogue of --records rows (default 100k): the list of
+metadata dicts retrieval used to hold, the same plus a url -> row dict,
+CatalogStore built from the dicts, and CatalogStore over a
+memory-mapped Arrow snapshot.
+
+    python evaluation/catalog_memory.py [--records 100000] [--json mem.json]
+"""
+
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import gc
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from catalog.ids import assessment_id_for_url, normalize_slug
+from catalog.snapshot import table_from_records, write_snapshot, open_snapshot
+from catalog.store import CatalogStore
+from embeddings.build_faiss_index import load_catalog, prepare_records
+
+DEFAULT_RECORDS = 100_000
+LOOKUPS = 2_000
+
+
+def synthetic_catalog(n):
+    """
+    n catalogue rows cycling the real ones, each with its own URL
+    """
+    base = load_catalog()
+    records = []
+    for i in range(n):
+        row = dict(base[i % len(base)])
+        row["url"] = f"{row['url'].rstrip('/')}-v{i}/"
+        row["assessment_id"] = assessment_id_for_url(row["url"])
+        records.append(row)
+    return records
+
+
+def traced(build):
+    """
+    (object, bytes it still holds once built) via tracemalloc
+    """
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def per_lookup_us(fn, keys):
+    start = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return (time.perf_counter() - start) * 1e6 / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalogue store memory / lookup report")
+    parser.add_argument("--records", type=int, default=DEFAULT_RECORDS)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    print(f"🧪 Building a {args.records:,}-record synthetic catalogue...")
+    catalog = synthetic_catalog(args.records)
+    metadata, _ = prepare_records(catalog)
+    # The metadata.json payload retrieval loads
+    payload = json.dumps(metadata, ensure_ascii=False)
+    del metadata
+
+    dicts, dicts_bytes = traced(lambda: json.loads(payload))
+    url_rows, url_index_bytes = traced(lambda: {m["url"]: i for i, m in enumerate(dicts)})
+    store, store_bytes = traced(lambda: CatalogStore.from_records(json.loads(payload)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.arrow")
+        write_snapshot(table_from_records(catalog), path)
+        mapped, mapped_bytes = traced(lambda: CatalogStore.from_table(open_snapshot(path)))
+        snapshot_size = os.path.getsize(path)
+
+        sample = [m["url"] for m in dicts[::max(1, len(dicts) // LOOKUPS)]]
+        ids = [m["assessment_id"] for m in dicts[::max(1, len(dicts) // LOOKUPS)]]
+        # Linear scans are slow; spread a few keys over the whole list
+        scan_sample = sample[::max(1, len(sample) // 20)]
+
+        lookups = {
+            "list scan by url": per_lookup_us(
+                lambda u: next(m for m in dicts if m["url"] == u), scan_sample
+            ),
+            "list scan by slug": per_lookup_us(
+                lambda u: next(m for m in dicts
+                               if normalize_slug(m["url"]) == normalize_slug(u)),
+                scan_sample[::4]
+            ),
+            "dict by url": per_lookup_us(url_rows.get, sample),
+            "store by url": per_lookup_us(store.row_for_url, sample),
+            "store by id": per_lookup_us(store.row_for_id, ids),
+            "store by slug": per_lookup_us(store.row_for_slug, sample),
+            "store field read": per_lookup_us(
+                lambda u: store.column("name")[store.row_for_url(u)], sample
+            ),
+        }
+        del mapped
+
+    scale = DEFAULT_RECORDS / args.records
+    report = {
+        "records": args.records,
+        "mb_per_100k": {
+            "list of dicts": round(dicts_bytes * scale / 2**20, 1),
+            "list of dicts + url dict": round(
+                (dicts_bytes + url_index_bytes) * scale / 2**20, 1
+            ),
+            "CatalogStore (from dicts)": round(store_bytes * scale / 2**20, 1),
+            "CatalogStore (mmap snapshot, heap only)": round(
+                mapped_bytes * scale / 2**20, 1
+            ),
+        },
+        "snapshot_file_mb_per_100k": round(snapshot_size * scale / 2**20, 1),
+        "store_nbytes_mb_per_100k": round(store.nbytes() * scale / 2**20, 1),
+        "lookup_us": {name: round(us, 2) for name, us in lookups.items()},
+    }
+
+    print(f"\n{'layout':<42} {'MB / 100k':>10}")
+    for name, mb in report["mb_per_100k"].items():
+        print(f"{name:<42} {mb:>10.1f}")
+    print(f"{'Arrow snapshot file (page cache, shared)':<42} "
+          f"{report['snapshot_file_mb_per_100k']:>10.1f}")
+
+    print(f"\n{'lookup':<42} {'µs':>10}")
+    for name, us in report["lookup_us"].items():
+        print(f"{name:<42} {us:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📁 Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Long-JD query encoding: plain truncation vs chunked windows.
+
+Runs the labeled queries through recommend_batch with truncation,
+chunked max pooling and chunked softmax pooling, and reports
+Recall@10, throughput and how many windows each query produced.
+
+    python evaluation/compare_chunking.py
+"""
+
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import time
+import numpy as np
+
+from retrieval import retrieve_and_rank
+from evaluation.sweep_index_backends import load_labeled_queries
+from evaluation.utils import recall_at_k, extract_slug
+
+TOP_K = 10
+
+MODES = [
+    ("truncate", {"chunked": False, "fusion": "none"}),
+    ("chunked-max", {"chunked": True, "pooling": "max", "fusion": "none"}),
+    ("chunked-softmax", {"chunked": True, "pooling": "softmax", "fusion": "none"}),
+]
+
+
+def main():
+    labeled = load_labeled_queries()
+    queries = [q for q, _ in labeled]
+
+    embedder = retrieve_and_rank._get_embedder()
+    # Measure encoding, not cache lookups
+    embedder.cache = None
+
+    tokens = np.array([
+        len(embedder.model.tokenizer(q, add_special_tokens=False, verbose=False)["input_ids"])
+        for q in queries
+    ])
+    windows = np.array([len(embedder.chunk_text(q)[0]) for q in queries])
+    print(f"📏 Query tokens: median {int(np.median(tokens))}, max {tokens.max()} "
+          f"(window {embedder.model.max_seq_length})")
+    print(f"✂️  Truncated queries: {int((windows > 1).sum())}/{len(queries)}, "
+          f"{windows.mean():.2f} windows per query")
+
+    print(f"\n{'mode':<16} {'recall@10':>10} {'queries/s':>10} {'seconds':>8}")
+    for name, options in MODES:
+        start = time.perf_counter()
+        results = retrieve_and_rank.recommend_batch(queries, k=TOP_K, **options)
+        elapsed = time.perf_counter() - start
+
+        recall = np.mean([
+            recall_at_k([extract_slug(r["url"]) for r in recs], relevant, k=TOP_K)
+            for recs, (_, relevant) in zip(results, labeled)
+        ])
+        print(f"{name:<16} {recall:>10.3f} {len(queries) / elapsed:>10.1f} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Offline query expansion: recall with and without the skill / alias
+automaton, and its extraction latency on the labeled JDs.
+
+    python evaluation/compare_expansion.py
+"""
+
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import time
+import numpy as np
+
+from retrieval import retrieve_and_rank
+from evaluation.sweep_index_backends import load_labeled_queries
+from evaluation.utils import recall_at_k, extract_slug
+
+TOP_K = 10
+
+
+def main():
+    labeled = load_labeled_queries()
+    queries = [q for q, _ in labeled]
+
+    print(f"{'expand':<8} {'recall@10':>10}")
+    for expand in (False, True):
+        results = retrieve_and_rank.recommend_batch(queries, k=TOP_K, expand=expand)
+        recall = np.mean([
+            recall_at_k([extract_slug(r["url"]) for r in recs], relevant, k=TOP_K)
+            for recs, (_, relevant) in zip(results, labeled)
+        ])
+        print(f"{str(expand):<8} {recall:>10.3f}")
+
+    skills = retrieve_and_rank._skills
+    repeats = 50
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for q in queries:
+            skills.extract(q)
+    per_query = (time.perf_counter() - start) * 1000 / (repeats * len(queries))
+    avg_chars = np.mean([len(q) for q in queries])
+
+    print(f"\n⏱️  Extraction: {per_query:.3f} ms per query (avg {avg_chars:.0f} chars)")
+    print(f"🏷️  Automaton: {skills.num_patterns} aliases, "
+          f"{skills.automaton.num_states} states, {len(skills.terms)} terms")
+    for q in queries[:3]:
+        print(f"   {q[:60]!r}... -> {skills.extract(q)}")
+
+
+if __name__ == "__main__":
+    main()
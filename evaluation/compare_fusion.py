@@ -0,0 +1,74 @@
+"""
+Hybrid ranking: dense-only vs BM25 fusion (RRF / weighted).
+
+Reports Recall@10 on the labeled queries for each fusion method, and
+the per-query BM25 scoring latency on the real catalogue and on a
+synthetic catalogue scaled up to --scale documents.
+
+    python evaluation/compare_fusion.py [--scale 100000]
+"""
+
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import time
+import argparse
+import numpy as np
+
+from retrieval import retrieve_and_rank
+from embeddings.build_faiss_index import load_catalog, prepare_records
+from embeddings.lexical_index import LexicalIndex
+from evaluation.sweep_index_backends import load_labeled_queries
+from evaluation.utils import recall_at_k, extract_slug
+
+TOP_K = 10
+
+
+def lexical_ms(lexical, queries, repeats=20):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for q in queries:
+            lexical.top_n([q], TOP_K)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense vs hybrid (BM25 fused) ranking")
+    parser.add_argument("--scale", type=int, default=100_000,
+                        help="synthetic catalogue size for the latency check")
+    args = parser.parse_args()
+
+    labeled = load_labeled_queries()
+    queries = [q for q, _ in labeled]
+
+    print(f"{'fusion':<10} {'recall@10':>10}")
+    for fusion in retrieve_and_rank.FUSION_METHODS:
+        results = retrieve_and_rank.recommend_batch(queries, k=TOP_K, fusion=fusion)
+        recall = np.mean([
+            recall_at_k([extract_slug(r["url"]) for r in recs], relevant, k=TOP_K)
+            for recs, (_, relevant) in zip(results, labeled)
+        ])
+        print(f"{fusion:<10} {recall:>10.3f}")
+
+    records, documents = prepare_records(load_catalog())
+    docs = [documents[r["assessment_id"]] for r in records]
+
+    print(f"\n⏱️  BM25 top-{TOP_K} per query:")
+    print(f"   {len(docs):>7} docs: {lexical_ms(retrieve_and_rank._lexical, queries):.3f} ms")
+
+    # Resample catalogue documents up to the target size
+    rng = np.random.default_rng(0)
+    scaled = [docs[i] for i in rng.integers(0, len(docs), args.scale)]
+    start = time.perf_counter()
+    lexical = LexicalIndex.build(scaled)
+    build_s = time.perf_counter() - start
+    print(f"   {len(scaled):>7} docs: {lexical_ms(lexical, queries, repeats=3):.3f} ms "
+          f"(build {build_s:.1f}s, {lexical.matrix.nnz} postings)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 import pandas as pd
-from retrieval.retrieve_and_rank import recommend
+from retrieval.retrieve_and_rank import recommend_batch
 from evaluation.utils import recall_at_k, extract_slug
 
 
@@ -25,12 +25,18 @@ def main():
 
     print("\n🧪 Evaluating Recall@10 (slug-based)...\n")
 
-    for i, (query, group) in enumerate(df.groupby("Query"), 1):
+    groups = list(df.groupby("Query"))
+    all_recommendations = recommend_batch(
+        [query for query, _ in groups], k=TOP_K
+    )
+
+    for i, ((query, group), recommendations) in enumerate(
+        zip(groups, all_recommendations), 1
+    ):
         relevant_slugs = {
             extract_slug(u) for u in group["Assessment_url"].dropna().tolist()
         }
 
-        recommendations = recommend(query, k=TOP_K)
         predicted_slugs = [
             extract_slug(r["url"]) for r in recommendations
         ]
@@ -0,0 +1,107 @@
+"""
+Parity check: int8 ONNX Runtime encoder vs the PyTorch SentenceTransformer.
+
+Reports per-text cosine agreement, Recall@10 for both backends on the
+labeled dataset, and per-query encode time; exits non-zero when the
+ONNX path drifts beyond the thresholds.
+
+    python evaluation/onnx_parity.py [--threads 4]
+"""
+
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import time
+import argparse
+import faiss
+import numpy as np
+
+from embeddings.embedding_utils import EmbeddingModel, DEFAULT_MODEL_NAME
+from embeddings.build_faiss_index import load_catalog, prepare_records
+from evaluation.sweep_index_backends import load_labeled_queries
+from evaluation.utils import recall_at_k, extract_slug
+
+TOP_K = 10
+MIN_MEAN_COSINE = 0.99
+MIN_COSINE = 0.95
+MAX_RECALL_DROP = 0.02
+
+
+def recall_for(doc_vecs, query_vecs, slugs, labeled):
+    index = faiss.IndexFlatIP(doc_vecs.shape[1])
+    index.add(doc_vecs)
+    _, found = index.search(query_vecs, TOP_K)
+    return float(np.mean([
+        recall_at_k([slugs[i] for i in row if i != -1], relevant, k=TOP_K)
+        for row, (_, relevant) in zip(found, labeled)
+    ]))
+
+
+def per_query_ms(embedder, queries):
+    start = time.perf_counter()
+    for q in queries:
+        embedder.embed_texts([q])
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX vs PyTorch encoder parity")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="ONNX Runtime intra-op threads")
+    parser.add_argument("--precision", default="int8", choices=["int8", "float32"])
+    args = parser.parse_args()
+
+    records, documents = prepare_records(load_catalog())
+    docs = [documents[r["assessment_id"]] for r in records]
+    slugs = [extract_slug(r["url"]) for r in records]
+    labeled = load_labeled_queries()
+    queries = [q for q, _ in labeled]
+
+    print("🧠 Loading encoders...")
+    torch_model = EmbeddingModel(args.model, backend="torch")
+    onnx_model = EmbeddingModel(
+        args.model, backend="onnx", precision=args.precision,
+        intra_op_threads=args.threads
+    )
+
+    torch_docs = torch_model.embed_texts(docs)
+    onnx_docs = onnx_model.embed_texts(docs)
+    torch_queries = torch_model.embed_texts(queries)
+    onnx_queries = onnx_model.embed_texts(queries)
+
+    cosines = np.concatenate([
+        np.sum(torch_docs * onnx_docs, axis=1),
+        np.sum(torch_queries * onnx_queries, axis=1),
+    ])
+
+    torch_recall = recall_for(torch_docs, torch_queries, slugs, labeled)
+    onnx_recall = recall_for(onnx_docs, onnx_queries, slugs, labeled)
+
+    torch_ms = per_query_ms(torch_model, queries)
+    onnx_ms = per_query_ms(onnx_model, queries)
+
+    print(f"\n📐 Cosine agreement: mean {cosines.mean():.4f}, min {cosines.min():.4f}")
+    print(f"📊 Recall@10: torch {torch_recall:.3f} | onnx-{args.precision} {onnx_recall:.3f} "
+          f"(delta {onnx_recall - torch_recall:+.3f})")
+    print(f"⏱️  Per-query encode: torch {torch_ms:.2f} ms | onnx {onnx_ms:.2f} ms "
+          f"({torch_ms / onnx_ms:.1f}x)")
+
+    ok = (
+        cosines.mean() >= MIN_MEAN_COSINE
+        and cosines.min() >= MIN_COSINE
+        and torch_recall - onnx_recall <= MAX_RECALL_DROP
+    )
+    if not ok:
+        print("❌ ONNX encoder outside parity thresholds")
+        sys.exit(1)
+
+    print("✅ ONNX encoder within parity thresholds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Throughput and memory of the pre-fork server against independent
+servers, for each worker count: one api/prefork.py parent with N
+forked workers vs N api/server.py processes (each with its own model
+and index copy) on consecutive ports. A closed-loop aiohttp client
+posts unique queries to /recommend (caches off) for --duration
+seconds; RSS, PSS and USS come from /proc/<pid>/smaps_rollup.
+
+PSS splits shared pages between the processes mapping them, so summed
+PSS is the real footprint of a deployment; summed RSS double-counts
+the copy-on-write pages the workers share with the parent.
+
+    python evaluation/prefork_scaling.py [--workers 1 2 4] [--json scaling.json]
+"""
+
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import json
+import time
+import random
+import string
+import signal
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+import aiohttp
+
+from evaluation.sweep_index_backends import load_labeled_queries
+
+DEFAULT_WORKERS = (1, 2, 4)
+BASE_PORT = 8600
+STARTUP_TIMEOUT_S = 300
+# Result / embedding caches would turn the unique queries into hits
+SERVER_ENV = {"SHL_RESULT_CACHE_ENTRIES": "0", "SHL_EMBED_CACHE_PATH": ""}
+
+
+def memory_mb(pid):
+    """
+    {"rss", "pss", "uss"} in MB for one process
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return None
+
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss": round(fields.get("Rss", 0) / 1024, 1),
+        "pss": round(fields.get("Pss", 0) / 1024, 1),
+        "uss": round(uss / 1024, 1),
+    }
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def start_servers(mode, workers, port, threads):
+    """
+    (processes, ports) for one run
+    """
+    env = dict(os.environ, **SERVER_ENV)
+    if mode == "prefork":
+        cmd = [
+            sys.executable, os.path.join(PROJECT_ROOT, "api", "prefork.py"),
+            "--port", str(port), "--workers", str(workers), "--threads", str(threads),
+        ]
+        procs = [subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)]
+        return procs, [port]
+
+    env["OMP_NUM_THREADS"] = str(threads)
+    procs, ports = [], []
+    for i in range(workers):
+        cmd = [
+            sys.executable, os.path.join(PROJECT_ROOT, "api", "server.py"),
+            "--port", str(port + i),
+        ]
+        procs.append(subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        ports.append(port + i)
+    return procs, ports
+
+
+def stop_servers(procs):
+    for proc in procs:
+        proc.send_signal(signal.SIGTERM)
+    for proc in procs:
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def wait_ready(session, ports, procs):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_S
+    pending = set(ports)
+    while pending:
+        if time.monotonic() > deadline or any(p.poll() is not None for p in procs):
+            raise RuntimeError(f"❌ servers on {sorted(pending)} did not become ready")
+        for port in list(pending):
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/health") as resp:
+                    if resp.status == 200:
+                        pending.discard(port)
+            except aiohttp.ClientError:
+                pass
+        await asyncio.sleep(0.5)
+
+
+def unique_queries(base, rng):
+    """
+    Endless labeled queries, each made unique with a letters-only suffix
+    (so no cache tier or tokenizer path can short-circuit it)
+    """
+    while True:
+        for query in base:
+            suffix = "".join(rng.choice(string.ascii_lowercase) for _ in range(8))
+            yield f"{query} {suffix}"
+
+
+async def drive(ports, queries, k, concurrency, duration):
+    """
+    Closed-loop load: `concurrency` clients, round-robin over ports
+    """
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def client(session, n):
+        nonlocal errors
+        i = n
+        while time.monotonic() < deadline:
+            port = ports[i % len(ports)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                async with session.post(
+                    f"http://127.0.0.1:{port}/recommend",
+                    json={"query": next(queries), "k": k},
+                ) as resp:
+                    await resp.read()
+                    ok = resp.status == 200
+            except aiohttp.ClientError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.monotonic()
+        await asyncio.gather(*(client(session, n) for n in range(concurrency)))
+        elapsed = time.monotonic() - start
+
+    samples = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "qps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(samples, 50)), 1),
+        "p95_ms": round(float(np.percentile(samples, 95)), 1),
+        "requests": len(latencies),
+        "errors": errors,
+    }
+
+
+async def run_one(mode, workers, args, queries):
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    procs, ports = start_servers(mode, workers, args.port, threads)
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session, ports, procs)
+
+        # Warm every worker before measuring
+        await drive(ports, queries, args.k, args.concurrency, min(3.0, args.duration))
+        load = await drive(ports, queries, args.k, args.concurrency, args.duration)
+
+        pids = [p.pid for p in procs]
+        if mode == "prefork":
+            pids += children(procs[0].pid)
+        per_process = [m for m in map(memory_mb, pids) if m]
+        total = {
+            key: round(sum(m[key] for m in per_process), 1)
+            for key in ("rss", "pss", "uss")
+        }
+    finally:
+        stop_servers(procs)
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "threads": threads,
+        **load,
+        "processes": len(per_process),
+        "memory_mb": total,
+        "per_process_mb": per_process,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork vs independent server scaling")
+    parser.add_argument("--workers", type=int, nargs="+", default=list(DEFAULT_WORKERS))
+    parser.add_argument("--modes", nargs="+", default=["prefork", "independent"],
+                        choices=["prefork", "independent"])
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=0,
+                        help="torch threads per worker (default: cores / workers)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--port", type=int, default=BASE_PORT)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    base = [query for query, _ in load_labeled_queries()]
+    queries = unique_queries(base, random.Random(0))
+
+    results = []
+    for workers in args.workers:
+        for mode in args.modes:
+            print(f"🧪 {mode}, {workers} worker(s)...")
+            results.append(asyncio.run(run_one(mode, workers, args, queries)))
+
+    print(f"\n{'mode':<12} {'workers':>7} {'q/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8}")
+    for r in results:
+        m = r["memory_mb"]
+        print(f"{r['mode']:<12} {r['workers']:>7} {r['qps']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {m['rss']:>8.1f} {m['pss']:>8.1f} {m['uss']:>8.1f}")
+
+    if args.json:
+        report = {"cpu_count": os.cpu_count(), "duration_s": args.duration,
+                  "concurrency": args.concurrency, "runs": results}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📁 Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
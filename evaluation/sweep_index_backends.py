@@ -0,0 +1,139 @@
+"""
+Sweep ANN index backends on the labeled dataset and report
+Recall@10 (labels + agreement with exact search), latency and memory.
+
+    python evaluation/sweep_index_backends.py [--json sweep.json]
+"""
+
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import json
+import time
+import argparse
+import faiss
+import numpy as np
+import pandas as pd
+
+from embeddings.embedding_utils import EmbeddingModel
+from embeddings.build_faiss_index import load_catalog, prepare_records
+from embeddings.index_factory import (
+    resolve_index_config,
+    describe_index_config,
+    make_index,
+)
+from evaluation.utils import recall_at_k, extract_slug
+
+
+TRAIN_DATA_PATH = os.path.join(PROJECT_ROOT, "Gen_AI Dataset.xlsx")
+TOP_K = 10
+
+SWEEP_CONFIGS = [
+    {"backend": "flat"},
+    {"backend": "hnsw", "M": 16, "ef_search": 16},
+    {"backend": "hnsw", "M": 32, "ef_search": 64},
+    {"backend": "hnsw", "M": 32, "ef_search": 128},
+    {"backend": "ivf_flat", "nprobe": 1},
+    {"backend": "ivf_flat", "nprobe": 4},
+    {"backend": "ivf_flat", "nprobe": 8},
+    {"backend": "ivf_pq", "nprobe": 4},
+    {"backend": "ivf_pq", "nprobe": 8},
+    {"backend": "sq8"},
+]
+
+
+def load_labeled_queries(path=TRAIN_DATA_PATH):
+    df = pd.read_excel(path)
+    return [
+        (query, {extract_slug(u) for u in group["Assessment_url"].dropna()})
+        for query, group in df.groupby("Query")
+    ]
+
+
+def sweep_backend(config, doc_vecs, ids, query_vecs, slugs_by_id, labeled, exact_ids):
+    dim = doc_vecs.shape[1]
+    config = resolve_index_config(config, dim, len(doc_vecs))
+
+    start = time.perf_counter()
+    index = faiss.IndexIDMap(make_index(dim, config, train_vectors=doc_vecs))
+    index.add_with_ids(doc_vecs, ids)
+    build_s = time.perf_counter() - start
+
+    # Single-query latency (the serving path)
+    latencies = []
+    for row in query_vecs:
+        t0 = time.perf_counter()
+        index.search(row[None, :], TOP_K)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    _, found = index.search(query_vecs, TOP_K)
+
+    label_recall = np.mean([
+        recall_at_k([slugs_by_id.get(i, "") for i in row], relevant, k=TOP_K)
+        for row, (_, relevant) in zip(found, labeled)
+    ])
+    exact_recall = np.mean([
+        len(set(row) & set(exact)) / TOP_K for row, exact in zip(found, exact_ids)
+    ])
+
+    return {
+        "config": config,
+        "name": describe_index_config(config),
+        "recall_at_10": round(float(label_recall), 4),
+        "ann_recall_vs_exact": round(float(exact_recall), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+        "index_bytes": int(faiss.serialize_index(index).nbytes),
+        "build_s": round(build_s, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN backend sweep")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    print("📥 Loading catalogue and labeled queries...")
+    records, documents = prepare_records(load_catalog())
+    labeled = load_labeled_queries()
+
+    print("🧠 Embedding catalogue + queries...")
+    embedder = EmbeddingModel()
+    doc_vecs = embedder.embed_texts(
+        [documents[r["assessment_id"]] for r in records], show_progress_bar=True
+    )
+    query_vecs = embedder.embed_texts([q for q, _ in labeled])
+    ids = np.array([r["faiss_id"] for r in records], dtype="int64")
+    slugs_by_id = {r["faiss_id"]: extract_slug(r["url"]) for r in records}
+
+    # Ground truth for ANN recall: exact inner-product search
+    exact = faiss.IndexIDMap(faiss.IndexFlatIP(doc_vecs.shape[1]))
+    exact.add_with_ids(doc_vecs, ids)
+    _, exact_ids = exact.search(query_vecs, TOP_K)
+
+    results = []
+    print(
+        f"\n{'backend':48} {'R@10':>6} {'ANN-R':>6} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'memory':>10} {'build s':>8}"
+    )
+    for config in SWEEP_CONFIGS:
+        r = sweep_backend(config, doc_vecs, ids, query_vecs, slugs_by_id, labeled, exact_ids)
+        results.append(r)
+        print(
+            f"{r['name']:48} {r['recall_at_10']:6.3f} {r['ann_recall_vs_exact']:6.3f} "
+            f"{r['p50_ms']:8.3f} {r['p95_ms']:8.3f} "
+            f"{r['index_bytes'] / 1024:8.1f}KB {r['build_s']:8.3f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📁 Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
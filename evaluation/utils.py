@@ -1,34 +1,13 @@
-import re
+import numpy as np
+
+from catalog.ids import normalize_slug
 
 
 def extract_slug(url: str) -> str:
     """
     Extract and normalize assessment slug from SHL URL
     """
-    if not url:
-        return ""
-
-    url = url.lower()
-
-    # Remove protocol + domain
-    url = re.sub(r"https?://[^/]+", "", url)
-
-    # Remove locale
-    url = re.sub(r"^/en/", "/", url)
-
-    # Extract slug
-    parts = url.strip("/").split("/")
-    if not parts:
-        return ""
-
-    slug = parts[-1]
-
-    # Normalize slug
-    slug = slug.replace("-new", "")
-    slug = re.sub(r"\d+", "", slug)  # remove numbers
-    slug = slug.replace("-", "")
-
-    return slug
+    return normalize_slug(url)
 
 
 def recall_at_k(predicted_slugs, relevant_slugs, k=10):
@@ -39,3 +18,36 @@ def recall_at_k(predicted_slugs, relevant_slugs, k=10):
     hits = sum(1 for s in top_k if s in relevant_slugs)
 
     return hits / len(relevant_slugs)
+
+
+def ranking_metrics(predicted, relevant, k=10):
+    """
+    Vectorized Recall@k / MAP@k / nDCG@k (binary relevance).
+
+    predicted: (n_queries, >= k) int array of slug ids, -1 = padding;
+    relevant: (n_queries, n_ids) boolean relevance matrix.
+    A slug repeated within a row counts once. Returns per-query arrays.
+    """
+    predicted = np.asarray(predicted)[:, :k]
+    n, k = predicted.shape
+    valid = predicted >= 0
+
+    hits = valid & relevant[np.arange(n)[:, None], np.where(valid, predicted, 0)]
+    # earlier[i, j]: position j comes before position i
+    earlier = np.tri(k, k, -1, dtype=bool)
+    repeated = ((predicted[:, :, None] == predicted[:, None, :]) & earlier).any(axis=2)
+    hits &= ~repeated
+
+    num_relevant = relevant.sum(axis=1)
+    ideal_hits = np.minimum(num_relevant, k)
+    ranks = np.arange(1, k + 1)
+    discounts = 1.0 / np.log2(ranks + 1)
+
+    recall = hits.sum(axis=1) / np.maximum(num_relevant, 1)
+    precision = hits.cumsum(axis=1) / ranks
+    average_precision = (precision * hits).sum(axis=1) / np.maximum(ideal_hits, 1)
+    dcg = (hits * discounts).sum(axis=1)
+    ideal_dcg = np.concatenate([[0.0], np.cumsum(discounts)])[ideal_hits]
+    ndcg = dcg / np.where(ideal_dcg > 0, ideal_dcg, 1.0)
+
+    return {"recall": recall, "map": average_precision, "ndcg": ndcg}
@@ -0,0 +1,72 @@
+"""
+Local stand-in for the rewrite LLM, for exercising QueryRewriter's
+deadline, cache, concurrency limit and circuit breaker without a key.
+
+    python llm/fake_model_server.py --port 8089 --delay 0.3 --fail-rate 0.2
+    SHL_REWRITER_BACKEND=http SHL_REWRITER_URL=http://127.0.0.1:8089/generate \\
+        python api/server.py
+
+POST /generate {"prompt": "..."} -> {"text": "..."}
+"""
+
+import re
+import random
+import asyncio
+import argparse
+
+from aiohttp import web
+
+STOPWORDS = set("""
+a an and are as at be by for from has have i in is it of on or our that
+the this to we with who will you your looking hire hiring want need
+""".split())
+
+
+def fake_rewrite(prompt, max_words=12):
+    # Keyword-style "rewrite" of the quoted original query
+    match = re.search(r'"""(.*?)"""', prompt, re.S)
+    text = match.group(1) if match else prompt
+    words = [w for w in re.findall(r"[\w+#.]+", text.lower()) if w not in STOPWORDS]
+    return " ".join(list(dict.fromkeys(words))[:max_words])
+
+
+def create_app(delay=0.2, jitter=0.1, fail_rate=0.0):
+    stats = {"requests": 0, "failures": 0}
+
+    async def generate(request):
+        stats["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(max(0.0, delay + random.uniform(-jitter, jitter)))
+
+        if random.random() < fail_rate:
+            stats["failures"] += 1
+            raise web.HTTPServiceUnavailable(reason="fake upstream failure")
+
+        return web.json_response({"text": fake_rewrite(body.get("prompt", ""))})
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/generate", generate)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake rewrite LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.2, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of 503 responses")
+    args = parser.parse_args()
+
+    web.run_app(
+        create_app(args.delay, args.jitter, args.fail_rate),
+        host=args.host, port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
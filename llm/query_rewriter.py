@@ -1,19 +1,61 @@
+"""
+Deadline-bounded LLM query rewriting.
+
+QueryRewriter wraps a text-generation backend (Gemini, or any HTTP
+endpoint such as llm/fake_model_server.py) with:
+
+- a hard per-call deadline: callers never wait longer than `deadline`;
+  a late answer is still cached for the next identical query
+- a persistent cache of rewrites keyed by normalized query
+- a concurrency limit on in-flight upstream calls (excess calls skip the LLM)
+- a circuit breaker that stops calling a failing upstream for a while
+
+speculative_recommend / speculative_recommend_async run baseline
+retrieval while the rewrite is in flight, and only use the rewrite
+if it arrives before the deadline.
+"""
+
 import os
-import google.generativeai as genai
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
 
-# Configure Gemini (API key via environment variable)
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from embeddings.embedding_cache import normalize_text
+from retrieval.tracing import stage, register_collector
 
 MODEL_NAME = "gemini-pro"
 
+# "gemini", "http" (SHL_REWRITER_URL) or "off"
+REWRITER_BACKEND = os.getenv("SHL_REWRITER_BACKEND", "gemini")
+REWRITER_URL = os.getenv("SHL_REWRITER_URL", "http://127.0.0.1:8089/generate")
 
-def rewrite_query(query: str):
-    """
-    Optional LLM-based query rewriting.
-    Fails silently and returns None if unavailable.
-    """
+DEFAULT_DEADLINE = float(os.getenv("SHL_REWRITE_DEADLINE", "1.5"))
+# Upstream calls may outlive the caller's deadline (the late answer is
+# cached); this bounds how long one can hold a concurrency slot
+UPSTREAM_TIMEOUT = 10.0
+DEFAULT_MAX_CONCURRENCY = 4
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
 
-    prompt = f"""
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
+DEFAULT_CACHE_PATH = os.getenv(
+    "SHL_REWRITE_CACHE_PATH", os.path.join(CACHE_DIR, "rewrites.sqlite")
+)
+CACHE_MAX_ENTRIES = 10_000
+CACHE_TTL = 30 * 24 * 3600
+
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 50,
+}
+
+PROMPT_TEMPLATE = """
 Rewrite the following job description or query into a SHORT, keyword-focused
 search query containing:
 - role
@@ -29,22 +71,402 @@ Original query:
 \"\"\"{query}\"\"\"
 """
 
-    try:
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(
+
+def build_prompt(query):
+    return PROMPT_TEMPLATE.format(query=query)
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+class GeminiBackend:
+    """
+    google-generativeai, imported lazily so the package is only
+    needed when this backend is actually used
+    """
+
+    def __init__(self, model_name=MODEL_NAME, api_key=None):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self.model_id = f"gemini:{model_name}"
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt, timeout):
+        response = self.model.generate_content(
             prompt,
-            generation_config={
-                "temperature": 0.2,
-                "max_output_tokens": 50,
-            },
+            generation_config=GENERATION_CONFIG,
+            request_options={"timeout": timeout},
         )
+        return response.text
+
+
+class HttpBackend:
+    """
+    Plain JSON endpoint: POST {"prompt", ...GENERATION_CONFIG} -> {"text"}
+    """
+
+    def __init__(self, url=REWRITER_URL, model_id=None):
+        self.url = url
+        self.model_id = model_id or f"http:{url}"
+        self.session = requests.Session()
+
+    def generate(self, prompt, timeout):
+        response = self.session.post(
+            self.url, json={"prompt": prompt, **GENERATION_CONFIG}, timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()["text"]
+
+
+# -------------------------------
+# Cache
+# -------------------------------
+class RewriteCache:
+    """
+    In-memory LRU over a SQLite table of rewrites
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=CACHE_MAX_ENTRIES,
+                 ttl_seconds=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rewrites ("
+                " key TEXT PRIMARY KEY,"
+                " created_at REAL NOT NULL,"
+                " rewrite TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def key(model_id, query):
+        payload = f"{model_id}\x00{normalize_text(query).lower()}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        min_created_at = time.time() - self.ttl_seconds
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and entry[1] >= min_created_at:
+                self._lru.move_to_end(key)
+                return entry[0]
+
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT rewrite, created_at FROM rewrites WHERE key = ? AND created_at >= ?",
+                (key, min_created_at),
+            ).fetchone()
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                return row[0]
+
+        return None
+
+    def put(self, key, rewrite):
+        now = time.time()
+        with self._lock:
+            self._remember(key, rewrite, now)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rewrites (key, created_at, rewrite) VALUES (?, ?, ?)",
+                    (key, now, rewrite),
+                )
+                self._conn.commit()
+
+    def _remember(self, key, rewrite, created_at):
+        # Caller holds self._lock
+        self._lru[key] = (rewrite, created_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+
+# -------------------------------
+# Circuit breaker
+# -------------------------------
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half-open after `reset_timeout` seconds (one trial call);
+    a successful trial closes it again, a failed one re-opens it
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+# -------------------------------
+# Rewriter service
+# -------------------------------
+class QueryRewriter:
+    def __init__(self, backend, deadline=DEFAULT_DEADLINE,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, cache=None, breaker=None,
+                 upstream_timeout=UPSTREAM_TIMEOUT):
+        self.backend = backend
+        self.deadline = deadline
+        self.upstream_timeout = max(upstream_timeout, deadline)
+        self.cache = cache if cache is not None else RewriteCache()
+        self.breaker = breaker or CircuitBreaker()
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="rewrite"
+        )
+        self._stats_lock = threading.Lock()
+        self.counts = {
+            "calls": 0, "cache_hits": 0, "rewrites": 0, "timeouts": 0,
+            "errors": 0, "skipped_open": 0, "skipped_busy": 0,
+        }
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {**self.counts, "breaker": self.breaker.state}
+
+    def _call_upstream(self, query, key):
+        try:
+            with stage("rewrite"):
+                text = (
+                    self.backend.generate(build_prompt(query), self.upstream_timeout) or ""
+                ).strip()
+        except Exception:
+            self._count("errors")
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._slots.release()
+
+        self.breaker.record_success()
+        if text:
+            self.cache.put(key, text)
+        return text or None
+
+    def submit(self, query):
+        """
+        Start a rewrite; returns a Future resolving to the rewrite or
+        None. Cache hits, an open breaker or a full concurrency limit
+        resolve immediately without calling the upstream.
+        """
+        self._count("calls")
+        key = self.cache.key(self.backend.model_id, query)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("cache_hits")
+            return _done(cached)
+
+        # Slot first: allow() may start the half-open trial, which must
+        # then actually run
+        if not self._slots.acquire(blocking=False):
+            self._count("skipped_busy")
+            return _done(None)
+
+        if not self.breaker.allow():
+            self._slots.release()
+            self._count("skipped_open")
+            return _done(None)
+
+        # The slot is released when the upstream call ends, so calls
+        # abandoned at the deadline still count against the limit
+        return self._executor.submit(self._call_upstream, query, key)
+
+    def resolve(self, future, timeout):
+        """
+        Result of a submitted rewrite if it is ready within `timeout`, else None
+        """
+        try:
+            rewritten = future.result(timeout=timeout)
+        except FutureTimeout:
+            self._count("timeouts")
+            return None
+        except Exception:
+            # Upstream errors already counted; fall back silently
+            return None
 
-        rewritten = response.text.strip()
         if rewritten:
-            return rewritten
+            self._count("rewrites")
+        return rewritten
+
+    def rewrite(self, query, timeout=None):
+        """
+        Rewritten query, or None if unavailable within the deadline
+        """
+        return self.resolve(self.submit(query), timeout or self.deadline)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def make_backend(name=REWRITER_BACKEND):
+    if name == "off":
+        return None
+    if name == "http":
+        return HttpBackend(REWRITER_URL)
+    return GeminiBackend(MODEL_NAME)
+
+
+_rewriter = None
+_rewriter_lock = threading.Lock()
+
+
+def get_rewriter():
+    """
+    Process-wide rewriter, configured from the environment;
+    None when rewriting is off or the backend cannot be created
+    """
+    global _rewriter
+
+    if _rewriter is None:
+        with _rewriter_lock:
+            if _rewriter is None:
+                try:
+                    backend = make_backend()
+                except Exception:
+                    backend = None
+                _rewriter = QueryRewriter(backend) if backend is not None else False
+                if _rewriter:
+                    register_collector("rewriter", _rewriter.stats)
+
+    return _rewriter or None
+
+
+def rewrite_query(query: str):
+    """
+    Optional LLM-based query rewriting.
+    Fails silently and returns None if unavailable or too slow.
+    """
+    rewriter = get_rewriter()
+    if rewriter is None:
+        return None
+    return rewriter.rewrite(query)
+
+
+# -------------------------------
+# Speculative retrieval
+# -------------------------------
+REWRITE_RRF_K = 60
+
+
+def merge_results(baseline, rewritten, k):
+    """
+    Reciprocal-rank fusion of the baseline and rewritten-query
+    results (dicts with a "url"), keeping the first dict seen per url
+    """
+    scores, items = {}, {}
+    for results in (baseline, rewritten):
+        for rank, item in enumerate(results):
+            url = item["url"]
+            scores[url] = scores.get(url, 0.0) + 1.0 / (REWRITE_RRF_K + rank + 1)
+            items.setdefault(url, item)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [{**items[url], "score": scores[url]} for url in ranked]
+
+
+def speculative_recommend(query, recommend_fn, k=10, rewriter=None, deadline=None):
+    """
+    Run baseline retrieval while the rewrite is in flight; use the
+    rewrite only if it is ready by the deadline (measured from the call)
+    """
+    rewriter = rewriter or get_rewriter()
+    if rewriter is None:
+        return recommend_fn(query, k)
+
+    started = time.monotonic()
+    deadline = deadline or rewriter.deadline
+    future = rewriter.submit(query)
+
+    baseline = recommend_fn(query, k)
+
+    remaining = max(0.0, deadline - (time.monotonic() - started))
+    rewritten = rewriter.resolve(future, remaining)
+    if not rewritten:
+        return baseline
+
+    return merge_results(baseline, recommend_fn(rewritten, k), k)
+
+
+async def speculative_recommend_async(query, recommend_fn, k=10, rewriter=None,
+                                      deadline=None, executor=None):
+    """
+    asyncio flavour of speculative_recommend: retrieval runs on
+    `executor`, the event loop never blocks on the LLM
+    """
+    loop = asyncio.get_running_loop()
+    rewriter = rewriter or get_rewriter()
+    if rewriter is None:
+        return await loop.run_in_executor(executor, recommend_fn, query, k)
+
+    started = loop.time()
+    deadline = deadline or rewriter.deadline
+    future = rewriter.submit(query)
+    waiter = asyncio.wrap_future(future)
+    # Abandoned rewrites may fail later; don't leave the error unretrieved
+    waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    baseline = await loop.run_in_executor(executor, recommend_fn, query, k)
 
-    except Exception:
-        # Silent failure by design
-        pass
+    remaining = max(0.0, deadline - (loop.time() - started))
+    await asyncio.wait({waiter}, timeout=remaining)
+    rewritten = rewriter.resolve(future, 0)
+    if not rewritten:
+        return baseline
 
-    return None
+    rewritten_results = await loop.run_in_executor(executor, recommend_fn, rewritten, k)
+    return merge_results(baseline, rewritten_results, k)
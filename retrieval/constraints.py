@@ -0,0 +1,119 @@
+"""
+Extract hard constraints (duration budget, test types, remote /
+adaptive support) from free-text queries, in the form expected by
+catalog.columns.filter_rows.
+"""
+
+import re
+
+from catalog.columns import TEST_TYPE_KEYWORDS, type_bit
+
+_NUMBER = r"\d+(?:\.\d+)?|an?|one|half an?"
+_DURATION = re.compile(
+    rf"(?:(?P<low>\d+(?:\.\d+)?)\s*(?:-|–|to)\s*)?"
+    rf"\b(?P<high>{_NUMBER})\s*(?P<unit>hours?|hrs?|minutes?|mins?)\b",
+    re.I,
+)
+# Looked for just before a duration
+_MAX_CUES = re.compile(
+    r"\b((no|not|n't)\s+(be\s+)?(more|longer)\s+than|at\s*most|max(imum)?|"
+    r"up\s+to|under|less\s+than|within|below|not\s+exceed)\b", re.I,
+)
+_MIN_CUES = re.compile(
+    r"\b(at\s*least|minimum|min\.?\s+of|more\s+than|longer\s+than|over)\b", re.I
+)
+_CUE_WINDOW = 40
+
+_TEST_NOUN = re.compile(r"\b(tests?|assessments?|evaluations?)\b", re.I)
+# Words before "tests" that may name the kind of test, within one clause
+_TYPE_LIST_WORDS = 6
+_CLAUSE_BREAK = re.compile(r"[.;:!?\n(){}\[\]]")
+_REMOTE = re.compile(
+    r"\bremote(ly)?\s+(test\w*|proctor\w*|administ\w+|assess\w*)|"
+    r"\b(test\w*|assess\w*|administ\w+)\s+remotely\b", re.I,
+)
+_ADAPTIVE = re.compile(r"\badaptive\s+(test\w*|assess\w*)|\birt\b", re.I)
+
+
+def _minutes(amount, unit):
+    amount = amount.lower()
+    if amount.startswith("half"):
+        value = 0.5
+    elif amount in ("a", "an", "one"):
+        value = 1.0
+    else:
+        value = float(amount)
+
+    if unit.lower().startswith(("hour", "hr")):
+        value *= 60
+    return int(round(value))
+
+
+def extract_duration(query):
+    """
+    (min_minutes, max_minutes) from phrases like "max duration of 60
+    minutes", "30-40 mins long", "about an hour", "at least 30 mins"
+    """
+    low = high = None
+
+    for match in _DURATION.finditer(query):
+        minutes = _minutes(match.group("high"), match.group("unit"))
+        before = query[max(0, match.start() - _CUE_WINDOW):match.start()]
+
+        last_max = max((m.end() for m in _MAX_CUES.finditer(before)), default=-1)
+        last_min = max((m.end() for m in _MIN_CUES.finditer(before)), default=-1)
+
+        if last_min > last_max and not match.group("low"):
+            low = minutes if low is None else max(low, minutes)
+        else:
+            # Ranges and bare budgets ("1 hour long") cap the duration
+            high = minutes if high is None else min(high, minutes)
+
+    return low, high
+
+
+def extract_test_types(query):
+    """
+    Type bitmask for explicitly requested kinds of test
+    ("cognitive and personality tests" -> A | P)
+    """
+    mask = 0
+    for match in _TEST_NOUN.finditer(query):
+        before = query[max(0, match.start() - 80):match.start()]
+        clause = _CLAUSE_BREAK.split(before)[-1]
+        words = " ".join(clause.lower().split()[-_TYPE_LIST_WORDS:])
+        for code, stems in TEST_TYPE_KEYWORDS.items():
+            if any(stem in words for stem in stems):
+                mask |= type_bit(code)
+    return mask
+
+
+def extract_constraints(query):
+    """
+    Hard constraints stated in the query; empty dict if there are none
+    """
+    query = query or ""
+    constraints = {}
+
+    low, high = extract_duration(query)
+    if high is not None:
+        constraints["max_duration"] = high
+    if low is not None:
+        constraints["min_duration"] = low
+
+    types = extract_test_types(query)
+    if types:
+        constraints["test_types"] = types
+    if _REMOTE.search(query):
+        constraints["remote"] = True
+    if _ADAPTIVE.search(query):
+        constraints["adaptive"] = True
+
+    return constraints
+
+
+def constraint_key(constraints):
+    """
+    Hashable form, used to group queries sharing the same filter
+    """
+    return tuple(sorted(constraints.items()))
@@ -0,0 +1,211 @@
+"""
+Micro-batching for concurrent single-query calls.
+
+Threads calling recommend() at the same time (API executor threads,
+Streamlit sessions) queue their query. A call that finds no batch
+running takes everything queued and runs it at once in its own thread
+(as the batch leader), so a lone caller never waits. While batches are
+running, calls queue up. Up to max_concurrent batches run side by side;
+a new one is started by the next free caller once max_size calls are
+queued or the oldest has waited max_wait_ms. Each batch groups calls
+that share ranking options: one batched encode and one multi-row FAISS
+search per group. Each result goes back to its caller.
+
+Batch stage times and profiler samples are credited to every request
+in the batch (tracing.on_behalf_of). Batch sizes and queueing delay are
+exported as the "microbatch_size" histogram and "microbatch_queue"
+stage, plus the batcher's own counters (stats()).
+"""
+
+import os
+import time
+import weakref
+import threading
+from collections import deque
+
+from retrieval.tracing import observe, record, stage, current_request, on_behalf_of
+
+DEFAULT_MAX_WAIT_MS = 2.0
+DEFAULT_MAX_SIZE = 32
+DEFAULT_MAX_CONCURRENT = 4
+
+_batchers = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    # Only the forking thread survives; its lock may have been held
+    for batcher in list(_batchers):
+        batcher._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _Call:
+    __slots__ = ("key", "item", "request", "enqueued", "queue_ms",
+                 "taken", "done", "result", "error")
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+        self.request = current_request()
+        self.enqueued = time.perf_counter()
+        self.queue_ms = 0.0
+        self.taken = False
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent call(key, item) calls. run(key, items) gets
+    the queued items that share a key at once and returns one result
+    per item.
+    """
+
+    def __init__(self, run, max_wait_ms=DEFAULT_MAX_WAIT_MS, max_size=DEFAULT_MAX_SIZE,
+                 max_concurrent=DEFAULT_MAX_CONCURRENT, name="microbatch"):
+        self.run = run
+        self.max_wait_ms = max_wait_ms
+        self.max_size = max_size
+        self.max_concurrent = max(1, max_concurrent)
+        self.name = name
+
+        self.batches = 0
+        self.requests = 0
+        self.largest = 0
+        self.queue_ms = 0.0
+
+        self._reset()
+        _batchers.add(self)
+
+    @property
+    def enabled(self):
+        return self.max_size > 1
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._running = 0
+
+    def call(self, key, item):
+        """
+        Queue one item and block until its batch has run (possibly in
+        this thread); exceptions from run() are raised in every caller
+        of that batch. A KeyboardInterrupt / SystemExit stays in the
+        leading thread; the other callers get a RuntimeError
+        """
+        call = _Call(key, item)
+        with self._cond:
+            self._pending.append(call)
+            try:
+                while not call.done:
+                    # Once its call is in a batch, a thread only waits
+                    if call.taken:
+                        self._cond.wait()
+                        continue
+                    batch = self._take_batch()
+                    if batch is None:
+                        continue
+                    self._cond.release()
+                    try:
+                        self._run_batch(batch)
+                    finally:
+                        self._cond.acquire()
+                        self._running -= 1
+                        self._cond.notify_all()
+            except BaseException:
+                # Interrupted: nobody is left to collect a queued call
+                if not call.taken:
+                    self._pending.remove(call)
+                raise
+
+        record(f"{self.name}_queue", call.queue_ms)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _take_batch(self):
+        """
+        Next batch for this thread to lead, or None after waiting
+        (caller holds self._cond)
+        """
+        if not self._pending or self._running >= self.max_concurrent:
+            self._cond.wait()
+            return None
+
+        # Idle: dispatch at once. Busy: give more calls up to
+        # max_wait_ms (from the oldest queued) to join the batch
+        if self._running and len(self._pending) < self.max_size:
+            deadline = self._pending[0].enqueued + self.max_wait_ms / 1000
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                self._cond.wait(remaining)
+                return None
+
+        size = min(len(self._pending), self.max_size)
+        self._running += 1
+        batch = [self._pending.popleft() for _ in range(size)]
+        for call in batch:
+            call.taken = True
+        return batch
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        groups = {}
+        for call in batch:
+            call.queue_ms = (started - call.enqueued) * 1000
+            groups.setdefault(call.key, []).append(call)
+
+        with self._cond:
+            self.batches += 1
+            self.requests += len(batch)
+            self.largest = max(self.largest, len(batch))
+            self.queue_ms += sum(call.queue_ms for call in batch)
+        observe(f"{self.name}_size", len(batch))
+
+        try:
+            for key, calls in groups.items():
+                try:
+                    with on_behalf_of(call.request for call in calls), stage(f"{self.name}_run"):
+                        results = self.run(key, [call.item for call in calls])
+                except Exception as exc:
+                    for call in calls:
+                        call.error = exc
+                else:
+                    for call, result in zip(calls, results):
+                        call.result = result
+                self._finish(calls)
+        except BaseException:
+            # KeyboardInterrupt / SystemExit belong to the leader thread
+            # alone: it re-raises, the callers still waiting get an error
+            unfinished = [call for call in batch if not call.done]
+            interrupted = RuntimeError(f"{self.name}: batch leader was interrupted")
+            for call in unfinished:
+                call.error = interrupted
+            self._finish(unfinished)
+            raise
+
+    def _finish(self, calls):
+        with self._cond:
+            for call in calls:
+                call.done = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            batches, requests = self.batches, self.requests
+            return {
+                "batches": batches,
+                "requests": requests,
+                "mean_batch_size": requests / batches if batches else 0.0,
+                "max_batch_size": self.largest,
+                "mean_queue_ms": self.queue_ms / requests if requests else 0.0,
+                "pending": len(self._pending),
+                "running": self._running,
+                "max_wait_ms": self.max_wait_ms,
+                "max_size": self.max_size,
+                "max_concurrent": self.max_concurrent,
+            }
@@ -1,49 +1,107 @@
-from collections import defaultdict
+from collections import deque
 
+import numpy as np
 
-def categorize_assessment(test_type: str):
+from catalog.columns import CATEGORIES, categorize_assessment
+
+# MMR trade-off: 1.0 = pure relevance, 0.0 = pure novelty
+MMR_LAMBDA = 0.7
+
+
+def _normalize(scores):
+    # Min-max to [0, 1] so relevance is comparable with cosine similarity
+    scores = np.asarray(scores, dtype="float32")
+    low, high = scores.min(), scores.max()
+    if high - low < 1e-12:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def quota_limits(quotas):
     """
-    Map raw test type text into high-level categories
+    Per-category maximum counts as an array indexed by category code
+    ({"skills": 4, "personality": 2} -> caps, unlisted categories uncapped)
     """
-    if not test_type:
-        return "other"
+    limits = np.full(len(CATEGORIES), np.iinfo(np.int32).max, dtype="int32")
+    for category, limit in (quotas or {}).items():
+        limits[CATEGORIES.index(category)] = limit
+    return limits
 
-    t = test_type.lower()
 
-    if "cognitive" in t or "ability" in t or "aptitude" in t:
-        return "cognitive"
-    if "personality" in t or "behavior" in t:
-        return "personality"
-    if "skill" in t or "knowledge" in t or "technical" in t:
-        return "skills"
+def mmr_rerank(rows, scores, vectors, k, lambda_=MMR_LAMBDA, categories=None, quotas=None):
+    """
+    Maximal Marginal Relevance over a ranked candidate list.
+
+    rows / scores: candidates (metadata rows) and their relevance;
+    vectors: stored embedding rows (n_rows, dim), indexed by row;
+    categories: category code per row, used with per-category `quotas`.
+    Candidate similarities come from one matmul; each pick is a few
+    vector ops over the candidate pool. Quotas are dropped only when
+    they would otherwise leave fewer than k results.
+    Returns positions into `rows`, in pick order.
+    """
+    n = len(rows)
+    k = min(k, n)
+    if k == 0:
+        return np.zeros(0, dtype="int64")
+
+    candidate_vecs = np.asarray(vectors[rows], dtype="float32")
+    similarity = candidate_vecs @ candidate_vecs.T
+    relevance = lambda_ * _normalize(scores)
 
-    return "other"
+    # Picked / quota-capped candidates are masked to -inf in `base`
+    base = relevance.copy()
+    redundancy = np.zeros(n, dtype="float32")
+    picked = np.zeros(n, dtype=bool)
+    order = []
+
+    limits = quota_limits(quotas) if quotas else None
+    codes = categories[rows] if limits is not None else None
+    counts = np.zeros(len(CATEGORIES), dtype="int32")
+    if codes is not None:
+        # A quota of 0 excludes the category from the start
+        base[limits[codes] <= 0] = -np.inf
+
+    while len(order) < k:
+        mmr = base - (1 - lambda_) * redundancy
+        best = int(mmr.argmax())
+
+        if mmr[best] == -np.inf:
+            # Only capped candidates left: drop the quotas
+            base = np.where(picked, -np.inf, relevance)
+            codes = None
+            continue
+
+        order.append(best)
+        picked[best] = True
+        base[best] = -np.inf
+        np.maximum(redundancy, similarity[best], out=redundancy)
+
+        if codes is not None:
+            code = codes[best]
+            counts[code] += 1
+            if counts[code] >= limits[code]:
+                base[codes == code] = -np.inf
+
+    return np.array(order, dtype="int64")
 
 
 def balanced_rerank(candidates, top_k=10):
     """
     Ensure diversity across assessment categories
+    (round-robin over categories in SHL's preferred order)
     """
-    buckets = defaultdict(list)
+    buckets = {category: deque() for category in CATEGORIES}
 
     for item in candidates:
-        category = categorize_assessment(item.get("test_type", ""))
-        buckets[category].append(item)
+        buckets[categorize_assessment(item.get("test_type", ""))].append(item)
 
     final = []
-
-    # Priority order preferred by SHL
-    priority = ["skills", "cognitive", "personality", "other"]
-
-    while len(final) < top_k:
-        added = False
-        for p in priority:
-            if buckets[p]:
-                final.append(buckets[p].pop(0))
-                added = True
+    while len(final) < top_k and any(buckets.values()):
+        for category in CATEGORIES:
+            if buckets[category]:
+                final.append(buckets[category].popleft())
                 if len(final) == top_k:
                     break
-        if not added:
-            break
 
     return final
@@ -0,0 +1,206 @@
+"""
+Semantic result cache for recommend_batch.
+
+Final top-k rankings are cached per partition, a tuple starting with
+the index version (then k, ranking options and the constraints read
+from the query). A lookup tries the
+normalized query text first, then the nearest cached query vector in
+the same partition (inner product over unit vectors in a small FAISS
+index), so near-duplicate JDs (the same posting re-sent with small
+edits or different whitespace) reuse a ranking instead of re-running
+search, BM25 fusion and reranking.
+"""
+
+import threading
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from embeddings.embedding_cache import normalize_text
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_BYTES = 32 * 2**20
+# Cosine similarity for a semantic hit (> 1 = exact text matches only)
+DEFAULT_THRESHOLD = 0.97
+# Cached neighbours checked for a same-partition match
+NEIGHBOURS = 8
+# Rough per-entry bookkeeping (dict slots, tuple, key) on top of arrays
+_ENTRY_OVERHEAD = 256
+
+
+def text_key(text):
+    return normalize_text(text).lower()
+
+
+class ResultCache:
+    """
+    LRU over (rows, scores) rankings, bounded by entry count and bytes
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 threshold=DEFAULT_THRESHOLD):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.version = None
+
+        # entry id -> (partition, text key, rows, scores, nbytes)
+        self._entries = OrderedDict()
+        self._by_text = {}
+        self._index = None
+        self._next_id = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def reset(self, version):
+        """
+        Drop every entry when a different index version is loaded
+        """
+        with self._lock:
+            if version == self.version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+            self.version = version
+
+    def _clear(self):
+        # Caller holds self._lock
+        self._entries.clear()
+        self._by_text.clear()
+        self._index = None
+        self._bytes = 0
+
+    def _hit(self, entry_id):
+        # Caller holds self._lock
+        self._entries.move_to_end(entry_id)
+        _, _, rows, scores, _ = self._entries[entry_id]
+        return rows, scores
+
+    def lookup(self, partition, texts, encode=None):
+        """
+        Cached (rows, scores) or None per text, plus the query vectors
+        used for the nearest-neighbour tier (rows of texts that missed
+        the exact tier; None when encode is not given). encode maps a
+        list of texts to unit vectors and runs outside the lock.
+        """
+        results = [None] * len(texts)
+        if not self.enabled:
+            return results, None
+
+        with self._lock:
+            pending = []
+            for i, text in enumerate(texts):
+                entry_id = self._by_text.get((partition, text_key(text)))
+                if entry_id is not None:
+                    results[i] = self._hit(entry_id)
+                    self.exact_hits += 1
+                else:
+                    pending.append(i)
+
+        vectors = None
+        if pending and encode is not None and self.threshold <= 1.0:
+            encoded = encode([texts[i] for i in pending])
+            vectors = np.zeros((len(texts), encoded.shape[1]), dtype="float32")
+            vectors[pending] = encoded
+
+        with self._lock:
+            if vectors is not None and self._index is not None and self._index.ntotal:
+                sims, ids = self._index.search(
+                    vectors[pending], min(NEIGHBOURS, self._index.ntotal)
+                )
+                for i, row_sims, row_ids in zip(pending, sims, ids):
+                    for sim, entry_id in zip(row_sims.tolist(), row_ids.tolist()):
+                        if sim < self.threshold:
+                            break
+                        entry = self._entries.get(entry_id)
+                        if entry is not None and entry[0] == partition:
+                            results[i] = self._hit(entry_id)
+                            self.semantic_hits += 1
+                            break
+
+            self.misses += sum(1 for r in results if r is None)
+
+        return results, vectors
+
+    def put(self, partition, texts, rankings, vectors=None):
+        """
+        rankings: final (rows, scores) per text, already cut to k;
+        vectors: their unit query vectors (None = exact tier only)
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            # Computed against an index that has since been replaced
+            if partition[0] != self.version:
+                return
+            for i, (text, (rows, scores)) in enumerate(zip(texts, rankings)):
+                key = (partition, text_key(text))
+                if key in self._by_text:
+                    continue
+
+                rows, scores = np.array(rows), np.array(scores)
+                nbytes = rows.nbytes + scores.nbytes + len(key[1]) + _ENTRY_OVERHEAD
+                entry_id = self._next_id
+                self._next_id += 1
+
+                if vectors is not None:
+                    vector = np.ascontiguousarray(vectors[i:i + 1], dtype="float32")
+                    if self._index is None:
+                        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+                    self._index.add_with_ids(vector, np.array([entry_id], dtype="int64"))
+                    nbytes += vector.nbytes
+
+                self._entries[entry_id] = (partition, key[1], rows, scores, nbytes)
+                self._by_text[key] = entry_id
+                self._bytes += nbytes
+
+            self._evict()
+
+    def _evict(self):
+        # Caller holds self._lock
+        evicted = []
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            entry_id, (partition, key, _, _, nbytes) = self._entries.popitem(last=False)
+            del self._by_text[(partition, key)]
+            self._bytes -= nbytes
+            evicted.append(entry_id)
+
+        if evicted:
+            self.evictions += len(evicted)
+            if self._index is not None:
+                self._index.remove_ids(np.array(evicted, dtype="int64"))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._clear()
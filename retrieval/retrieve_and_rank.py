@@ -1,86 +1,597 @@
 import os
-import json
+import threading
 import faiss
 import numpy as np
-from embeddings.embedding_utils import EmbeddingModel
+from embeddings.embedding_utils import get_embedding_model, is_model_ready
+from embeddings.build_faiss_index import (
+    ensure_index, read_index, read_lexical_index, read_columns, read_vectors,
+    read_skill_extractor, index_version,
+)
+from embeddings.index_factory import make_search_params
+from catalog.columns import filter_rows
+from catalog.store import CatalogStore
+from retrieval.constraints import extract_constraints, constraint_key
+from retrieval.rank_utils import mmr_rerank, MMR_LAMBDA
+from retrieval.tracing import stage, observe, count, request_trace, register_collector
+from retrieval.result_cache import (
+    ResultCache, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_BYTES, DEFAULT_THRESHOLD
+)
+from retrieval.micro_batcher import (
+    MicroBatcher, DEFAULT_MAX_WAIT_MS, DEFAULT_MAX_SIZE, DEFAULT_MAX_CONCURRENT
+)
 
 # -------------------------------
 # Paths
 # -------------------------------
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-CATALOG_PATH = os.path.join(BASE_DIR, "data", "shl_catalog_raw.json")
+CATALOG_PATH = os.path.join(BASE_DIR, "data", "shl_catalog.arrow")
+INDEX_DIR = os.path.join(BASE_DIR, "embeddings", "faiss_index")
+
+# -------------------------------
+# Retrieval settings
+# -------------------------------
+CANDIDATE_POOL = 30
+QUERY_BATCH_SIZE = 64
+
+# Long-JD mode: how per-chunk scores are pooled into one score per assessment
+CHUNK_POOLING = ("max", "softmax")
+SOFTMAX_TEMPERATURE = 0.05
+
+# Hybrid ranking: dense (FAISS) and BM25 candidates fused per query
+FUSION_METHODS = ("rrf", "weighted", "none")
+DEFAULT_FUSION = "rrf"
+LEXICAL_POOL = 30
+RRF_K = 60
+# Weighted fusion: share of the min-max normalised dense score
+DENSE_WEIGHT = 0.7
+
+# Offline query expansion with the compiled skill / alias automaton
+EXPAND_QUERIES = True
+
+# Final rankings cached per index version; near-duplicate queries hit
+# when their vectors are at least this similar (> 1 = exact text only)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("SHL_RESULT_CACHE_ENTRIES", DEFAULT_MAX_ENTRIES))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("SHL_RESULT_CACHE_BYTES", DEFAULT_MAX_BYTES))
+RESULT_CACHE_THRESHOLD = float(os.getenv("SHL_RESULT_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+
+# Micro-batching of concurrent recommend() calls (off unless
+# SHL_MICROBATCH=1 or recommend(batch=True)); a batch waits for more
+# calls only while others are running, up to this long / this many
+MICROBATCH = os.getenv("SHL_MICROBATCH", "").strip().lower() in ("1", "true", "yes")
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("SHL_MICROBATCH_WAIT_MS", DEFAULT_MAX_WAIT_MS))
+MICROBATCH_MAX_SIZE = int(os.getenv("SHL_MICROBATCH_SIZE", DEFAULT_MAX_SIZE))
+MICROBATCH_MAX_CONCURRENT = int(
+    os.getenv("SHL_MICROBATCH_CONCURRENCY", DEFAULT_MAX_CONCURRENT)
+)
 
 # -------------------------------
 # Globals (cached in memory)
 # -------------------------------
 _faiss_index = None
 _metadata = None
-_embedder = None
+_lexical = None
+_columns = None
+_vectors = None
+_skills = None
+_manifest = None
+_row_faiss_ids = None
+_sorted_faiss_ids = None
+_rows_by_sorted_id = None
+_index_lock = threading.Lock()
+_warmup_thread = None
+_result_cache = ResultCache(
+    RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_THRESHOLD
+)
 
 
 def _build_index():
-    global _faiss_index, _metadata, _embedder
-
-    with open(CATALOG_PATH, "r", encoding="utf-8") as f:
-        _metadata = json.load(f)
-
-    texts = [
-        f"{item['name']} {item.get('description', '')}"
-        for item in _metadata
-    ]
+    """
+    Load the persisted index artifact (memory-mapped), rebuilding it
+    first only when its manifest no longer matches the catalogue
+    """
+    global _faiss_index, _metadata, _lexical, _columns, _vectors, _skills, _manifest
+    global _row_faiss_ids, _sorted_faiss_ids, _rows_by_sorted_id
 
-    if _embedder is None:
-        _embedder = EmbeddingModel()
+    with stage("index_load"):
+        _manifest = ensure_index(data_path=CATALOG_PATH, index_dir=INDEX_DIR)
+        index, metadata = read_index(INDEX_DIR)
+        _lexical = read_lexical_index(INDEX_DIR)
+        _columns = read_columns(INDEX_DIR)
+        _vectors = read_vectors(INDEX_DIR)
+        _skills = read_skill_extractor(INDEX_DIR)
 
-    embeddings = _embedder.embed_texts(texts)
-    embeddings = np.array(embeddings).astype("float32")
+    # Columnar rows + ID / URL / slug indexes instead of a list of dicts
+    metadata = CatalogStore.from_records(metadata)
+    _row_faiss_ids = metadata.faiss_ids
+    _rows_by_sorted_id = np.argsort(_row_faiss_ids)
+    _sorted_faiss_ids = _row_faiss_ids[_rows_by_sorted_id]
 
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
+    # Rankings computed against a previous index are no longer valid
+    _result_cache.reset(index_version(_manifest))
 
+    _metadata = metadata
     _faiss_index = index
 
 
 def _load_index():
-    global _faiss_index, _metadata
-
     if _faiss_index is None or _metadata is None:
-        _build_index()
+        with _index_lock:
+            if _faiss_index is None or _metadata is None:
+                _build_index()
 
     return _faiss_index, _metadata
 
 
-def retrieve(query, top_n=30):
+def _ids_to_rows(ids):
+    """
+    Map FAISS IDs (stable assessment IDs) to metadata rows; -1 stays -1
+    """
+    pos = np.searchsorted(_sorted_faiss_ids, ids)
+    pos = np.clip(pos, 0, len(_sorted_faiss_ids) - 1)
+    found = (ids != -1) & (_sorted_faiss_ids[pos] == ids)
+    return np.where(found, _rows_by_sorted_id[pos], -1)
+
+
+def _encoder_settings():
+    # Queries are encoded with the same encoder backend the index was built with
+    return {
+        "model_name": _manifest["model_name"],
+        "backend": _manifest.get("encoder_backend", "torch"),
+        "precision": _manifest.get("encoder_precision"),
+    }
+
+
+def _get_embedder():
+    _load_index()
+    settings = _encoder_settings()
+    if is_model_ready(**settings):
+        return get_embedding_model(**settings)
+    with stage("model_load"):
+        return get_embedding_model(**settings)
+
+
+def _query_cache_stats():
+    # Query-embedding cache hit rates, read by the metrics exporters
+    if _manifest is None or not is_model_ready(**_encoder_settings()):
+        return {}
+    cache = get_embedding_model(**_encoder_settings()).cache
+    return cache.stats() if cache is not None else {}
+
+
+register_collector("query_embedding_cache", _query_cache_stats)
+register_collector("result_cache", _result_cache.stats)
+
+
+def get_result_cache():
+    """
+    The process-wide result cache (stats, clear, threshold tuning)
+    """
+    return _result_cache
+
+
+def warm_up(background=False):
+    """
+    Load the index and the shared embedding model ahead of the
+    first query (optionally in a daemon thread)
+    """
+    global _warmup_thread
+
+    if not background:
+        _get_embedder()
+        return None
+
+    with _index_lock:
+        if _warmup_thread is None or not _warmup_thread.is_alive():
+            if not is_ready():
+                _warmup_thread = threading.Thread(
+                    target=_get_embedder, name="retrieval-warmup", daemon=True
+                )
+                _warmup_thread.start()
+
+    return _warmup_thread
+
+
+def index_manifest():
+    """
+    Manifest of the loaded index artifact (loads it if needed)
+    """
+    _load_index()
+    return _manifest
+
+
+def is_ready():
+    """
+    True once the index is loaded and the model is warm
+    """
+    return _manifest is not None and is_model_ready(**_encoder_settings())
+
+
+def retrieve(query, top_n=CANDIDATE_POOL):
+    with request_trace("retrieve"):
+        return _retrieve(query, top_n)
+
+
+def _retrieve(query, top_n):
     index, metadata = _load_index()
 
-    embedder = EmbeddingModel()
-    query_vec = embedder.embed_texts([query]).astype("float32")
+    embedder = _get_embedder()
+    with stage("encode"):
+        query_vec = embedder.embed_texts([query]).astype("float32")
+
+    with stage("faiss_search"):
+        scores, ids = index.search(query_vec, top_n)
+    indices = _ids_to_rows(ids)
+
+    names, urls = metadata.column("name"), metadata.column("url")
+    return [
+        {"name": names[idx], "url": urls[idx], "score": float(score)}
+        for idx, score in zip(indices[0].tolist(), scores[0].tolist())
+        if idx != -1
+    ]
+
+
+def _encode_queries(queries, batch_size=QUERY_BATCH_SIZE):
+    """
+    Encode queries in length-sorted batches so each batch pads
+    to similar lengths; rows come back in input order
+    """
+    embedder = _get_embedder()
+    order = sorted(range(len(queries)), key=lambda i: len(queries[i]))
+
+    vectors = None
+    with stage("encode"):
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            batch_vecs = embedder.embed_texts(
+                [queries[i] for i in chunk], batch_size=batch_size
+            )
+            if vectors is None:
+                vectors = np.empty((len(queries), batch_vecs.shape[1]), dtype="float32")
+            vectors[chunk] = batch_vecs
+
+    return vectors
+
+
+def _rank_rows(scores, indices, k):
+    """
+    Vectorized re-ranking of a (n_queries, top_n) search result:
+    sort each row by descending score, padding (-1) last
+    """
+    scores = np.where(indices == -1, -np.inf, scores)
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return (
+        np.take_along_axis(scores, order, axis=1),
+        np.take_along_axis(indices, order, axis=1),
+    )
+
+
+def _filtered_search(index, vectors, n, allowed):
+    """
+    FAISS search, restricted to the allowed metadata rows (if any)
+    through an ID selector instead of over-fetching and post-filtering
+    """
+    with stage("faiss_search"):
+        if allowed is None:
+            return index.search(vectors, n)
+
+        selector = faiss.IDSelectorBatch(_row_faiss_ids[allowed])
+        return index.search(vectors, n, params=make_search_params(index, selector))
+
+
+def _search(queries, n, allowed=None):
+    """
+    One vector per query (long inputs truncated by the encoder).
+    Returns (rows, scores) per query, best first.
+    """
+    index, _ = _load_index()
+
+    query_vecs = _encode_queries(queries)
+    scores, ids = _filtered_search(index, query_vecs, n, allowed)
+    indices = _ids_to_rows(ids)
+    scores, indices = _rank_rows(scores, indices, n)
 
-    scores, indices = index.search(query_vec, top_n)
+    return [
+        (row_indices[row_indices != -1], row_scores[row_indices != -1])
+        for row_scores, row_indices in zip(scores, indices)
+    ]
+
+
+def _pool_chunk_scores(rows, scores, num_chunks, pooling, n):
+    """
+    Aggregate candidate scores from all chunks of one query: max, or a
+    temperature-scaled log-mean-exp over chunks (a soft max that also
+    rewards assessments matched by several chunks; never exceeds max)
+    """
+    valid = rows != -1
+    candidates, inverse = np.unique(rows[valid], return_inverse=True)
+    scores = scores[valid]
+    if not len(candidates):
+        return candidates, scores
+
+    if pooling == "max":
+        pooled = np.full(len(candidates), -np.inf, dtype="float32")
+        np.maximum.at(pooled, inverse, scores)
+    else:
+        top = scores.max()
+        weights = np.zeros(len(candidates), dtype="float64")
+        np.add.at(weights, inverse, np.exp((scores - top) / SOFTMAX_TEMPERATURE))
+        pooled = top + SOFTMAX_TEMPERATURE * np.log(weights / num_chunks)
+
+    best = np.argsort(-pooled, kind="stable")[:n]
+    return candidates[best], pooled[best]
+
+
+def _search_chunked(queries, n, pooling, allowed=None):
+    """
+    Long-JD mode: split queries into overlapping token windows, encode
+    all windows of all queries together and pool chunk scores per query
+    """
+    if pooling not in CHUNK_POOLING:
+        raise ValueError(f"pooling must be one of {CHUNK_POOLING}")
+
+    index, _ = _load_index()
+
+    embedder = _get_embedder()
+    with stage("encode"):
+        vectors, owners = embedder.embed_chunked(queries, batch_size=QUERY_BATCH_SIZE)
+    observe("query_chunks", len(vectors))
+    scores, ids = _filtered_search(index, vectors, n, allowed)
+    rows = _ids_to_rows(ids)
+
+    # owners is sorted: chunks of query i are a contiguous block of rows
+    bounds = np.searchsorted(owners, np.arange(len(queries) + 1))
+    return [
+        _pool_chunk_scores(
+            rows[bounds[i]:bounds[i + 1]].ravel(),
+            scores[bounds[i]:bounds[i + 1]].ravel(),
+            bounds[i + 1] - bounds[i],
+            pooling,
+            n,
+        )
+        for i in range(len(queries))
+    ]
+
+
+def _min_max(scores):
+    if not len(scores):
+        return scores
+    low, high = scores.min(), scores.max()
+    if high - low < 1e-12:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
 
-    results = []
-    for idx, score in zip(indices[0], scores[0]):
-        if idx == -1:
-            continue
-        item = metadata[idx]
-        results.append({
-            "name": item["name"],
-            "url": item["url"],
-            "score": float(score)
-        })
 
-    return results
+def _fuse(dense, lexical, method):
+    """
+    Merge the dense and BM25 candidate lists of one query into a
+    single (rows, scores) ranking, best first
+    """
+    dense_rows, dense_scores = dense
+    lexical_rows, lexical_scores = lexical
+    if not len(lexical_rows):
+        return dense
 
+    if method == "rrf":
+        contributions = np.concatenate([
+            1.0 / (RRF_K + 1 + np.arange(len(dense_rows))),
+            1.0 / (RRF_K + 1 + np.arange(len(lexical_rows))),
+        ])
+    else:
+        contributions = np.concatenate([
+            DENSE_WEIGHT * _min_max(np.asarray(dense_scores, dtype="float64")),
+            (1 - DENSE_WEIGHT) * _min_max(np.asarray(lexical_scores, dtype="float64")),
+        ])
+
+    candidates, inverse = np.unique(
+        np.concatenate([dense_rows, lexical_rows]), return_inverse=True
+    )
+    fused = np.zeros(len(candidates), dtype="float64")
+    np.add.at(fused, inverse, contributions)
+
+    order = np.argsort(-fused, kind="stable")
+    return candidates[order], fused[order]
+
+
+def _rank_queries(queries, pool, chunked, pooling, fusion, allowed):
+    """
+    Dense (+ fused BM25) ranking for queries sharing one row filter
+    """
+    if chunked:
+        ranked = _search_chunked(queries, pool, pooling, allowed)
+    else:
+        ranked = _search(queries, pool, allowed)
+
+    if fusion != "none":
+        # BM25 sees the whole query text, even where the encoder truncates
+        with stage("bm25"):
+            lexical = _lexical.top_n(queries, max(LEXICAL_POOL, pool), allowed)
+        with stage("fusion"):
+            ranked = [_fuse(d, l, fusion) for d, l in zip(ranked, lexical)]
+
+    return ranked
 
-def recommend(query, k=10):
-    candidates = retrieve(query, top_n=30)
 
-    # Simple re-ranking (semantic score only for stability)
-    ranked = sorted(
-        candidates,
-        key=lambda x: x["score"],
-        reverse=True
+def _diversify(ranked, k, mmr_lambda, quotas):
+    """
+    MMR (+ optional category quotas) over a query's candidate pool
+    """
+    rows, scores = ranked
+    picked = mmr_rerank(
+        rows, scores, _vectors, k, mmr_lambda,
+        categories=_columns["category"], quotas=quotas,
     )
+    return rows[picked], scores[picked]
+
+
+def extract_terms(query):
+    """
+    Canonical skill / role / assessment terms the offline extractor
+    finds in a query
+    """
+    _load_index()
+    return _skills.extract(query)
+
+
+def recommend_batch(queries, k=10, chunked=False, pooling="max", fusion=DEFAULT_FUSION,
+                    filters=True, diversify=False, mmr_lambda=MMR_LAMBDA, quotas=None,
+                    expand=EXPAND_QUERIES, cache=True):
+    """
+    Recommend for many queries at once: duplicates are encoded once,
+    all queries share a single multi-row FAISS search.
+    chunked=True encodes long JDs as overlapping windows instead of
+    truncating them, pooling chunk scores with `pooling` (max / softmax).
+    fusion merges the dense ranking with BM25 ("rrf", "weighted"),
+    or keeps it dense-only ("none").
+    filters=True honours constraints stated in the query (duration,
+    test type, remote / adaptive support): only matching assessments
+    are searched, one search per distinct set of constraints.
+    diversify=True re-ranks each candidate pool with MMR over the stored
+    document vectors (mmr_lambda: 1.0 = relevance only), optionally
+    capping categories with quotas, e.g. {"skills": 5, "personality": 3}.
+    expand=True prepends the skill / role terms found by the offline
+    alias automaton ("JS" -> "JavaScript") to the text that is encoded
+    and BM25-scored; constraints are still read from the original query.
+    cache=True serves repeated and near-duplicate queries from the result
+    cache (same index version, options and constraints; exact normalized
+    text, else query vector similarity >= RESULT_CACHE_THRESHOLD).
+    """
+    if fusion not in FUSION_METHODS:
+        raise ValueError(f"fusion must be one of {FUSION_METHODS}")
+
+    with request_trace("recommend"):
+        return _recommend_batch(
+            queries, k, chunked, pooling, fusion, filters, diversify,
+            mmr_lambda, quotas, expand, cache,
+        )
+
 
-    return ranked[:k]
+def _recommend_batch(queries, k, chunked, pooling, fusion, filters, diversify,
+                     mmr_lambda, quotas, expand, cache):
+    unique_queries = list(dict.fromkeys(queries))
+    if not unique_queries:
+        return [[] for _ in queries]
+
+    count("queries", len(queries))
+    observe("batch_queries", len(unique_queries))
+
+    _, metadata = _load_index()
+    pool = max(CANDIDATE_POOL, k)
+
+    groups = {}
+    with stage("constraints"):
+        for query in unique_queries:
+            constraints = extract_constraints(query) if filters else {}
+            key = constraint_key(constraints)
+            groups.setdefault(key, (constraints, []))[1].append(query)
+
+    # Expanded text only for queries that miss the result cache
+    search_text = {}
+
+    def texts_for(group):
+        missing = [q for q in group if q not in search_text]
+        if missing:
+            with stage("expand"):
+                search_text.update((q, _skills.expand(q) if expand else q) for q in missing)
+        return [search_text[q] for q in group]
+
+    # Everything besides the query text and its constraints that shapes the ranking
+    options = (
+        k, fusion, expand,
+        pooling if chunked else None,
+        (mmr_lambda, tuple(sorted((quotas or {}).items()))) if diversify else None,
+    )
+    # Chunked rankings see the whole JD; one truncated vector is not a safe key
+    encode = None if chunked else (lambda qs: _encode_queries(texts_for(qs)))
+
+    ranked_by_query = {}
+    for key, (constraints, group) in groups.items():
+        partition = (_result_cache.version, options, key)
+        vectors = None
+        if cache:
+            cached, vectors = _result_cache.lookup(partition, group, encode)
+            ranked_by_query.update((q, c) for q, c in zip(group, cached) if c is not None)
+            misses = [i for i, c in enumerate(cached) if c is None]
+            if not misses:
+                continue
+            group = [group[i] for i in misses]
+            if vectors is not None:
+                vectors = vectors[misses]
+
+        with stage("filter"):
+            allowed = filter_rows(_columns, constraints) if constraints else None
+        if allowed is not None and allowed.all():
+            allowed = None
+
+        if allowed is not None and not allowed.any():
+            ranked = [(np.zeros(0, dtype="int64"), np.zeros(0))] * len(group)
+        else:
+            ranked = _rank_queries(texts_for(group), pool, chunked, pooling, fusion, allowed)
+        for rows, _ in ranked:
+            observe("candidates", len(rows))
+        if diversify:
+            with stage("rerank"):
+                ranked = [_diversify(r, k, mmr_lambda, quotas) for r in ranked]
+
+        ranked = [(rows[:k], scores[:k]) for rows, scores in ranked]
+        if cache:
+            _result_cache.put(partition, group, ranked, vectors)
+        ranked_by_query.update(zip(group, ranked))
+
+    names, urls = metadata.column("name"), metadata.column("url")
+    return [
+        [
+            {"name": names[idx], "url": urls[idx], "score": score}
+            for idx, score in zip(*(a.tolist() for a in ranked_by_query[query]))
+        ]
+        for query in queries
+    ]
+
+
+def _run_microbatch(options, queries):
+    k, chunked, pooling, fusion, filters, diversify, mmr_lambda, quotas, expand, cache = options
+    return _recommend_batch(
+        queries, k, chunked, pooling, fusion, filters, diversify,
+        mmr_lambda, dict(quotas) if quotas is not None else None, expand, cache,
+    )
+
+
+_micro_batcher = MicroBatcher(
+    _run_microbatch, MICROBATCH_MAX_WAIT_MS, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_CONCURRENT
+)
+register_collector("microbatch", _micro_batcher.stats)
+
+
+def get_micro_batcher():
+    """
+    The process-wide micro-batcher (stats, wait / size tuning)
+    """
+    return _micro_batcher
+
+
+def recommend(query, k=10, chunked=False, pooling="max", fusion=DEFAULT_FUSION,
+              filters=True, diversify=False, mmr_lambda=MMR_LAMBDA, quotas=None,
+              expand=EXPAND_QUERIES, cache=True, batch=None):
+    """
+    One query; same options as recommend_batch. batch=True lets calls
+    made concurrently from other threads share one batched encode and
+    search (a lone call runs at once; None = MICROBATCH setting).
+    """
+    if batch is None:
+        batch = MICROBATCH
+    if not (batch and _micro_batcher.enabled):
+        return recommend_batch(
+            [query], k=k, chunked=chunked, pooling=pooling, fusion=fusion,
+            filters=filters, diversify=diversify, mmr_lambda=mmr_lambda, quotas=quotas,
+            expand=expand, cache=cache,
+        )[0]
+
+    if fusion not in FUSION_METHODS:
+        raise ValueError(f"fusion must be one of {FUSION_METHODS}")
+
+    # Calls with the same options can share a batch
+    options = (
+        k, chunked, pooling, fusion, filters, diversify, mmr_lambda,
+        tuple(sorted(quotas.items())) if quotas is not None else None, expand, cache,
+    )
+    with request_trace("recommend"):
+        return _micro_batcher.call(options, query)
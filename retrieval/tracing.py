@@ -0,0 +1,561 @@
+"""
+Lightweight tracing for the recommendation hot path.
+
+stage("encode") times a block into a per-stage latency histogram and
+into the current request's breakdown (record() adds a duration timed
+elsewhere, such as queueing delay; on_behalf_of() credits work one
+thread does for several requests, e.g. a shared micro-batch, to each
+of them); observe() feeds value histograms
+(candidate counts, batch sizes); count() bumps counters; collectors
+export cache statistics at read time. Everything is a no-op until
+enable() (or SHL_TRACING=1), so disabled hooks cost one flag check.
+
+Metrics are read as Prometheus text (prometheus_text(), served at
+/metrics by api/server.py) or as a periodic JSON log line
+(start_log_reporter). SamplingProfiler is an opt-in stack sampler that
+writes folded stacks (flamegraph.pl / speedscope input) for requests
+slower than SLOW_REQUEST_MS.
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import logging
+import threading
+import itertools
+import contextvars
+from collections import Counter
+from contextlib import nullcontext
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+METRIC_PREFIX = "shl"
+LATENCY_BUCKETS_MS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500,
+    5000, 10000,
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 30, 50, 100, 200, 500)
+
+# Requests slower than this log their stage breakdown (and keep a profile)
+SLOW_REQUEST_MS = float(os.getenv("SHL_SLOW_REQUEST_MS", "1000"))
+LOG_INTERVAL_S = 60
+PROFILE_INTERVAL_S = 0.005
+PROFILE_DIR = os.path.join(PROJECT_ROOT, "logs", "profiles")
+PROFILE_MAX_DEPTH = 64
+
+logger = logging.getLogger("shl.tracing")
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; counts[i] holds values in
+    (buckets[i - 1], buckets[i]], the last slot is +Inf
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimate, interpolating linearly inside the bucket
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return float(self.buckets[-1])
+                low = self.buckets[i - 1] if i else 0.0
+                return low + (self.buckets[i] - low) * (rank - seen) / n
+            seen += n
+        return float(self.buckets[-1])
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50": round(self.quantile(0.50), 3),
+            "p95": round(self.quantile(0.95), 3),
+            "p99": round(self.quantile(0.99), 3),
+        }
+
+
+class Metrics:
+    """
+    Process-wide registry: stage latencies (ms), value histograms,
+    counters and read-time collectors
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.values = {}
+        self.counters = Counter()
+        self.collectors = {}
+
+    def record_stage(self, name, ms):
+        with self._lock:
+            hist = self.stages.get(name)
+            if hist is None:
+                hist = self.stages[name] = Histogram(LATENCY_BUCKETS_MS)
+            hist.observe(ms)
+
+    def observe(self, name, value):
+        with self._lock:
+            hist = self.values.get(name)
+            if hist is None:
+                hist = self.values[name] = Histogram(COUNT_BUCKETS)
+            hist.observe(value)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def register_collector(self, name, fn):
+        self.collectors[name] = fn
+
+    def collect(self):
+        """
+        Numeric values from each collector; failing collectors are skipped
+        """
+        out = {}
+        for name, fn in list(self.collectors.items()):
+            try:
+                values = fn() or {}
+            except Exception:
+                continue
+            out[name] = {
+                k: float(v) for k, v in values.items()
+                if isinstance(v, (int, float))
+            }
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: h.summary() for name, h in self.stages.items()}
+            values = {name: h.summary() for name, h in self.values.items()}
+            counters = dict(self.counters)
+        return {
+            "stages_ms": stages,
+            "values": values,
+            "counters": counters,
+            "collectors": self.collect(),
+        }
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            stages = [(name, _copy(h)) for name, h in sorted(self.stages.items())]
+            values = [(name, _copy(h)) for name, h in sorted(self.values.items())]
+            counters = sorted(self.counters.items())
+
+        if stages:
+            metric = f"{METRIC_PREFIX}_stage_duration_seconds"
+            lines += [
+                f"# HELP {metric} Time spent per recommendation stage",
+                f"# TYPE {metric} histogram",
+            ]
+            for name, hist in stages:
+                lines += _histogram_lines(metric, hist, {"stage": name}, scale=1e-3)
+
+        for name, hist in values:
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines += [f"# TYPE {metric} histogram"]
+            lines += _histogram_lines(metric, hist, {})
+
+        for name, value in counters:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+        for collector, values in sorted(self.collect().items()):
+            for key, value in sorted(values.items()):
+                metric = f"{METRIC_PREFIX}_{collector}_{key}"
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.values.clear()
+            self.counters.clear()
+
+
+def _copy(hist):
+    clone = Histogram(hist.buckets)
+    clone.counts = list(hist.counts)
+    clone.total, clone.count = hist.total, hist.count
+    return clone
+
+
+def _histogram_lines(metric, hist, labels, scale=1.0):
+    def fmt(extra):
+        pairs = {**labels, **extra}
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs.items()) + "}"
+
+    lines = []
+    cumulative = 0
+    for bound, n in zip(hist.buckets, hist.counts):
+        cumulative += n
+        lines.append(f"{metric}_bucket{fmt({'le': f'{bound * scale:g}'})} {cumulative}")
+    lines.append(f"{metric}_bucket{fmt({'le': '+Inf'})} {hist.count}")
+    lines.append(f"{metric}_sum{fmt({})} {hist.total * scale:.6f}")
+    lines.append(f"{metric}_count{fmt({})} {hist.count}")
+    return lines
+
+
+_metrics = Metrics()
+_enabled = os.getenv("SHL_TRACING", "").strip().lower() in ("1", "true", "yes")
+_profiler = None
+_reporter = None
+# Stage breakdown (name -> ms) of the request running in this context
+_current_trace = contextvars.ContextVar("shl_trace", default=None)
+# Its sampling profiler handle (None when the profiler is off)
+_current_profile = contextvars.ContextVar("shl_profile", default=None)
+_NULL = nullcontext()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_slow_request_ms(ms):
+    global SLOW_REQUEST_MS
+    SLOW_REQUEST_MS = float(ms)
+
+
+def get_metrics():
+    return _metrics
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.start) * 1000
+        _metrics.record_stage(self.name, ms)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace[self.name] = trace.get(self.name, 0.0) + ms
+        return False
+
+
+def stage(name):
+    """
+    Context manager timing one stage of the hot path
+    """
+    if not _enabled:
+        return _NULL
+    return _Stage(name)
+
+
+def record(name, ms):
+    """
+    A stage duration measured elsewhere (e.g. time spent queued in
+    another thread), into the histogram and the current request
+    """
+    if not _enabled:
+        return
+    _metrics.record_stage(name, ms)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace[name] = trace.get(name, 0.0) + ms
+
+
+def observe(name, value):
+    if _enabled:
+        _metrics.observe(name, value)
+
+
+def count(name, n=1):
+    if _enabled:
+        _metrics.count(name, n)
+
+
+def register_collector(name, fn):
+    """
+    fn() -> {key: number}, read whenever metrics are exported
+    (e.g. cache hit / miss counts kept by the cache itself)
+    """
+    _metrics.register_collector(name, fn)
+
+
+class _RequestTrace:
+    """
+    Outermost traced call: records the total, and for slow requests
+    logs the stage breakdown and keeps the sampled profile
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+
+    def __enter__(self):
+        self._token = _current_trace.set(self.stages)
+        profiler = _profiler
+        self._profile = profiler.begin() if profiler is not None else None
+        self._profiler = profiler
+        self._profile_token = _current_profile.set(self._profile)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        total_ms = (time.perf_counter() - self.start) * 1000
+        _current_profile.reset(self._profile_token)
+        _current_trace.reset(self._token)
+        _metrics.record_stage(self.name, total_ms)
+
+        slow = total_ms >= SLOW_REQUEST_MS
+        profile_path = None
+        if self._profile is not None:
+            profile_path = self._profiler.end(self._profile, slow, self.name, total_ms)
+
+        if slow:
+            _metrics.count("slow_requests")
+            logger.warning(json.dumps({
+                "event": "slow_request",
+                "name": self.name,
+                "total_ms": round(total_ms, 3),
+                "stages_ms": {k: round(v, 3) for k, v in self.stages.items()},
+                "profile": profile_path,
+            }))
+        return False
+
+
+def request_trace(name):
+    """
+    Wrap one request; nested calls (recommend -> recommend_batch)
+    only time a stage
+    """
+    if not _enabled:
+        return _NULL
+    if _current_trace.get() is not None:
+        return _Stage(name)
+    return _RequestTrace(name)
+
+
+def current_request():
+    """
+    Handle on the traced request running in this context (None if
+    none), for on_behalf_of() in the thread that does its work
+    """
+    if not _enabled:
+        return None
+    stages = _current_trace.get()
+    if stages is None:
+        return None
+    return stages, _current_profile.get()
+
+
+class _OnBehalfOf:
+    def __init__(self, requests):
+        self.requests = requests
+        self.stages = {}
+
+    def __enter__(self):
+        self._token = _current_trace.set(self.stages)
+        ident = threading.get_ident()
+        profiler = _profiler
+        for _, profile in self.requests:
+            if profile is not None and profiler is not None:
+                profiler.follow(profile, ident)
+        return self
+
+    def __exit__(self, *exc):
+        _current_trace.reset(self._token)
+        profiler = _profiler
+        for stages, profile in self.requests:
+            for name, ms in self.stages.items():
+                stages[name] = stages.get(name, 0.0) + ms
+            if profile is not None and profiler is not None:
+                profiler.follow(profile, None)
+        return False
+
+
+def on_behalf_of(requests):
+    """
+    Run a block for several requests (current_request() handles, None
+    entries skipped): its stage times are added to each request's
+    breakdown and the profiler samples this thread for each of them
+    """
+    requests = [r for r in requests if r is not None]
+    if not _enabled or not requests:
+        return _NULL
+    return _OnBehalfOf(requests)
+
+
+def snapshot():
+    return _metrics.snapshot()
+
+
+def prometheus_text():
+    return _metrics.prometheus_text()
+
+
+# -------------------------------
+# Periodic structured log line
+# -------------------------------
+def start_log_reporter(interval=LOG_INTERVAL_S):
+    """
+    Log a JSON metrics snapshot every `interval` seconds (daemon thread)
+    """
+    global _reporter
+
+    if _reporter is not None and _reporter.is_alive():
+        return _reporter
+
+    def run():
+        while True:
+            time.sleep(interval)
+            logger.info(json.dumps({"event": "metrics", **_metrics.snapshot()}))
+
+    _reporter = threading.Thread(target=run, name="metrics-log", daemon=True)
+    _reporter.start()
+    return _reporter
+
+
+# -------------------------------
+# Opt-in sampling profiler
+# -------------------------------
+def _fold(frame, max_depth):
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of threads currently inside a traced request
+    every `interval` seconds; a request's samples are written as folded
+    stacks ("a;b;c count" lines) only when it turns out to be slow.
+    Costs nothing per request beyond registering the thread; the
+    sampler thread only walks stacks while requests are in flight.
+    While another thread does a request's work (follow()), that
+    thread is sampled for it instead.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_S, out_dir=PROFILE_DIR,
+                 max_depth=PROFILE_MAX_DEPTH):
+        self.interval = interval
+        self.out_dir = out_dir
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._active = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._sequence = itertools.count()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def begin(self):
+        # [own thread, thread sampled now, samples]
+        ident = threading.get_ident()
+        handle = [ident, ident, Counter()]
+        with self._lock:
+            self._active[id(handle)] = handle
+        return handle
+
+    def follow(self, handle, ident):
+        """
+        Sample thread `ident` for this request while it does the
+        request's work (None = back to the request's own thread)
+        """
+        with self._lock:
+            handle[1] = handle[0] if ident is None else ident
+
+    def end(self, handle, keep, label, total_ms):
+        """
+        Stop sampling the request; returns the profile path if kept
+        """
+        samples = handle[2]
+        with self._lock:
+            self._active.pop(id(handle), None)
+        if not keep or not samples:
+            return None
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(
+            self.out_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{next(self._sequence):04d}-"
+            f"{label}-{int(total_ms)}ms.folded",
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in samples.most_common():
+                f.write(f"{stack} {n}\n")
+        return path
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                active = [(h[1], h[2]) for h in self._active.values()]
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, samples in active:
+                frame = frames.get(ident)
+                if frame is not None:
+                    samples[_fold(frame, self.max_depth)] += 1
+
+
+def enable_profiler(interval=PROFILE_INTERVAL_S, out_dir=PROFILE_DIR):
+    """
+    Turn on tracing plus the sampling profiler for slow requests
+    """
+    global _profiler
+
+    enable()
+    if _profiler is None:
+        _profiler = SamplingProfiler(interval, out_dir).start()
+    return _profiler
+
+
+def disable_profiler():
+    global _profiler
+
+    if _profiler is not None:
+        _profiler.stop()
+        _profiler = None
@@ -0,0 +1,110 @@
+"""
+Micro-benchmark: single-pass lxml extractor vs the previous
+BeautifulSoup (html.parser) extractor on a saved catalogue page.
+
+    python scraper/bench_extractor.py [--page logs/catalog_debug.html]
+"""
+
+import sys
+import os
+
+# Ensure project root is on PYTHONPATH
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import time
+import argparse
+import warnings
+from bs4 import BeautifulSoup
+
+from catalog.ids import assessment_id_for_url
+from scraper.page_extractor import extract_assessment_fields, extract_many
+
+DEFAULT_PAGE = os.path.join(PROJECT_ROOT, "logs", "catalog_debug.html")
+BENCH_URL = "https://www.shl.com/products/product-catalog/view/bench/"
+
+
+def legacy_extract(page_html, url):
+    """
+    The original scrape_assessment_page parsing logic
+    """
+    soup = BeautifulSoup(page_html, "html.parser")
+
+    try:
+        name = soup.find("h1").get_text(strip=True)
+    except Exception:
+        return None
+
+    description = ""
+    desc = soup.find("div", class_="product-description")
+    if desc:
+        description = desc.get_text(" ", strip=True)
+
+    def extract(label):
+        tag = soup.find(text=lambda x: x and label.lower() in x.lower())
+        if tag:
+            nxt = tag.find_next()
+            if nxt:
+                return nxt.get_text(strip=True)
+        return ""
+
+    return {
+        "assessment_id": assessment_id_for_url(url),
+        "name": name,
+        "url": url,
+        "description": description,
+        "test_type": extract("Test Type"),
+        "duration": extract("Duration"),
+        "remote_support": extract("Remote"),
+        "adaptive_support": extract("Adaptive")
+    }
+
+
+def time_it(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--page", default=DEFAULT_PAGE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pool-pages", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with open(args.page, "r", encoding="utf-8") as f:
+        page_html = f.read()
+
+    print(f"📄 Page: {args.page} ({len(page_html) / 1024:.0f} KB)")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        legacy_s, legacy = time_it(lambda: legacy_extract(page_html, BENCH_URL), args.repeat)
+    fast_s, fast = time_it(lambda: extract_assessment_fields(page_html, BENCH_URL), args.repeat)
+
+    print(f"🐢 BeautifulSoup extractor: {legacy_s * 1000:8.1f} ms/page")
+    print(f"⚡ lxml single-pass:        {fast_s * 1000:8.1f} ms/page")
+    print(f"🚀 Speed-up: {legacy_s / fast_s:.1f}x")
+
+    mismatched = [k for k in legacy if legacy[k] != fast.get(k)]
+    if mismatched:
+        print(f"⚠️  Fields differing from legacy output: {mismatched}")
+    else:
+        print("✅ Output identical to legacy extractor")
+
+    pages = [(page_html, BENCH_URL)] * args.pool_pages
+    start = time.perf_counter()
+    extract_many(pages, workers=args.workers)
+    pool_s = time.perf_counter() - start
+    print(
+        f"🧵 Process pool ({args.workers} workers): "
+        f"{args.pool_pages / pool_s:.1f} pages/s over {args.pool_pages} pages"
+    )
+
+
+if __name__ == "__main__":
+    main()
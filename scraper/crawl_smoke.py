@@ -0,0 +1,159 @@
+"""
+Crawl-then-kill-then-resume run against the local stand-in site
+(scraper/fake_site_server.py), checking the crawler's limits:
+
+  1. crawl with --workers / --rate, SIGKILL it once a share of the
+     pages are in the checkpoint
+  2. check the site never saw more than --workers requests at once,
+     nor more than the rate limiter allows in any one second
+  3. rerun the crawl: it must resume from the checkpoint, fetch only
+     the pages left (plus the few in flight at the kill) and write
+     every page to the catalogue
+  4. rerun with --incremental: unchanged sitemap lastmods, no fetches
+
+    python scraper/crawl_smoke.py [--pages 40 --workers 4 --rate 8]
+
+Exits non-zero when a check fails. Everything is written to a
+temporary directory; the real catalogue files are not touched.
+"""
+
+import sys
+import os
+
+# Ensure project root is on PYTHONPATH
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import json
+import math
+import time
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from scraper.fake_site_server import create_server
+
+SCRAPER = os.path.join(PROJECT_ROOT, "scraper", "scrape_shl.py")
+CRAWL_TIMEOUT_S = 300
+
+
+def crawl_command(args, site, tmp, *extra):
+    return [
+        sys.executable, SCRAPER,
+        "--sitemap", f"{site}/sitemap_index.xml",
+        "--workers", str(args.workers),
+        "--rate", str(args.rate),
+        "--checkpoint", os.path.join(tmp, "checkpoint.jsonl"),
+        "--state", os.path.join(tmp, "crawl_state.json"),
+        "--delta", os.path.join(tmp, "delta.json"),
+        "--output", os.path.join(tmp, "catalog.json"),
+        "--snapshot", os.path.join(tmp, "catalog.arrow"),
+        *extra,
+    ]
+
+
+def checkpoint_lines(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        return f.read().count(b"\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl / kill / resume smoke test")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=8.0, help="requests per second per host")
+    parser.add_argument("--delay", type=float, default=0.1, help="seconds per product page")
+    parser.add_argument("--kill-after", type=float, default=0.4,
+                        help="share of pages checkpointed before the kill")
+    parser.add_argument("--port", type=int, default=0, help="0 = any free port")
+    args = parser.parse_args()
+
+    server, stats = create_server(port=args.port, pages=args.pages, delay=args.delay)
+    site = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🌐 Stand-in site on {site} ({args.pages} product pages)")
+
+    failures = []
+
+    def check(ok, message):
+        print(f"{'✅' if ok else '❌'} {message}")
+        if not ok:
+            failures.append(message)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, "checkpoint.jsonl")
+
+        # 1. Crawl, then kill it part-way
+        kill_at = max(1, int(args.pages * args.kill_after))
+        proc = subprocess.Popen(
+            crawl_command(args, site, tmp), cwd=PROJECT_ROOT,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + CRAWL_TIMEOUT_S
+        while checkpoint_lines(checkpoint) < kill_at and proc.poll() is None:
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        proc.send_signal(signal.SIGKILL)
+        proc.wait()
+        killed_with = checkpoint_lines(checkpoint)
+        print(f"💥 Killed the crawl with {killed_with}/{args.pages} pages checkpointed")
+        check(0 < killed_with < args.pages, "crawl was interrupted part-way")
+
+        # 2. Limits seen by the site
+        first = stats.snapshot()
+        check(first["max_in_flight"] <= args.workers,
+              f"concurrency {first['max_in_flight']} <= --workers {args.workers}")
+        # Token bucket: a full bucket (burst = rate) plus `rate` refills per second
+        allowed = math.ceil(2 * args.rate) + 2  # + the two sitemap requests
+        check(first["max_per_second"] <= allowed,
+              f"peak {first['max_per_second']} requests/s <= {allowed} allowed by --rate")
+
+        # 3. Resume
+        out = subprocess.run(
+            crawl_command(args, site, tmp), cwd=PROJECT_ROOT,
+            capture_output=True, text=True, timeout=CRAWL_TIMEOUT_S,
+        )
+        check(out.returncode == 0, "resumed crawl finished")
+        check("Resuming" in out.stdout, "resumed crawl read the checkpoint")
+
+        fetches = stats.snapshot()["product_fetches"]
+        refetched = sum(n - 1 for n in fetches.values())
+        check(len(fetches) == args.pages, f"every page fetched ({len(fetches)}/{args.pages})")
+        check(refetched <= args.workers,
+              f"{refetched} pages fetched twice (at most the {args.workers} in flight at the kill)")
+
+        catalog_path = os.path.join(tmp, "catalog.json")
+        records = []
+        if os.path.exists(catalog_path):
+            with open(catalog_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        check(len(records) == args.pages, f"catalogue has {len(records)}/{args.pages} records")
+        check(not os.path.exists(checkpoint), "checkpoint removed after a complete crawl")
+
+        # 4. Incremental run: nothing changed
+        before = stats.snapshot()["requests"]
+        out = subprocess.run(
+            crawl_command(args, site, tmp, "--incremental"), cwd=PROJECT_ROOT,
+            capture_output=True, text=True, timeout=CRAWL_TIMEOUT_S,
+        )
+        page_requests = stats.snapshot()["requests"] - before - 2
+        check(out.returncode == 0 and page_requests == 0,
+              f"incremental rerun fetched {page_requests} product pages")
+
+    server.shutdown()
+    server.server_close()
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\n✅ Crawl smoke test passed")
+
+
+if __name__ == "__main__":
+    main()
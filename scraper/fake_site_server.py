@@ -0,0 +1,227 @@
+"""
+Local stand-in for shl.com, for exercising the crawler's concurrency,
+per-host rate limiting, conditional requests and checkpoint resume
+without touching the real site.
+
+    python scraper/fake_site_server.py --port 8099 --pages 40 --delay 0.2
+    python scraper/scrape_shl.py --sitemap http://127.0.0.1:8099/sitemap_index.xml \\
+        --workers 4 --rate 8 --output /tmp/crawl/catalog.json ...
+
+Serves a sitemap index, one product sitemap listing --pages product
+URLs, and the saved catalogue page (logs/catalog_debug.html) at each
+product URL with its <h1> made unique per page. Product responses carry
+an ETag and honour If-None-Match. GET /stats returns request counts,
+the peak number of concurrent requests and the peak requests in any
+one-second window; scraper/crawl_smoke.py checks these against the
+crawl settings.
+"""
+
+import sys
+import os
+
+# Ensure project root is on PYTHONPATH
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import deque, Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURE_PAGE = os.path.join(PROJECT_ROOT, "logs", "catalog_debug.html")
+PRODUCT_PATH = "/solutions/products/product-catalog/view/fixture-assessment-{}/"
+LASTMOD = "2025-01-01"
+
+_H1 = re.compile(rb"<h1>.*?</h1>", re.S)
+
+
+class SiteStats:
+    """
+    Request counters shared by the handler threads
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.by_path = Counter()
+        self._recent = deque()
+        self.max_per_second = 0
+
+    def begin(self, path):
+        with self._lock:
+            now = time.monotonic()
+            self.requests += 1
+            self.by_path[path] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+            self._recent.append(now)
+            while self._recent and self._recent[0] <= now - 1.0:
+                self._recent.popleft()
+            self.max_per_second = max(self.max_per_second, len(self._recent))
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "not_modified": self.not_modified,
+                "failures": self.failures,
+                "max_in_flight": self.max_in_flight,
+                "max_per_second": self.max_per_second,
+                "product_fetches": {
+                    path: n for path, n in self.by_path.items()
+                    if path.startswith(PRODUCT_PATH.split("{")[0])
+                },
+            }
+
+
+def product_pages(pages, fixture=FIXTURE_PAGE):
+    """
+    Path -> HTML body, one per fixture product
+    """
+    with open(fixture, "rb") as f:
+        template = f.read()
+    return {
+        PRODUCT_PATH.format(i): _H1.sub(
+            f"<h1>Fixture Assessment {i}</h1>".encode("utf-8"), template, count=1
+        )
+        for i in range(pages)
+    }
+
+
+def sitemap_index(base):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        f"  <sitemap><loc>{base}/product-sitemap.xml</loc></sitemap>\n"
+        f"  <sitemap><loc>{base}/page-sitemap.xml</loc></sitemap>\n"
+        "</sitemapindex>\n"
+    )
+
+
+def product_sitemap(base, paths):
+    entries = "".join(
+        f"  <url><loc>{base}{path}</loc><lastmod>{LASTMOD}</lastmod></url>\n"
+        for path in paths
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        f"{entries}</urlset>\n"
+    )
+
+
+def make_handler(pages, stats, delay=0.1, jitter=0.05, fail_rate=0.0):
+    etags = {
+        path: f'"{hashlib.sha256(body).hexdigest()[:16]}"' for path, body in pages.items()
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=b"", content_type="text/html", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/stats":
+                body = json.dumps(stats.snapshot()).encode("utf-8")
+                return self._send(200, body, "application/json")
+
+            stats.begin(path)
+            try:
+                self._serve(path)
+            except ConnectionError:
+                # Crawler killed mid-response
+                self.close_connection = True
+            finally:
+                stats.end()
+
+        def _serve(self, path):
+            base = f"http://{self.headers.get('Host')}"
+            if path == "/sitemap_index.xml":
+                return self._send(200, sitemap_index(base).encode("utf-8"), "application/xml")
+            if path == "/product-sitemap.xml":
+                body = product_sitemap(base, pages).encode("utf-8")
+                return self._send(200, body, "application/xml")
+            if path not in pages:
+                return self._send(404)
+
+            time.sleep(max(0.0, delay + random.uniform(-jitter, jitter)))
+            if random.random() < fail_rate:
+                stats.count("failures")
+                return self._send(503)
+
+            if self.headers.get("If-None-Match") == etags[path]:
+                stats.count("not_modified")
+                return self._send(304, headers={"ETag": etags[path]})
+            return self._send(200, pages[path], headers={"ETag": etags[path]})
+
+    return Handler
+
+
+def create_server(host="127.0.0.1", port=8099, pages=40, delay=0.1, jitter=0.05,
+                  fail_rate=0.0):
+    """
+    (server, stats); call server.serve_forever() to run it
+    """
+    stats = SiteStats()
+    handler = make_handler(product_pages(pages), stats, delay, jitter, fail_rate)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake SHL site for crawler tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--pages", type=int, default=40, help="product pages to list")
+    parser.add_argument("--delay", type=float, default=0.1, help="seconds per product page")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of 503 responses")
+    args = parser.parse_args()
+
+    server, _ = create_server(
+        args.host, args.port, args.pages, args.delay, args.jitter, args.fail_rate
+    )
+    print(f"🌐 Fake SHL site on http://{args.host}:{args.port}/sitemap_index.xml "
+          f"({args.pages} product pages)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
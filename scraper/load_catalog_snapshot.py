@@ -1,10 +1,19 @@
-import pandas as pd
-import json
-import uuid
+import sys
 import os
 
+# Ensure project root is on PYTHONPATH
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import argparse
+import pandas as pd
+
+from catalog.snapshot import (
+    CATALOG_ARROW_PATH, CATALOG_JSON_PATH, table_from_frame, write_snapshot, export_json
+)
+
 CSV_INPUT = "Catalogue.csv"
-OUTPUT_PATH = "data/shl_catalog_raw.json"
 MIN_REQUIRED = 377
 
 
@@ -19,81 +28,62 @@ def find_column(columns, keywords):
 
 
 def main():
-    if not os.path.exists(CSV_INPUT):
+    parser = argparse.ArgumentParser(description="Load a catalogue CSV into the columnar snapshot")
+    parser.add_argument("--input", default=CSV_INPUT)
+    parser.add_argument("--output", default=CATALOG_ARROW_PATH, help="Arrow IPC snapshot")
+    parser.add_argument("--json-output", default=CATALOG_JSON_PATH, help="JSON export")
+    parser.add_argument("--no-json", action="store_true", help="skip the JSON export")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
         raise FileNotFoundError(
-            f"❌ Cannot find {CSV_INPUT}. Place it in project root."
+            f"❌ Cannot find {args.input}. Place it in project root."
         )
 
-    print(f"📥 Loading catalogue from {CSV_INPUT} ...")
-    df = pd.read_csv(CSV_INPUT)
+    print(f"📥 Loading catalogue from {args.input} ...")
+    df = pd.read_csv(args.input, dtype=str, keep_default_na=False)
 
     print("🧾 Columns found:")
     for c in df.columns:
         print("  -", c)
 
-    # Detect required columns
-    name_col = find_column(df.columns, ["assessment", "name", "title"])
-    url_col = find_column(df.columns, ["url", "link"])
-
-    desc_col = find_column(df.columns, ["description"])
-    type_col = find_column(df.columns, ["test type", "type"])
-    duration_col = find_column(df.columns, ["duration", "time"])
-    remote_col = find_column(df.columns, ["remote"])
-    adaptive_col = find_column(df.columns, ["adaptive"])
-
-    if not name_col or not url_col:
+    # Detect source columns once; the mapping is stored with the snapshot
+    mapping = {
+        "name": find_column(df.columns, ["assessment", "name", "title"]),
+        "url": find_column(df.columns, ["url", "link"]),
+        "description": find_column(df.columns, ["description"]),
+        "test_type": find_column(df.columns, ["test type", "type"]),
+        "duration": find_column(df.columns, ["duration", "time"]),
+        "remote_support": find_column(df.columns, ["remote"]),
+        "adaptive_support": find_column(df.columns, ["adaptive"]),
+    }
+
+    if not mapping["name"] or not mapping["url"]:
         raise ValueError("❌ Required columns (name/url) not found")
 
     print("\n🔎 Column mapping:")
-    print("  Name       →", name_col)
-    print("  URL        →", url_col)
-    print("  Description→", desc_col)
-    print("  Test Type  →", type_col)
-    print("  Duration   →", duration_col)
-    print("  Remote     →", remote_col)
-    print("  Adaptive   →", adaptive_col)
-
-    records = []
-
-    for _, row in df.iterrows():
-        name = str(row.get(name_col, "")).strip()
-        url = str(row.get(url_col, "")).strip()
-
-        if not name or not url:
-            continue
-
-        # Normalize URL
-        if url.startswith("/"):
-            url = "https://www.shl.com" + url
-
-        records.append({
-            "assessment_id": str(uuid.uuid4()),
-            "name": name,
-            "url": url,
-            "description": str(row.get(desc_col, "")).strip() if desc_col else "",
-            "test_type": str(row.get(type_col, "")).strip() if type_col else "",
-            "duration": str(row.get(duration_col, "")).strip() if duration_col else "",
-            "remote_support": str(row.get(remote_col, "")).strip() if remote_col else "",
-            "adaptive_support": str(row.get(adaptive_col, "")).strip() if adaptive_col else ""
-        })
-
-    # Deduplicate by URL
-    unique = {r["url"]: r for r in records}
-    final_records = list(unique.values())
-
-    print(f"\n✅ Total unique assessments collected: {len(final_records)}")
-
-    if len(final_records) < MIN_REQUIRED:
+    for field, col in mapping.items():
+        print(f"  {field:<17}→", col)
+
+    mapping = {field: col for field, col in mapping.items() if col}
+    table = table_from_frame(
+        df[list(mapping.values())].set_axis(list(mapping), axis=1)
+    )
+
+    print(f"\n✅ Total unique assessments collected: {table.num_rows}")
+
+    if table.num_rows < MIN_REQUIRED:
         raise ValueError(
-            f"❌ Only {len(final_records)} assessments found. "
+            f"❌ Only {table.num_rows} assessments found. "
             f"Minimum required is {MIN_REQUIRED}."
         )
 
-    os.makedirs("data", exist_ok=True)
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(final_records, f, indent=2, ensure_ascii=False)
+    write_snapshot(table, args.output, source={"input": args.input, "columns": mapping})
+    print(f"📁 Columnar catalogue saved to {args.output}")
 
-    print(f"📁 Final catalogue saved to {OUTPUT_PATH}")
+    if not args.no_json:
+        export_json(table, args.json_output)
+        print(f"📁 JSON export saved to {args.json_output}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from catalog.ids import assessment_id_for_url
+
+# Output field -> label searched for (case-insensitive) in page text
+FIELD_LABELS = {
+    "test_type": "test type",
+    "duration": "duration",
+    "remote_support": "remote",
+    "adaptive_support": "adaptive",
+}
+
+
+def _is_element(el):
+    # Comments / processing instructions have a callable tag
+    return isinstance(el.tag, str)
+
+
+def _strings(el):
+    """
+    Text strings under an element, in document order, comments skipped
+    """
+    for node in el.iter():
+        if _is_element(node) and node.text:
+            yield node.text
+        if node is not el and node.tail:
+            yield node.tail
+
+
+def _text_strip(el, sep=""):
+    return sep.join(s.strip() for s in _strings(el) if s.strip())
+
+
+def _has_class(el, cls):
+    return cls in (el.get("class") or "").split()
+
+
+def extract_assessment_fields(page_html, url):
+    """
+    Single-pass extraction of an assessment page.
+
+    Walks the lxml tree once, matching every label on the same pass:
+    for each label the value is the text of the first element that
+    follows the first text node containing it (the same rule the old
+    BeautifulSoup `find(text=...).find_next()` lookup used).
+    """
+    if isinstance(page_html, str):
+        page_html = page_html.encode("utf-8")
+
+    try:
+        root = lxml_html.fromstring(page_html)
+    except (etree.ParserError, ValueError):
+        return None
+
+    name_el = None
+    desc_el = None
+    values = {}
+    waiting = []
+    remaining = dict(FIELD_LABELS)
+
+    def scan(text):
+        lowered = text.lower()
+        for field, label in list(remaining.items()):
+            if label in lowered:
+                waiting.append(field)
+                del remaining[field]
+
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        if event == "start":
+            if _is_element(el):
+                if waiting:
+                    value = _text_strip(el)
+                    for field in waiting:
+                        values[field] = value
+                    waiting.clear()
+
+                if name_el is None and el.tag == "h1":
+                    name_el = el
+                if desc_el is None and el.tag == "div" and _has_class(el, "product-description"):
+                    desc_el = el
+
+            if el.text and remaining:
+                scan(el.text)
+        elif el.tail and remaining and el is not root:
+            scan(el.tail)
+
+    if name_el is None:
+        return None
+
+    return {
+        "assessment_id": assessment_id_for_url(url),
+        "name": _text_strip(name_el),
+        "url": url,
+        "description": _text_strip(desc_el, " ") if desc_el is not None else "",
+        "test_type": values.get("test_type", ""),
+        "duration": values.get("duration", ""),
+        "remote_support": values.get("remote_support", ""),
+        "adaptive_support": values.get("adaptive_support", ""),
+    }
+
+
+def _extract_pair(args):
+    return extract_assessment_fields(*args)
+
+
+def extract_many(pages, workers=None, chunksize=4):
+    """
+    Parse (html, url) pairs in a process pool; results keep input order
+    """
+    pages = list(pages)
+    if workers == 1 or len(pages) < 2:
+        return [extract_assessment_fields(h, u) for h, u in pages]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_extract_pair, pages, chunksize=chunksize))
@@ -1,26 +1,43 @@
-import requests
+import sys
+import os
+
+# Ensure project root is on PYTHONPATH
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
 import json
-import uuid
-import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 from bs4 import BeautifulSoup
 
+from scraper.http_utils import make_session, HostRateLimiter, DEFAULT_HEADERS
+from scraper.page_extractor import extract_assessment_fields
+from catalog.snapshot import CATALOG_ARROW_PATH, table_from_records, write_snapshot
+
 OUTPUT_PATH = "data/shl_catalog_raw.json"
+CHECKPOINT_PATH = "data/scrape_checkpoint.jsonl"
+CRAWL_STATE_PATH = "data/crawl_state.json"
+DELTA_PATH = "data/catalog_delta.json"
 
 SITEMAP_INDEX = "https://www.shl.com/sitemap_index.xml"
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0",
-    "Accept": "application/xml,text/html"
-}
+HEADERS = DEFAULT_HEADERS
+
+# Crawl defaults: concurrent fetches and polite per-host request rate
+DEFAULT_WORKERS = 8
+DEFAULT_RATE_PER_HOST = 4.0
 
 
 # -------------------------------------------------
 # STEP 1: Fetch sitemap index
 # -------------------------------------------------
-def get_sitemap_urls():
+def get_sitemap_urls(session, sitemap_index=SITEMAP_INDEX):
     print("📡 Fetching sitemap index...")
-    r = requests.get(SITEMAP_INDEX, headers=HEADERS, timeout=20)
+    r = session.get(sitemap_index, timeout=20)
     r.raise_for_status()
 
     soup = BeautifulSoup(r.text, "xml")
@@ -32,9 +49,12 @@ def get_sitemap_urls():
 # -------------------------------------------------
 # STEP 2: Extract product URLs from product sitemaps
 # -------------------------------------------------
-def get_product_urls():
-    sitemap_urls = get_sitemap_urls()
-    product_urls = set()
+def get_product_entries(session, sitemap_index=SITEMAP_INDEX):
+    """
+    Product URLs mapped to their sitemap <lastmod> ("" if absent)
+    """
+    sitemap_urls = get_sitemap_urls(session, sitemap_index)
+    product_urls = {}
 
     for sitemap in sitemap_urls:
         # Only product-related sitemaps
@@ -42,82 +62,312 @@ def get_product_urls():
             continue
 
         print(f"🔍 Parsing sitemap: {sitemap}")
-        r = requests.get(sitemap, headers=HEADERS, timeout=20)
+        r = session.get(sitemap, timeout=20)
         if r.status_code != 200:
             continue
 
         soup = BeautifulSoup(r.text, "xml")
 
-        for loc in soup.find_all("loc"):
+        for entry in soup.find_all("url"):
+            loc = entry.find("loc")
+            if loc is None:
+                continue
             url = loc.text.lower()
 
             if "/solutions/products/" in url and "job" not in url:
-                product_urls.add(loc.text)
+                lastmod = entry.find("lastmod")
+                product_urls[loc.text] = lastmod.text.strip() if lastmod else ""
 
-    return list(product_urls)
+    return product_urls
+
+
+def get_product_urls(session, sitemap_index=SITEMAP_INDEX):
+    return list(get_product_entries(session, sitemap_index))
 
 
 # -------------------------------------------------
 # STEP 3: Scrape individual assessment page
 # -------------------------------------------------
-def scrape_assessment_page(url):
+def parse_assessment_page(html, url, parse_pool=None):
+    """
+    Extract assessment fields (single-pass lxml extractor),
+    optionally in a process pool so parsing doesn't hold the GIL
+    """
+    if parse_pool is not None:
+        return parse_pool.submit(extract_assessment_fields, html, url).result()
+    return extract_assessment_fields(html, url)
+
+
+def refresh_page(url, session, limiter=None, previous=None, parse_pool=None):
+    """
+    Fetch a page, revalidating against its previous crawl state
+    (If-None-Match / If-Modified-Since, then body hash).
+    Returns a result with status added / changed / unchanged / failed.
+    """
+    previous = previous or {}
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    result = {
+        "url": url,
+        "status": "failed",
+        "record": previous.get("record"),
+        "etag": previous.get("etag"),
+        "last_modified": previous.get("last_modified"),
+        "body_hash": previous.get("body_hash"),
+    }
+
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        soup = BeautifulSoup(r.text, "html.parser")
+        if limiter is not None:
+            limiter.acquire(url)
+        r = session.get(url, headers=headers, timeout=15)
     except Exception:
-        return None
+        return result
+
+    if r.status_code == 304 and previous.get("record"):
+        result["status"] = "unchanged"
+        return result
+
+    if r.status_code != 200:
+        return result
+
+    result["etag"] = r.headers.get("ETag")
+    result["last_modified"] = r.headers.get("Last-Modified")
+    result["body_hash"] = hashlib.sha256(r.content).hexdigest()
+
+    if previous.get("record") and previous.get("body_hash") == result["body_hash"]:
+        result["status"] = "unchanged"
+        return result
+
+    record = parse_assessment_page(r.content, url, parse_pool)
+    if record is None:
+        return result
+
+    if not previous.get("record"):
+        result["status"] = "added"
+    elif record != previous["record"]:
+        result["status"] = "changed"
+    else:
+        result["status"] = "unchanged"
+    result["record"] = record
+
+    return result
+
+
+# -------------------------------------------------
+# STEP 4: Concurrent, resumable crawl
+# -------------------------------------------------
+def load_checkpoint(path):
+    """
+    Page results already fetched by an interrupted crawl, keyed by URL
+    """
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Torn last line from a crash mid-write
+                continue
+            if entry.get("status") != "failed":
+                done[entry["url"]] = entry
+
+    return done
+
+
+def crawl(urls, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE_PER_HOST,
+          checkpoint_path=CHECKPOINT_PATH, session=None, state=None,
+          parse_workers=0):
+    """
+    Fetch product pages with a thread pool sharing one pooled session,
+    rate-limited per host. Pages with a previous crawl `state` are
+    revalidated conditionally. Every finished page is appended to the
+    checkpoint file, so a restarted crawl only fetches what is left.
+    With parse_workers > 0 page parsing runs in a process pool.
+    Returns page results keyed by URL (failed pages omitted).
+    """
+    session = session or make_session(pool_size=workers)
+    limiter = HostRateLimiter(rate) if rate else None
+    state = state or {}
+
+    done = load_checkpoint(checkpoint_path)
+    done = {u: done[u] for u in urls if u in done}
+    pending = [u for u in urls if u not in done]
+    if done:
+        print(f"♻️  Resuming: {len(done)} pages from checkpoint, {len(pending)} left")
+
+    checkpoint = None
+    if checkpoint_path:
+        os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+        checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+    write_lock = threading.Lock()
+    parse_pool = ProcessPoolExecutor(parse_workers) if parse_workers else None
 
     try:
-        name = soup.find("h1").get_text(strip=True)
-    except Exception:
-        return None
-
-    description = ""
-    desc = soup.find("div", class_="product-description")
-    if desc:
-        description = desc.get_text(" ", strip=True)
-
-    def extract(label):
-        tag = soup.find(text=lambda x: x and label.lower() in x.lower())
-        if tag:
-            nxt = tag.find_next()
-            if nxt:
-                return nxt.get_text(strip=True)
-        return ""
-
-    return {
-        "assessment_id": str(uuid.uuid4()),
-        "name": name,
-        "url": url,
-        "description": description,
-        "test_type": extract("Test Type"),
-        "duration": extract("Duration"),
-        "remote_support": extract("Remote"),
-        "adaptive_support": extract("Adaptive")
-    }
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(
+                    refresh_page, url, session, limiter, state.get(url), parse_pool
+                ): url
+                for url in pending
+            }
+            for future in tqdm(as_completed(futures), total=len(futures),
+                               desc="Scraping assessments"):
+                result = future.result()
+                if result["status"] != "failed":
+                    done[result["url"]] = result
+                if checkpoint is not None:
+                    with write_lock:
+                        checkpoint.write(json.dumps(result, ensure_ascii=False) + "\n")
+                        checkpoint.flush()
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        if checkpoint is not None:
+            checkpoint.close()
+
+    return done
+
+
+# -------------------------------------------------
+# STEP 5: Crawl state + delta for incremental refreshes
+# -------------------------------------------------
+def load_crawl_state(path=CRAWL_STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def urls_to_fetch(entries, state):
+    """
+    Skip URLs whose sitemap <lastmod> is unchanged since the last crawl
+    """
+    return [
+        url for url, lastmod in entries.items()
+        if not (
+            lastmod
+            and url in state
+            and state[url].get("record")
+            and state[url].get("lastmod") == lastmod
+        )
+    ]
+
+
+def merge_crawl(entries, state, results):
+    """
+    Fold page results into the crawl state and compute the
+    added / changed / removed delta against the previous crawl
+    """
+    new_state = {}
+    delta = {"added": [], "changed": [], "removed": []}
+
+    for url, lastmod in entries.items():
+        result = results.get(url)
+
+        if result is None:
+            # Skipped via lastmod, or fetch failed: keep what we had
+            if url in state:
+                new_state[url] = dict(state[url], lastmod=lastmod)
+            continue
+
+        new_state[url] = {
+            "lastmod": lastmod,
+            "etag": result["etag"],
+            "last_modified": result["last_modified"],
+            "body_hash": result["body_hash"],
+            "record": result["record"],
+        }
+        if result["status"] in ("added", "changed"):
+            delta[result["status"]].append(result["record"])
+
+    for url, previous in state.items():
+        if url not in entries and previous.get("record"):
+            delta["removed"].append({
+                "assessment_id": previous["record"]["assessment_id"],
+                "url": url,
+            })
+
+    return new_state, delta
 
 
 # -------------------------------------------------
 # MAIN PIPELINE
 # -------------------------------------------------
 def main():
-    product_links = get_product_urls()
-    print(f"🔗 Product URLs discovered: {len(product_links)}")
+    parser = argparse.ArgumentParser(description="Scrape the SHL product catalogue")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_HOST,
+                        help="max requests per second per host (0 = unlimited)")
+    parser.add_argument("--sitemap", default=SITEMAP_INDEX,
+                        help="sitemap index URL (point at a local stand-in for testing)")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="parse pages in a process pool of this size")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--fresh", action="store_true",
+                        help="ignore any existing checkpoint")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch pages changed since the last crawl")
+    parser.add_argument("--state", default=CRAWL_STATE_PATH)
+    parser.add_argument("--delta", default=DELTA_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH, help="JSON export")
+    parser.add_argument("--snapshot", default=CATALOG_ARROW_PATH,
+                        help="columnar catalogue read by the index build")
+    args = parser.parse_args()
+
+    if args.fresh and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    session = make_session(pool_size=args.workers)
 
-    assessments = []
+    entries = dict(sorted(get_product_entries(session, args.sitemap).items()))
+    print(f"🔗 Product URLs discovered: {len(entries)}")
 
-    for url in tqdm(product_links, desc="Scraping assessments"):
-        data = scrape_assessment_page(url)
-        if data:
-            assessments.append(data)
-        time.sleep(0.3)
+    state = load_crawl_state(args.state) if args.incremental else {}
+    to_fetch = urls_to_fetch(entries, state)
+    if args.incremental:
+        print(f"⏭️  Unchanged by sitemap lastmod: {len(entries) - len(to_fetch)}")
+
+    results = crawl(
+        to_fetch,
+        workers=args.workers,
+        rate=args.rate,
+        checkpoint_path=args.checkpoint,
+        session=session,
+        state=state,
+        parse_workers=args.parse_workers,
+    )
+
+    new_state, delta = merge_crawl(entries, state, results)
+    assessments = [s["record"] for s in new_state.values() if s.get("record")]
 
     print(f"✅ Successfully scraped {len(assessments)} assessments")
+    print(
+        f"🔁 Delta: +{len(delta['added'])} added, ~{len(delta['changed'])} changed, "
+        f"-{len(delta['removed'])} removed"
+    )
 
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+    write_snapshot(table_from_records(assessments), args.snapshot,
+                   source={"input": args.sitemap})
+    with open(args.output, "w", encoding="utf-8") as f:
         json.dump(assessments, f, indent=2, ensure_ascii=False)
+    with open(args.state, "w", encoding="utf-8") as f:
+        json.dump(new_state, f, ensure_ascii=False)
+    with open(args.delta, "w", encoding="utf-8") as f:
+        json.dump(delta, f, indent=2, ensure_ascii=False)
+
+    # Crawl is complete; the next run starts from scratch
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
 
-    print(f"📁 Data saved to {OUTPUT_PATH}")
+    print(f"📁 Data saved to {args.snapshot} (JSON export: {args.output})")
+    print(f"📁 Delta saved to {args.delta}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,345 @@
+"""
+Streaming, resumable batch predictions.
+
+Queries are streamed from an Excel workbook (test rows of every sheet,
+as in generate_predictions.py), a CSV file or a JSONL file, scored in
+batches of --batch-size across a worker pool and appended to the output
+(CSV or JSONL) in input order. After each batch is flushed, its query
+keys and the output size are appended to a checkpoint next to the
+output. A rerun truncates any uncommitted tail and skips finished queries.
+
+    python submission/batch_pipeline.py "Gen_AI Dataset.xlsx" \\
+        submission/shl_test_predictions.csv --batch-size 32 --workers 4
+"""
+
+import sys
+import os
+
+# Ensure project root is on PYTHONPATH
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import csv
+import json
+import time
+import hashlib
+import argparse
+from itertools import islice
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+)
+
+from retrieval.retrieve_and_rank import recommend_batch, warm_up
+from submission.generate_predictions import is_test_row
+
+TOP_K = 10
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_WORKERS = 2
+EXECUTORS = ("thread", "process")
+# JSONL fields tried in order when --field is not given
+QUERY_FIELDS = ("query", "Query", "text", "body")
+REPORT_EVERY_S = 5.0
+OUTPUT_COLUMNS = ("Query", "Recommended_Assessments")
+
+
+# -------------------------------
+# Input readers (generators)
+# -------------------------------
+def iter_excel(path, all_rows=False):
+    """
+    Test queries from every sheet, row by row (openpyxl read-only mode)
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+            if "Query" not in header:
+                continue
+            query_col = header.index("Query")
+            url_col = header.index("Assessment_url") if "Assessment_url" in header else None
+
+            for row in rows:
+                query = row[query_col] if query_col < len(row) else None
+                if query is None:
+                    continue
+                if not all_rows and url_col is not None and not is_test_row(
+                    row[url_col] if url_col < len(row) else None
+                ):
+                    continue
+                yield str(query)
+    finally:
+        workbook.close()
+
+
+def iter_csv(path, column="Query"):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get(column):
+                yield row[column]
+
+
+def iter_jsonl(path, field=None):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield record
+                continue
+            fields = (field,) if field else QUERY_FIELDS
+            query = next((record[k] for k in fields if record.get(k)), None)
+            if query:
+                yield str(query)
+
+
+def iter_queries(path, field=None, all_rows=False):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return iter_excel(path, all_rows=all_rows)
+    if ext == ".csv":
+        return iter_csv(path, field or "Query")
+    if ext in (".jsonl", ".ndjson"):
+        return iter_jsonl(path, field)
+    raise ValueError(f"❌ Unsupported input format: {path}")
+
+
+def query_key(query):
+    # Whitespace-insensitive, so re-exported inputs still match the checkpoint
+    return hashlib.sha1(" ".join(query.split()).encode("utf-8")).hexdigest()
+
+
+# -------------------------------
+# Checkpoint
+# -------------------------------
+def checkpoint_path(output_path):
+    return output_path + ".checkpoint"
+
+
+def load_checkpoint(output_path):
+    """
+    (finished query keys, committed output size). A torn last line
+    (crash while checkpointing) is cut off so new entries start clean.
+    """
+    done, offset = set(), 0
+    path = checkpoint_path(output_path)
+    if not os.path.exists(path):
+        return done, offset
+
+    valid_end = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                entry = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                entry = None
+            if entry is None:
+                break
+            done.update(entry["keys"])
+            offset = entry["offset"]
+            valid_end += len(line)
+
+    if valid_end < os.path.getsize(path):
+        os.truncate(path, valid_end)
+    return done, offset
+
+
+def _fsync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class ResultWriter:
+    """
+    Appends scored batches to CSV / JSONL output, then commits them
+    to the checkpoint (output first, so a committed batch is on disk)
+    """
+
+    def __init__(self, output_path, restart=False):
+        self.output_path = output_path
+        self.jsonl = output_path.endswith((".jsonl", ".ndjson"))
+
+        if restart:
+            for path in (output_path, checkpoint_path(output_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        self.done, offset = load_checkpoint(output_path)
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+        # Drop rows written after the last checkpoint (crash mid-batch)
+        if os.path.exists(output_path):
+            os.truncate(output_path, offset)
+        self._out = open(output_path, "a", encoding="utf-8", newline="")
+        self._csv = csv.writer(self._out, lineterminator="\n")
+        if not self.jsonl and offset == 0:
+            self._csv.writerow(OUTPUT_COLUMNS)
+        self._checkpoint = open(checkpoint_path(output_path), "a", encoding="utf-8")
+
+    def write(self, rows):
+        """
+        rows: (key, query, urls) in input order
+        """
+        for _, query, urls in rows:
+            if self.jsonl:
+                self._out.write(json.dumps(
+                    {"query": query, "recommendations": urls}, ensure_ascii=False
+                ) + "\n")
+            else:
+                self._csv.writerow([query, ";".join(urls)])
+        _fsync(self._out)
+
+        keys = [key for key, _, _ in rows]
+        offset = os.fstat(self._out.fileno()).st_size
+        self._checkpoint.write(json.dumps({"offset": offset, "keys": keys}) + "\n")
+        _fsync(self._checkpoint)
+        self.done.update(keys)
+
+    def close(self):
+        self._out.close()
+        self._checkpoint.close()
+
+
+# -------------------------------
+# Workers
+# -------------------------------
+def _init_worker():
+    # Index + model load up front (once per worker process)
+    warm_up()
+
+
+def score_batch(batch, k=TOP_K):
+    """
+    batch: [(key, query)] -> [(key, query, urls)]
+    """
+    all_recs = recommend_batch([q for _, q in batch], k=k)
+    return [
+        (key, query, [r["url"] for r in recs])
+        for (key, query), recs in zip(batch, all_recs)
+    ]
+
+
+def _unseen(queries, done):
+    """
+    (key, query) pairs, skipping finished and repeated queries
+    """
+    seen = set(done)
+    for query in queries:
+        key = query_key(query)
+        if key not in seen:
+            seen.add(key)
+            yield key, query
+
+
+def _batches(items, batch_size):
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def run_pipeline(input_path, output_path, batch_size=DEFAULT_BATCH_SIZE,
+                 workers=DEFAULT_WORKERS, executor="thread", k=TOP_K, field=None,
+                 all_rows=False, restart=False, report_every=REPORT_EVERY_S):
+    """
+    Stream, score and append; returns a summary dict
+    """
+    writer = ResultWriter(output_path, restart=restart)
+    skipped = len(writer.done)
+    if skipped:
+        print(f"⏭️  Resuming: {skipped} queries already in {output_path}")
+
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    else:
+        _init_worker()
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="predict")
+
+    batches = _batches(
+        _unseen(iter_queries(input_path, field, all_rows), writer.done), batch_size
+    )
+    max_in_flight = workers * 2
+    in_flight = {}
+    finished = {}
+    next_submit = next_write = 0
+    scored = 0
+    start = last_report = time.perf_counter()
+
+    try:
+        while True:
+            while len(in_flight) < max_in_flight:
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                in_flight[pool.submit(score_batch, batch, k)] = next_submit
+                next_submit += 1
+            if not in_flight:
+                break
+
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                finished[in_flight.pop(future)] = future.result()
+
+            # Append in input order
+            while next_write in finished:
+                rows = finished.pop(next_write)
+                writer.write(rows)
+                scored += len(rows)
+                next_write += 1
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                print(f"⚡ {scored} queries scored, {scored / (now - start):.1f} q/s")
+                last_report = now
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "scored": scored,
+        "skipped": skipped,
+        "elapsed_s": round(elapsed, 3),
+        "queries_per_s": round(scored / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming, resumable batch predictions")
+    parser.add_argument("input", help="queries: .xlsx (test rows of every sheet), .csv or .jsonl")
+    parser.add_argument("output", help="predictions: .csv or .jsonl (appended incrementally)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--executor", choices=EXECUTORS, default="thread",
+                        help="thread = one shared model, process = one model per worker")
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--field", help="CSV column / JSONL field holding the query")
+    parser.add_argument("--all-rows", action="store_true",
+                        help="Excel: score labeled rows too, not only test rows")
+    parser.add_argument("--restart", action="store_true",
+                        help="discard existing output and checkpoint")
+    parser.add_argument("--report-every", type=float, default=REPORT_EVERY_S,
+                        help="seconds between throughput lines")
+    args = parser.parse_args()
+
+    print(f"📥 Streaming queries from {args.input}...")
+    summary = run_pipeline(
+        args.input, args.output, batch_size=args.batch_size, workers=args.workers,
+        executor=args.executor, k=args.k, field=args.field, all_rows=args.all_rows,
+        restart=args.restart, report_every=args.report_every,
+    )
+    print(
+        f"✅ {summary['scored']} queries scored in {summary['elapsed_s']:.1f}s "
+        f"({summary['queries_per_s']:.1f} q/s), {summary['skipped']} skipped"
+    )
+    print(f"📁 Predictions saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
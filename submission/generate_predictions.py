@@ -6,8 +6,9 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
+import argparse
 import pandas as pd
-from retrieval.retrieve_and_rank import recommend
+from retrieval.retrieve_and_rank import recommend_batch
 
 
 INPUT_DATA_PATH = "Gen_AI Dataset.xlsx"
@@ -30,7 +31,39 @@ def is_test_row(val):
     return False
 
 
+def run_pipeline_mode(args):
+    """
+    Streamed, batched and checkpointed alternative to the in-memory run
+    """
+    from submission.batch_pipeline import run_pipeline
+
+    summary = run_pipeline(
+        INPUT_DATA_PATH, OUTPUT_CSV_PATH, batch_size=args.batch_size,
+        workers=args.workers, k=TOP_K, restart=args.restart,
+    )
+    print(
+        f"\n✅ {summary['scored']} queries scored ({summary['queries_per_s']:.1f} q/s), "
+        f"{summary['skipped']} already done"
+    )
+    print(f"📁 Predictions saved to {OUTPUT_CSV_PATH}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate test-set predictions")
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="stream queries in batches across workers, appending with a checkpoint"
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--restart", action="store_true",
+                        help="pipeline mode: ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    if args.pipeline:
+        run_pipeline_mode(args)
+        return
+
     print("📥 Loading dataset...")
 
     # ---- Load ALL sheets ----
@@ -68,8 +101,9 @@ def main():
 
     predictions = []
 
-    for q in test_queries:
-        recs = recommend(q, k=TOP_K)
+    all_recs = recommend_batch(test_queries, k=TOP_K)
+
+    for q, recs in zip(test_queries, all_recs):
         urls = [r["url"] for r in recs]
 
         predictions.append({